@@ -19,4 +19,35 @@ class Config:
     echo_string = environ.get('SQLALCHEMY_ECHO')
     SQLALCHEMY_ECHO = False
     if echo_string.lower().strip() == "true":
-        SQLALCHEMY_ECHO = True
\ No newline at end of file
+        SQLALCHEMY_ECHO = True
+
+    # Worker processes and rows per task used to hash passwords when importing users,
+    # the worker count defaults to the number of cores
+    PASSWORD_HASH_WORKERS = int(environ.get('PASSWORD_HASH_WORKERS')) if environ.get('PASSWORD_HASH_WORKERS') else None
+    PASSWORD_HASH_CHUNKSIZE = int(environ.get('PASSWORD_HASH_CHUNKSIZE')) if environ.get('PASSWORD_HASH_CHUNKSIZE') else None
+
+    # File the memory repository is snapshotted to after populating, and loaded from on later starts
+    MEMORY_SNAPSHOT = environ.get('MEMORY_SNAPSHOT')
+
+    # Database connection pool: 'queue', 'singleton' (one connection shared by every thread) or 'null'
+    # (a new connection per session). Left unset, in-memory SQLite databases get 'singleton' and
+    # everything else 'queue'
+    DATABASE_POOL = environ.get('DATABASE_POOL')
+    DATABASE_POOL_SIZE = int(environ.get('DATABASE_POOL_SIZE')) if environ.get('DATABASE_POOL_SIZE') else None
+    DATABASE_MAX_OVERFLOW = int(environ.get('DATABASE_MAX_OVERFLOW')) if environ.get('DATABASE_MAX_OVERFLOW') else None
+
+    # Pragmas applied to every SQLite connection as it is opened
+    SQLITE_JOURNAL_MODE = environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE = int(environ.get('SQLITE_CACHE_SIZE', -64000))         # negative sizes are in KiB
+    SQLITE_MMAP_SIZE = int(environ.get('SQLITE_MMAP_SIZE', 268435456))
+    SQLITE_TEMP_STORE = environ.get('SQLITE_TEMP_STORE', 'MEMORY')
+
+    # Search results cached by the database repository and how many seconds each is served for,
+    # a size of 0 turns the cache off
+    QUERY_CACHE_SIZE = int(environ.get('QUERY_CACHE_SIZE', 1024))
+    QUERY_CACHE_TTL = float(environ.get('QUERY_CACHE_TTL', 60))
+
+    # Seconds between the database repository's checks for writes by other processes, whose in-memory
+    # search indexes and book count are rebuilt after one
+    INDEX_TTL = float(environ.get('INDEX_TTL', 60))
@@ -3,14 +3,16 @@ import os
 from flask import Flask, url_for, request,send_from_directory
 
 # imports from SQLAlchemy
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, clear_mappers
-from sqlalchemy.pool import NullPool
 
 import library.adapters.repository as repo
 from library.adapters import memory_repository, database_repository, repository_populate
 from library.adapters.memory_repository import populate#, populate_books
-from library.adapters.orm import metadata, map_model_to_tables
+from library.adapters.database_engine import create_database_engine
+from library.adapters.query_cache import QueryCachingRepository, QUERY_CACHE_TTL
+from library.adapters.orm import metadata, map_model_to_tables, create_indexes, create_search_index, create_change_counter, add_missing_columns, books_table
+from library.adapters.database_populate import backfill_ebooks
+from library.adapters.snapshot import source_stamps
 
 def create_app(test_config=None):
     app = Flask(__name__)
@@ -26,34 +28,37 @@ def create_app(test_config=None):
         # populate(repo.repo_instance)
         tests = False
         
+    hash_workers = app.config.get('PASSWORD_HASH_WORKERS')
+    hash_chunksize = app.config.get('PASSWORD_HASH_CHUNKSIZE')
+
     if app.config['REPOSITORY'] == 'memory':
         # Create the MemoryRepository implementation for a memory-based repository.
         repo.repo_instance = memory_repository.MemoryRepository()
         # fill the content of the repository from the provided csv files (has to be done every time we start app!)
+        # unless a snapshot written from the same files is available.
         database_mode = False
-        if tests:
-            repository_populate.populate(repo.repo_instance, "test_folder\\tests")
-        else:
-            repository_populate.populate(repo.repo_instance,"library\\adapters")
+        data_path = "test_folder\\tests" if tests else "library\\adapters"
+        snapshot_path = app.config.get('MEMORY_SNAPSHOT')
+        if snapshot_path is None or not repo.repo_instance.load_snapshot(snapshot_path, source_stamps(repository_populate.source_files(data_path))):
+            repository_populate.populate(repo.repo_instance, data_path, hash_workers=hash_workers, hash_chunksize=hash_chunksize,
+                                         snapshot_path=snapshot_path)
+        # Work out every book's recommendation neighbours now rather than on the first page views.
+        repo.repo_instance.build_recommendations()
 
 
     elif app.config['REPOSITORY'] == 'database':
         # Configure database.
-        database_uri = app.config['SQLALCHEMY_DATABASE_URI']
-
         # We create a comparatively simple SQLite database, which is based on a single file (see .env for URI).
         # For example the file database could be located locally and relative to the application in covid-19.db,
         # leading to a URI of "sqlite:///covid-19.db".
         # Note that create_engine does not establish any actual DB connection directly!
-        database_echo = app.config['SQLALCHEMY_ECHO']
-        # Please do not change the settings for connect_args and poolclass!
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
-                                        echo=database_echo)
+        # Pooling and the SQLite pragmas come from the DATABASE_POOL and SQLITE_ settings in config.Config.
+        database_engine = create_database_engine(app.config)
 
         # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
         session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
-        repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory)
+        repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory, app.config.get('INDEX_TTL', database_repository.INDEX_TTL))
 
         if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
             print("REPOPULATING DATABASE...")
@@ -68,14 +73,27 @@ def create_app(test_config=None):
 
             database_mode = True
             if app.config['TESTING'] == 'True':
-                repository_populate.populate(repo.repo_instance,'tests', database_mode)
+                repository_populate.populate(repo.repo_instance,'tests', database_mode, hash_workers=hash_workers, hash_chunksize=hash_chunksize)
             else:
-                repository_populate.populate(repo.repo_instance,'library\\adapters', database_mode)
+                repository_populate.populate(repo.repo_instance,'library\\adapters', database_mode, hash_workers=hash_workers, hash_chunksize=hash_chunksize)
             print("REPOPULATING DATABASE... FINISHED")
 
         else:
+            # Databases created before the secondary and full-text indexes existed get them built from their current rows,
+            # and columns added since, filled in from the data files.
+            with database_engine.begin() as connection:
+                if books_table.c.ebook in add_missing_columns(connection):
+                    backfill_ebooks(connection, 'tests' if app.config['TESTING'] == 'True' else 'library\\adapters')
+                create_indexes(connection)
+                create_search_index(connection)
+                create_change_counter(connection)
             # Solely generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
+
+        # Repeated searches and the search form's name lists are answered from a cache that writes invalidate.
+        if app.config.get('QUERY_CACHE_SIZE'):
+            repo.repo_instance = QueryCachingRepository(repo.repo_instance, app.config['QUERY_CACHE_SIZE'],
+                                                        app.config.get('QUERY_CACHE_TTL', QUERY_CACHE_TTL))
     
     with app.app_context():
         from .books import book
@@ -93,6 +111,13 @@ def create_app(test_config=None):
         from .utilities import utilities
         app.register_blueprint(utilities.utilities_blueprint)
 
+        # Each request's thread gets its own database session the first time it uses one, which is removed,
+        # handing its connection back to the pool, when the request is over.
+        @app.teardown_appcontext
+        def shutdown_session(exception=None):
+            if app.config['REPOSITORY'] == 'database':
+                repo.repo_instance.close_session()
+
     @app.route('/favicon.ico')
     def favicon():
         return send_from_directory(os.path.join(app.root_path, 'static'), 'favicon.ico', mimetype='image/vnd.microsoft.icon')
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    # Bounded mapping that evicts the least recently used entry once maxsize is reached.
+    # Hits and misses are counted so the saving can be checked under load.
+
+    def __init__(self, maxsize: int = 1024):
+        if not isinstance(maxsize, int) or maxsize <= 0:
+            raise ValueError("maxsize must be a positive int")
+        self.__maxsize = maxsize
+        self.__entries = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    @property
+    def maxsize(self):
+        return self.__maxsize
+
+    @property
+    def hits(self):
+        return self.__hits
+
+    @property
+    def misses(self):
+        return self.__misses
+
+    @property
+    def stats(self):
+        return {'hits': self.__hits, 'misses': self.__misses, 'size': len(self.__entries), 'maxsize': self.__maxsize}
+
+    def get(self, key, default=None):
+        try:
+            value = self.__entries[key]
+        except KeyError:
+            self.__misses += 1
+            return default
+        self.__entries.move_to_end(key)
+        self.__hits += 1
+        return value
+
+    def put(self, key, value):
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+        if len(self.__entries) > self.__maxsize:
+            self.__entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self.__entries.pop(key, None)
+
+    def clear(self):
+        self.__entries.clear()
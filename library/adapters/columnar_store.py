@@ -0,0 +1,185 @@
+from typing import Callable, Optional
+
+import numpy as np
+
+UNKNOWN = -1
+
+
+class ColumnarBookStore:
+    # Book attributes kept as NumPy columns so filters run as vectorised boolean masks.
+    # Each book added takes the next row. Authors are stored in CSR form: the author ids of
+    # row i are author_ids[author_offsets[i]:author_offsets[i + 1]]. Unknown years, page
+    # counts, ebook flags and publishers are stored as -1.
+
+    def __init__(self, capacity: int = 1024):
+        capacity = max(capacity, 1)
+        self.__size = 0
+        self.__book_ids = np.empty(capacity, dtype=np.int64)
+        self.__release_years = np.empty(capacity, dtype=np.int32)
+        self.__num_pages = np.empty(capacity, dtype=np.int32)
+        self.__ebooks = np.empty(capacity, dtype=np.int8)
+        self.__publisher_codes = np.empty(capacity, dtype=np.int32)
+        self.__author_offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self.__author_ids = np.empty(capacity, dtype=np.int64)
+        self.__publisher_names = []
+        self.__publisher_codes_by_name = dict()
+        self.__rows = dict()
+
+    def __len__(self):
+        return self.__size
+
+    def __contains__(self, book_id: int):
+        return book_id in self.__rows
+
+    @property
+    def book_ids(self) -> np.ndarray:
+        return self.__book_ids[:self.__size]
+
+    @property
+    def release_years(self) -> np.ndarray:
+        return self.__release_years[:self.__size]
+
+    @property
+    def num_pages(self) -> np.ndarray:
+        return self.__num_pages[:self.__size]
+
+    @property
+    def ebooks(self) -> np.ndarray:
+        return self.__ebooks[:self.__size]
+
+    @property
+    def publisher_codes(self) -> np.ndarray:
+        return self.__publisher_codes[:self.__size]
+
+    def publisher_code(self, publisher_name: str) -> int:
+        return self.__publisher_codes_by_name.get(publisher_name, UNKNOWN)
+
+    def row(self, book_id: int) -> Optional[int]:
+        return self.__rows.get(book_id)
+
+    def add_book(self, book):
+        author_ids = [author.unique_id for author in book.authors]
+        row = self.__rows.get(book.book_id)
+        if row is not None:
+            if list(self.__row_author_ids(row)) != author_ids:
+                raise ValueError("Author changes to stored books are not supported")
+        else:
+            row = self.__size
+            self.__reserve(row + 1, int(self.__author_offsets[row]) + len(author_ids))
+            start = int(self.__author_offsets[row])
+            self.__author_ids[start:start + len(author_ids)] = author_ids
+            self.__author_offsets[row + 1] = start + len(author_ids)
+            self.__rows[book.book_id] = row
+            self.__size += 1
+
+        self.__book_ids[row] = book.book_id
+        self.__release_years[row] = UNKNOWN if book.release_year is None else book.release_year
+        self.__num_pages[row] = UNKNOWN if book.num_pages is None else book.num_pages
+        self.__ebooks[row] = UNKNOWN if book.ebook is None else int(book.ebook)
+        self.__publisher_codes[row] = self.__encode_publisher(book.publisher)
+
+    def mask(self, release_year_from: int = None, release_year_to: int = None, publisher_name: str = None,
+             ebook: bool = None, author_id: int = None) -> np.ndarray:
+        # One boolean per row, True for the books matching every given predicate.
+        mask = np.ones(self.__size, dtype=bool)
+        if release_year_from is not None or release_year_to is not None:
+            release_years = self.release_years
+            mask &= release_years != UNKNOWN
+            if release_year_from is not None:
+                mask &= release_years >= release_year_from
+            if release_year_to is not None:
+                mask &= release_years <= release_year_to
+        if publisher_name is not None:
+            code = self.publisher_code(publisher_name)
+            # an unknown name would otherwise match the books without a publisher
+            mask &= (self.publisher_codes == code) if code != UNKNOWN else False
+        if ebook is not None:
+            mask &= self.ebooks == int(ebook)
+        if author_id is not None:
+            mask &= self.__author_mask(author_id)
+        return mask
+
+    def select(self, release_year_from: int = None, release_year_to: int = None, publisher_name: str = None,
+               ebook: bool = None, author_id: int = None) -> np.ndarray:
+        # Rows of the books matching every given predicate, in ascending book id order.
+        return self.rows_of(self.mask(release_year_from, release_year_to, publisher_name, ebook, author_id))
+
+    def rows_of(self, mask: np.ndarray) -> np.ndarray:
+        rows = np.flatnonzero(mask)
+        return rows[np.argsort(self.__book_ids[rows], kind='stable')]
+
+    def book_ids_of(self, rows: np.ndarray) -> np.ndarray:
+        return self.__book_ids[rows]
+
+    def in_mask(self, mask: np.ndarray, book_id: int) -> bool:
+        row = self.__rows.get(book_id)
+        return row is not None and bool(mask[row])
+
+    def lazy_books(self, rows: np.ndarray, resolve: Callable) -> "LazyBooks":
+        return LazyBooks(self.__book_ids[rows], resolve)
+
+    def __author_mask(self, author_id: int) -> np.ndarray:
+        author_count = int(self.__author_offsets[self.__size])
+        positions = np.flatnonzero(self.__author_ids[:author_count] == author_id)
+        # Map each matching author position back to the row whose CSR range contains it.
+        rows = np.searchsorted(self.__author_offsets[1:self.__size + 1], positions, side='right')
+        mask = np.zeros(self.__size, dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def __row_author_ids(self, row: int) -> np.ndarray:
+        return self.__author_ids[self.__author_offsets[row]:self.__author_offsets[row + 1]]
+
+    def __encode_publisher(self, publisher) -> int:
+        if publisher is None:
+            return UNKNOWN
+        code = self.__publisher_codes_by_name.get(publisher.name)
+        if code is None:
+            code = len(self.__publisher_names)
+            self.__publisher_names.append(publisher.name)
+            self.__publisher_codes_by_name[publisher.name] = code
+        return code
+
+    def __reserve(self, rows: int, authors: int):
+        # Columns grow geometrically so appends stay amortised O(1).
+        if rows > len(self.__book_ids):
+            capacity = max(rows, 2 * len(self.__book_ids))
+            self.__book_ids = self.__grow(self.__book_ids, capacity)
+            self.__release_years = self.__grow(self.__release_years, capacity)
+            self.__num_pages = self.__grow(self.__num_pages, capacity)
+            self.__ebooks = self.__grow(self.__ebooks, capacity)
+            self.__publisher_codes = self.__grow(self.__publisher_codes, capacity)
+            self.__author_offsets = self.__grow(self.__author_offsets, capacity + 1)
+        if authors > len(self.__author_ids):
+            self.__author_ids = self.__grow(self.__author_ids, max(authors, 2 * len(self.__author_ids)))
+
+    @staticmethod
+    def __grow(column: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.empty(capacity, dtype=column.dtype)
+        grown[:len(column)] = column
+        return grown
+
+
+class LazyBooks:
+    # Sequence over a filter result that only resolves the Book objects actually read,
+    # so rendering one page of a large result touches only that page's books.
+
+    def __init__(self, book_ids: np.ndarray, resolve: Callable):
+        self.__book_ids = book_ids
+        self.__resolve = resolve
+
+    def __len__(self):
+        return len(self.__book_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.__resolve(int(book_id)) for book_id in self.__book_ids[index]]
+        return self.__resolve(int(self.__book_ids[index]))
+
+    def __iter__(self):
+        for book_id in self.__book_ids:
+            yield self.__resolve(int(book_id))
+
+    @property
+    def book_ids(self) -> np.ndarray:
+        return self.__book_ids
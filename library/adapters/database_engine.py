@@ -0,0 +1,76 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+
+# Pool used for each DATABASE_POOL setting. 'singleton' shares one connection between every thread,
+# which is what keeps an in-memory SQLite database alive and the same for every request.
+POOL_CLASSES = {'null': NullPool, 'queue': QueuePool, 'singleton': StaticPool}
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+TEMP_STORES = {'DEFAULT', 'FILE', 'MEMORY'}
+
+
+def is_in_memory(database_uri: str) -> bool:
+    url = make_url(database_uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def sqlite_pragmas(config) -> list:
+    # The PRAGMA statements run on every new SQLite connection, settings left as None keep SQLite's default.
+    pragmas = []
+    journal_mode = config.get('SQLITE_JOURNAL_MODE')
+    if journal_mode is not None:
+        pragmas.append('PRAGMA journal_mode = ' + checked(journal_mode.upper(), JOURNAL_MODES, 'SQLITE_JOURNAL_MODE'))
+    synchronous = config.get('SQLITE_SYNCHRONOUS')
+    if synchronous is not None:
+        pragmas.append('PRAGMA synchronous = ' + checked(synchronous.upper(), SYNCHRONOUS_MODES, 'SQLITE_SYNCHRONOUS'))
+    for setting, pragma in [('SQLITE_CACHE_SIZE', 'cache_size'), ('SQLITE_MMAP_SIZE', 'mmap_size')]:
+        if config.get(setting) is not None:
+            pragmas.append('PRAGMA ' + pragma + ' = ' + str(int(config.get(setting))))
+    temp_store = config.get('SQLITE_TEMP_STORE')
+    if temp_store is not None:
+        pragmas.append('PRAGMA temp_store = ' + checked(temp_store.upper(), TEMP_STORES, 'SQLITE_TEMP_STORE'))
+    return pragmas
+
+
+def checked(value: str, allowed: set, setting: str) -> str:
+    if value not in allowed:
+        raise ValueError(setting + " must be one of " + ", ".join(sorted(allowed)))
+    return value
+
+
+def create_database_engine(config):
+    # Engine for SQLALCHEMY_DATABASE_URI pooled as DATABASE_POOL says, by default a single shared
+    # connection for in-memory SQLite and a QueuePool otherwise, sized by DATABASE_POOL_SIZE and
+    # DATABASE_MAX_OVERFLOW when they are set.
+    # SQLite connections get the configured pragmas as they are opened; WAL lets readers carry on
+    # while a review is being written.
+    database_uri = config['SQLALCHEMY_DATABASE_URI']
+    in_memory = is_in_memory(database_uri)
+    pool = config.get('DATABASE_POOL') or ('singleton' if in_memory else 'queue')
+    if pool not in POOL_CLASSES:
+        raise ValueError("DATABASE_POOL must be one of " + ", ".join(sorted(POOL_CLASSES)))
+
+    options = {'echo': config.get('SQLALCHEMY_ECHO', False), 'poolclass': POOL_CLASSES[pool]}
+    if pool == 'queue':
+        if config.get('DATABASE_POOL_SIZE') is not None:
+            options['pool_size'] = config.get('DATABASE_POOL_SIZE')
+        if config.get('DATABASE_MAX_OVERFLOW') is not None:
+            options['max_overflow'] = config.get('DATABASE_MAX_OVERFLOW')
+    sqlite = make_url(database_uri).get_backend_name() == 'sqlite'
+    if sqlite:
+        options['connect_args'] = {"check_same_thread": False}
+    engine = create_engine(database_uri, **options)
+
+    if sqlite:
+        # An in-memory database has no journal file to put in WAL mode.
+        pragmas = [pragma for pragma in sqlite_pragmas(config) if not (in_memory and pragma.startswith('PRAGMA journal_mode'))]
+
+        @event.listens_for(engine, 'connect')
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+    return engine
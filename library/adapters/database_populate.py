@@ -0,0 +1,124 @@
+import ast
+
+from sqlalchemy import bindparam
+from tqdm import tqdm
+
+from library.adapters.jsondatareader import BooksJSONReader
+from library.adapters.orm import (
+    authors_table, books_authors_table, books_table, create_indexes, create_search_index, drop_indexes, drop_search_index,
+    publishers_table, reviews_table, user_reading_list_table, users_table
+)
+from library.adapters.repository_populate import (
+    REVIEW_BATCH_SIZE, batched, hash_passwords, make_reviews, read_csv_file
+)
+from library.domain.model import User
+
+# Rows sent to the database per executemany call
+INSERT_BATCH_SIZE = 1000
+
+
+def insert_rows(connection, table, rows):
+    for batch in batched(rows, INSERT_BATCH_SIZE):
+        connection.execute(table.insert(), batch)
+
+
+def load_books(connection, data_path: str) -> dict:
+    # Writes books with their publishers, authors and author links in file order, a publisher or
+    # author is written with the first book that mentions it. Returns the books by id.
+    print("Loading Books")
+    json_reader = BooksJSONReader(books_file_name=data_path + "\\data\\books.json",
+                                  authors_file_name=data_path + "\\data\\authors.json")
+    books = dict()
+    publisher_names = set()
+    author_ids = set()
+    for batch in batched(tqdm(json_reader.iter_books()), INSERT_BATCH_SIZE):
+        publisher_rows, author_rows, book_rows, book_author_rows = [], [], [], []
+        for book in batch:
+            if book.book_id in books:
+                continue
+            books[book.book_id] = book
+
+            publisher = book.publisher
+            if publisher is not None and publisher.name not in publisher_names:
+                publisher_names.add(publisher.name)
+                publisher_rows.append({'name': publisher.name, 'id': hash(publisher)})
+            for author in book.authors:
+                if author.unique_id not in author_ids:
+                    author_ids.add(author.unique_id)
+                    author_rows.append({'id': author.unique_id, 'name': author.full_name})
+                book_author_rows.append({'book_id': book.book_id, 'author_id': author.unique_id})
+
+            # Unknown years are stored as the column default like the ORM does.
+            book_rows.append({
+                'id': book.book_id,
+                'release_year': 0 if book.release_year is None else book.release_year,
+                'title': book.title,
+                'description': book.description,
+                'publisher_name': getattr(book, 'publisher_name', None),
+                'ebook': book.ebook,
+            })
+        insert_rows(connection, publishers_table, publisher_rows)
+        insert_rows(connection, authors_table, author_rows)
+        insert_rows(connection, books_table, book_rows)
+        insert_rows(connection, books_authors_table, book_author_rows)
+    return books
+
+
+def backfill_ebooks(connection, data_path: str):
+    # Sets the ebook flag of books stored before the column existed, from the books file they were loaded from.
+    json_reader = BooksJSONReader(books_file_name=data_path + "\\data\\books.json",
+                                  authors_file_name=data_path + "\\data\\authors.json")
+    statement = books_table.update().where(books_table.c.id == bindparam('book_id')).values(ebook=bindparam('ebook'))
+    for batch in batched(json_reader.iter_books(), INSERT_BATCH_SIZE):
+        connection.execute(statement, [{'book_id': book.book_id, 'ebook': book.ebook} for book in batch])
+
+
+def load_users(connection, data_path: str, books: dict, hash_workers: int = None, hash_chunksize: int = None):
+    print("Loading Users")
+    data_rows = list(read_csv_file(data_path + "\\data\\users.csv"))
+    passwords = hash_passwords([data_row[2] for data_row in data_rows], hash_workers, hash_chunksize)
+
+    users = []
+    for data_row, password in zip(data_rows, passwords):
+        user = User(user_name=data_row[1], password=password, user_id=int(data_row[0]))
+        for book_id in ast.literal_eval(data_row[3]):
+            user.add_book_to_reading_list(books.get(book_id))
+        users.append(user)
+
+    insert_rows(connection, users_table, [
+        {'id': user.user_id, 'user_name': user.user_name, 'password': user.password} for user in users
+    ])
+    insert_rows(connection, user_reading_list_table, [
+        {'book_id': book.book_id, 'user_id': user.user_id} for user in users for book in user.reading_list
+    ])
+    return users
+
+
+def load_reviews(connection, data_path: str, books: dict, users):
+    print("Loading Reviews")
+    users_by_name = {user.user_name: user for user in users}
+    for data_rows in batched(tqdm(read_csv_file(data_path + "\\data\\reviews.csv")), REVIEW_BATCH_SIZE):
+        # Review ids are left to the database, as they are when reviews are added through the ORM.
+        connection.execute(reviews_table.insert(), [{
+            'review_text': review.review_text,
+            'rating': review.rating,
+            'timestamp': review.timestamp,
+            'book_id': None if review.book is None else review.book.book_id,
+            'user_name': review.user_associated.user_name,
+        } for review in make_reviews(data_rows, books, users_by_name)])
+
+
+def populate(engine, data_path: str, lite: bool = False, hash_workers: int = None, hash_chunksize: int = None):
+    # Loads the data files into empty tables in one transaction with batched executemany calls
+    # instead of one ORM flush and commit per object. The full-text index is dropped while loading
+    # so its triggers do not run per row, and rebuilt from the loaded rows at the end. The secondary
+    # indexes are likewise built once over the loaded rows rather than updated on every insert.
+    with engine.begin() as connection:
+        drop_search_index(connection)
+        drop_indexes(connection)
+        books = load_books(connection, data_path)
+        if not lite:
+            users = load_users(connection, data_path, books, hash_workers, hash_chunksize)
+            load_reviews(connection, data_path, books, users)
+        create_indexes(connection)
+        create_search_index(connection)
@@ -1,19 +1,99 @@
 from datetime import date
-from typing import List
+from typing import List, Optional
 from unicodedata import name
 
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, func
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
-from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import scoped_session, selectinload, joinedload
 from flask import _app_ctx_stack
 
-from random import sample
+from random import random
+from time import monotonic
+from contextlib import contextmanager
 
 from sqlalchemy.sql import base
 from sqlalchemy.sql.schema import Table
 from library.domain.model import User, Book, Review, Author,Publisher
-from library.adapters.repository import AbstractRepository, RepositoryException
+from library.adapters.repository import AbstractRepository, RepositoryException, BookPage, PAGE_SIZE, last_page, page_of_ids, page_of_order
+from library.adapters.trigram_index import TrigramIndex
+from library.adapters.fulltext_index import FullTextIndex, tokenize
+from library.adapters.recommendations import AUTHOR_WEIGHT, PUBLISHER_WEIGHT, RELEASE_YEAR_WEIGHT, RECOMMENDATION_CACHE_SIZE
+from library.adapters.cache import LRUCache
+from library.adapters.sort_orders import SortOrders, sort_row
+from library.adapters.query_planner import BookQuery
+from library.adapters.prefix_index import CompletionIndex, COMPLETIONS
+from library.adapters.fuzzy_index import SuggestionIndex, SUGGESTIONS
+from library.adapters.orm import BOOK_AUTHOR_NAMES, BOOK_FIRST_AUTHOR_NAME, books_authors_table
+
+# Scores every book against a user's reading list with the weights in recommendations.py and returns the
+# best (book id, score) pairs, ties in book id order. Each way a book resembles a reading-list book is one
+# weighted row, so the books sharing a year or publisher are only counted, never loaded. Unknown release years
+# are stored as 0 and are near no other year, as in memory.
+RECOMMENDATION_QUERY = (
+    'WITH reading_list AS ('
+    'SELECT DISTINCT books.id, books.release_year, books.publisher_name FROM users '
+    'JOIN user_reading_list ON user_reading_list.user_id = users.id JOIN books ON books.id = user_reading_list.book_id '
+    'WHERE lower(users.user_name) = :user_name), '
+    'matches AS ('
+    'SELECT other.book_id AS book_id, :author_weight AS weight FROM reading_list '
+    'JOIN books_authors AS mine ON mine.book_id = reading_list.id '
+    'JOIN books_authors AS other ON other.author_id = mine.author_id '
+    'UNION ALL '
+    'SELECT books.id, :release_year_weight FROM reading_list '
+    'JOIN books ON books.release_year BETWEEN reading_list.release_year - 1 AND reading_list.release_year + 1 '
+    'AND reading_list.release_year > 0 AND books.release_year > 0 '
+    'UNION ALL '
+    'SELECT books.id, :publisher_weight FROM reading_list JOIN books ON books.publisher_name = reading_list.publisher_name) '
+    'SELECT book_id, SUM(weight) AS score FROM matches WHERE book_id NOT IN (SELECT id FROM reading_list) '
+    'GROUP BY book_id ORDER BY score DESC, book_id LIMIT :limit'
+)
+
+# Picks random book ids without reading the whole table. Each draw is a random fraction of the way from
+# the smallest to the largest book id and takes the first book at or after that id, one seek on the
+# primary key. Tables too small or clustered for the draws to find enough distinct books are topped up in
+# random order; the top up is skipped entirely when its limit comes to zero.
+RANDOM_BOOKS_QUERY = (
+    'WITH bounds AS (SELECT min(id) AS low, max(id) - min(id) + 1 AS span FROM books), '
+    'draws(fraction) AS (VALUES {draws}), '
+    'picked AS ('
+    'SELECT DISTINCT (SELECT id FROM books WHERE id >= bounds.low + CAST(draws.fraction * bounds.span AS INTEGER) '
+    'ORDER BY id LIMIT 1) AS id FROM bounds, draws WHERE bounds.low IS NOT NULL LIMIT :limit) '
+    'SELECT id FROM picked '
+    'UNION ALL '
+    'SELECT id FROM (SELECT id FROM books WHERE id NOT IN (SELECT id FROM picked) '
+    'ORDER BY random() LIMIT :limit - (SELECT count(*) FROM picked))'
+)
+
+# Values the search forms complete, each with its popularity: an author's and a publisher's books, a title's
+# reviews plus one so that unreviewed titles still complete
+COMPLETION_QUERIES = {
+    'author': 'SELECT authors.name, count(books_authors.id) FROM authors '
+              'LEFT JOIN books_authors ON books_authors.author_id = authors.id GROUP BY authors.id',
+    'author_id': 'SELECT CAST(authors.id AS TEXT), count(books_authors.id) FROM authors '
+                 'LEFT JOIN books_authors ON books_authors.author_id = authors.id GROUP BY authors.id',
+    'publisher': 'SELECT publishers.name, count(books.id) FROM publishers '
+                 'LEFT JOIN books ON books.publisher_name = publishers.name GROUP BY publishers.name',
+    'title': 'SELECT books.title, 1 + (SELECT count(*) FROM reviews WHERE reviews.book_id = books.id) FROM books',
+}
+
+# Most title index candidates a multi-criteria search passes to SQL as a list of ids
+TITLE_CANDIDATE_LIMIT = 500
+
+# Random ids drawn per requested book, spare draws make up for two draws landing on the same book
+RANDOM_DRAWS_PER_BOOK = 2
+
+# Row counts of every table the in-process indexes and caches are read from, and the count of rows changed in
+# them kept by orm.create_change_counter, which updates move on too. Writes by other processes sharing the
+# database change the fingerprint, which is noticed at most INDEX_TTL seconds later, or at this repository's
+# next own write.
+TABLES_FINGERPRINT_QUERY = (
+    'SELECT (SELECT count(*) FROM books), (SELECT max(id) FROM books), (SELECT count(*) FROM books_authors), '
+    '(SELECT count(*) FROM authors), (SELECT count(*) FROM publishers), (SELECT count(*) FROM reviews), '
+    '(SELECT count(*) FROM user_reading_list), (SELECT coalesce(max(changes), 0) FROM table_changes)'
+)
+
+INDEX_TTL = 60      # seconds between checks that no other process has written to the tables
 
 class SessionContextManager:
     def __init__(self, session_factory):
@@ -37,20 +117,77 @@ class SessionContextManager:
         self.__session.rollback()
 
     def reset_session(self):
-        # this method can be used e.g. to allow Flask to start a new session for each http request,
-        # via the 'before_request' callback
+        # The calling thread's next use of the session starts a new one. The registry is kept for the life of
+        # the repository, so requests running on other threads keep their sessions.
         self.close_current_session()
-        self.__session = scoped_session(self.__session_factory, scopefunc=_app_ctx_stack.__ident_func__)
 
     def close_current_session(self):
+        # Closes and discards the calling thread's session, handing its connection back to the pool.
         if not self.__session is None:
-            self.__session.close()
+            self.__session.remove()
 
 
 class SqlAlchemyRepository(AbstractRepository):
 
-    def __init__(self, session_factory):
+    def __init__(self, session_factory, index_ttl: float = INDEX_TTL):
         self._session_cm = SessionContextManager(session_factory)
+        self.__index_ttl = index_ttl
+        self.__fingerprint = None
+        self.__checked_at = None
+        self.__title_index = None
+        self.__text_index = None
+        self.__has_search_index = None
+        self.__number_of_books = None
+        self.__sort_orders = None
+        self.__completion_index = None
+        self.__suggestion_index = None
+        self.__recommendation_cache = LRUCache(RECOMMENDATION_CACHE_SIZE)
+
+    def __check_tables(self):
+        # The indexes, the book count and the recommendations are kept current by this repository's own
+        # writes. At most once every index_ttl seconds the tables' fingerprint is read, and if another
+        # process has written to them since, everything is dropped to be built again on next use.
+        if self.__fingerprint is not None and monotonic() - self.__checked_at < self.__index_ttl:
+            return
+        fingerprint = self.__read_fingerprint()
+        if self.__fingerprint is not None and fingerprint != self.__fingerprint:
+            self.__drop_indexes()
+        self.__fingerprint = fingerprint
+        self.__checked_at = monotonic()
+
+    def __read_fingerprint(self):
+        return tuple(self._session_cm.session.execute(TABLES_FINGERPRINT_QUERY).first())
+
+    def __drop_indexes(self):
+        self.__title_index = None
+        self.__text_index = None
+        self.__number_of_books = None
+        self.__sort_orders = None
+        self.__completion_index = None
+        self.__suggestion_index = None
+        self.__recommendation_cache.clear()
+
+    @contextmanager
+    def __writing(self):
+        # Runs one of this repository's own writes in a transaction that holds SQLite's write lock from its start,
+        # reading the fingerprint before the write and after it. No other process can write in between, so the
+        # difference is this write alone and the fingerprint after it is the one to expect. A fingerprint that
+        # had moved on before the write means another process wrote since the last check, and everything is
+        # dropped as a check would, rather than taken in with the write. Writes put themselves in the indexes.
+        with self._session_cm as scm:
+            connection = scm.session.connection()
+            # the SQLite driver itself only begins a transaction at the first INSERT, UPDATE or DELETE
+            if connection.dialect.name == 'sqlite' and not connection.connection.in_transaction:
+                connection.exec_driver_sql('BEGIN IMMEDIATE')
+            before = self.__read_fingerprint()
+            yield scm
+            scm.session.flush()
+            after = self.__read_fingerprint()
+            scm.commit()
+        if self.__fingerprint is not None and before != self.__fingerprint:
+            self.__drop_indexes()
+        self.__fingerprint = after
+        self.__checked_at = monotonic()
 
     def close_session(self):
         self._session_cm.close_current_session()
@@ -60,6 +197,10 @@ class SqlAlchemyRepository(AbstractRepository):
 
 ########################################        Users
 
+    @property
+    def engine(self):
+        return self._session_cm.session.get_bind()
+
     def add_user(self, user: User):
         if self._session_cm.session.query(User).filter(User._User__user_id == user.user_id).first() == None:
             with self._session_cm as scm:
@@ -81,7 +222,7 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_user(self, user_name: str) -> User:
         user = None
         try:
-            user = self._session_cm.session.query(User).filter(User._User__user_name == user_name.lower()).one()
+            user = self._session_cm.session.query(User).filter(func.lower(User._User__user_name) == user_name.lower()).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -91,19 +232,92 @@ class SqlAlchemyRepository(AbstractRepository):
 ########################################        Books
 
     def add_book(self, book: Book):
-        with self._session_cm as scm:
-            # print(book.authors)
-            self.add_publisher(book.publisher)
-            # for authors in book.authors:
-            #     self.add_author(authors)
-            
+        # print(book.authors)
+        self.add_publisher(book.publisher)
+        # for authors in book.authors:
+        #     self.add_author(authors)
+        with self.__writing() as scm:
             scm.session.add(book)
-            scm.commit()
-            
+        self.__number_of_books = None
+        if self.__title_index is not None:
+            self.__title_index.add(book.book_id, book.title)
+        if self.__text_index is not None:
+            self.__text_index.add_book(book)
+        if self.__sort_orders is not None:
+            self.__sort_orders.add(*sort_row(book))
+        if self.__completion_index is not None:
+            self.__completion_index.add_book(book)
+        if self.__suggestion_index is not None:
+            self.__suggestion_index.add_book(book)
+        self.__recommendation_cache.clear()
+
+    @property
+    def title_index(self):
+        # Built from the books table on first use, then kept current by add_book.
+        self.__check_tables()
+        if self.__title_index is None:
+            title_index = TrigramIndex()
+            title_index.add_all(self._session_cm.session.execute('SELECT id, title FROM books'))
+            self.__title_index = title_index
+        return self.__title_index
+
+    @property
+    def has_search_index(self):
+        # True when the database carries the books_fts table created by orm.create_search_index.
+        if self.__has_search_index is None:
+            self.__has_search_index = self._session_cm.session.get_bind().dialect.name == 'sqlite' and self._session_cm.session.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'").scalar() > 0
+        return self.__has_search_index
+
+    @property
+    def text_index(self):
+        # Only used for databases without books_fts. Built from the stored books and reviews on first use,
+        # then kept current by add_book and add_review.
+        self.__check_tables()
+        if self.__text_index is None:
+            text_index = FullTextIndex()
+            rows = self._session_cm.session.execute('SELECT books.id, books.title, ' + BOOK_AUTHOR_NAMES.format(book_id='books.id') + ', books.description FROM books')
+            text_index.add_all((row[0], ' '.join(field for field in row[1:] if field)) for row in rows)
+            text_index.add_all(self._session_cm.session.execute('SELECT book_id, review_text FROM reviews ORDER BY id'))
+            self.__text_index = text_index
+        return self.__text_index
+
+    def __books_query(self):
+        # Publishers are joined in and authors fetched for all the books in one extra SELECT,
+        # not lazily one book at a time when a page shows them.
+        return self._session_cm.session.query(Book).options(
+            selectinload(Book._Book__authors), joinedload(Book._Book__publisher))
+
+    def __book_page_query(self):
+        # A single book is shown with its reviews and who wrote them, so those come with it too.
+        return self._session_cm.session.query(Book).options(
+            selectinload(Book._Book__authors), joinedload(Book._Book__publisher),
+            selectinload(Book._Book__reviews).joinedload(Review._Review__user_associated))
+
+    def __books_by_author(self):
+        # Books in the order they were linked to the author.
+        return self.__books_query().join(books_authors_table, books_authors_table.c.book_id == Book._Book__book_id).order_by(
+            books_authors_table.c.id)
+
+    def __get_books_with_ids(self, id_list: List[int]):
+        books = []
+        for start in range(0, len(id_list), 500):
+            books.extend(self.__books_query().filter(Book._Book__book_id.in_(id_list[start:start + 500])).order_by(Book._Book__book_id).all())
+        return books
+
+    def get_books_by_ids(self, id_list: List[int]) -> List[Book]:
+        # Books with the given ids that exist, in id order.
+        return self.__get_books_with_ids(sorted(set(id_list)))
+
+    def __books_with_ranking(self, ranking: List[int]):
+        # Books with the ids in ranking, in ranking order.
+        books = {book.book_id: book for book in self.__get_books_with_ids(sorted(set(ranking)))}
+        return [books[book_id] for book_id in ranking if book_id in books]
+
     def get_book(self, id: int) -> Book:
         book = None
         try:
-            book = self._session_cm.session.query(Book).filter(Book._Book__book_id == id).one()
+            book = self.__book_page_query().filter(Book._Book__book_id == id).one()
 
         except NoResultFound:
             # Ignore any exception and return None.
@@ -111,8 +325,11 @@ class SqlAlchemyRepository(AbstractRepository):
         return book
     
     def get_number_of_books(self):
-        number_of_books = self._session_cm.session.query(Book).count()
-        return number_of_books
+        # Counted once, then kept current by add_book.
+        self.__check_tables()
+        if self.__number_of_books is None:
+            self.__number_of_books = self._session_cm.session.query(Book).count()
+        return self.__number_of_books
 
     def get_first_book(self):
         book = self._session_cm.session.query(Book).first()
@@ -133,39 +350,21 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_books_by_author_name(self,author_name: str):
         if not isinstance(author_name,str) or author_name == "":
             return []
-        row = self._session_cm.session.execute('SELECT id FROM authors WHERE authors.name = :author_name',{'author_name':author_name}).fetchone()
-        if row is None:
-            return []
-        else:
-            author_id = int(row[0])
-            row = self._session_cm.session.execute('SELECT books.id from books INNER JOIN books_authors WHERE books_authors.author_id = :author_id AND books_authors.book_id = books.id',{'author_id':author_id}).fetchall()
-            if row is None:
-                return []
-            else:
-                return_books = []
-                for i in range(len(row)):
-                    return_books.append(self._session_cm.session.query(Book).filter(Book._Book__book_id == int(row[i][0])).one())
-                return return_books
+        return self.__books_by_author().join(Author, Author._Author__unique_id == books_authors_table.c.author_id).filter(
+            Author._Author__author_full_name == author_name).all()
 
     def get_books_by_author_id(self,author_id:int):
         if not isinstance(author_id,int) or author_id < 0:
             return []
-        row = self._session_cm.session.execute('SELECT books.id from books INNER JOIN books_authors WHERE books_authors.author_id = :author_id AND books_authors.book_id = books.id',{'author_id':author_id}).fetchall()
-        if row is None:
-            return []
-        else:
-            return_books = []
-            for i in range(len(row)):
-                return_books.append(self._session_cm.session.query(Book).filter(Book._Book__book_id == int(row[i][0])).one())
-            return return_books
+        return self.__books_by_author().filter(books_authors_table.c.author_id == author_id).all()
 
     def get_books_by_release_year(self, target_date: int) -> List[Book]:
         if target_date is None:
-            books = self._session_cm.session.query(Book).all()
+            books = self.__books_query().all()
             return books
         else:
             # Return books matching target_date; return an empty list if there are no matches.
-            books = self._session_cm.session.query(Book).filter(Book._Book__release_year == target_date).all()
+            books = self.__books_query().filter(Book._Book__release_year == target_date).all()
             #BANDAID FIX REMEMBER TO FIX ME
             # books = [book for book in self._session_cm.session.query(Book).all() if book.release_year == target_date]
             
@@ -175,49 +374,192 @@ class SqlAlchemyRepository(AbstractRepository):
         if title is None:
             return []
         else:
-            books = self._session_cm.session.query(Book).filter(Book._Book__title == title).all()
+            books = self.__books_query().filter(Book._Book__title == title).all()
             return books
 
     def get_book_by_title_general(self,title:str):
         if title is None:
             return []
         else:
-            
-            
-            books = self._session_cm.session.query(Book).filter(Book._Book__title.contains(title)).all()
-            #BANDAID FIX REMEMBER TO FIX ME
-            # books = [book for book in self._session_cm.session.query(Book).all() if title.lower() in book.title.lower()]
-            
-            return books
+            return self.__get_books_with_ids(self.title_index.search(title))
 
     def get_books_by_publisher_name(self,publisher_name:str):
         if publisher_name is None:
             return []
         else:
             # Return books matching publisher_name; return an empty list if there are no matches.
-            books = self._session_cm.session.query(Book).filter(Book.publisher_name == publisher_name).all()
+            books = self.__books_query().filter(Book.publisher_name == publisher_name).all()
             #BANDAID FIX REMEMBER TO FIX ME
             # books = [book for book in self._session_cm.session.query(Book).all() if book.release_year == publisher_name]
             
             return books
 
+    def search_books_by_text(self,query:str,no_of_books:int = 10):
+        return self.__books_with_ranking(self.__text_ranking(query,no_of_books))
+
+    def __text_ranking(self,query:str,no_of_books:int = 10):
+        if query is None:
+            return []
+        if self.has_search_index:
+            terms = list(dict.fromkeys(tokenize(query)))
+            if len(terms) == 0:
+                return []
+            return [row[0] for row in self._session_cm.session.execute(
+                'SELECT rowid FROM books_fts WHERE books_fts MATCH :terms ORDER BY rank LIMIT :limit',
+                {'terms': ' OR '.join('"{}"'.format(term) for term in terms), 'limit': no_of_books})]
+        return [book_id for book_id, score in self.text_index.search(query, no_of_books)]
+
     def get_all_books(self):
-        books = self._session_cm.session.query(Book).all()
+        books = self.__books_query().all()
         return books
+
+    def get_books_page(self, page: int = 1, page_size: int = PAGE_SIZE, after: int = None, before: int = None,
+                       sort: str = 'id', descending: bool = False) -> BookPage:
+        # Keyset pagination on books.id: a cursor finds its page with one seek on the primary key. Without one,
+        # or with one past either end, the page is counted off the primary key index by its number.
+        # Other orders are slices of the sort orders kept in memory.
+        if sort != 'id' or descending:
+            return page_of_order(self.sort_orders, sort, descending, page, page_size, after, before, self.__books_with_ranking)
+        total = self.get_number_of_books()
+        page = min(max(page, 1), last_page(total, page_size))
+        book_ids = []
+        if after is not None:
+            book_ids = [row[0] for row in self._session_cm.session.execute(
+                'SELECT id FROM books WHERE id > :after ORDER BY id LIMIT :limit', {'after': after, 'limit': page_size + 1})]
+        elif before is not None:
+            book_ids = [row[0] for row in self._session_cm.session.execute(
+                'SELECT id FROM books WHERE id < :before ORDER BY id DESC LIMIT :limit', {'before': before, 'limit': page_size})][::-1]
+            # The book the cursor came from follows this page.
+            book_ids = book_ids + [before] if len(book_ids) == page_size else []
+        if len(book_ids) == 0:
+            book_ids = [row[0] for row in self._session_cm.session.execute(
+                'SELECT id FROM books ORDER BY id LIMIT :limit OFFSET :offset', {'limit': page_size + 1, 'offset': (page - 1) * page_size})]
+        cursor = book_ids[page_size - 1] if len(book_ids) > page_size else None
+        return BookPage(self.__books_with_ranking(book_ids[0:page_size]), page, page_size, total, cursor)
+
+    @property
+    def sort_orders(self) -> SortOrders:
+        # Built from the books table on first use, then kept current by add_book.
+        self.__check_tables()
+        if self.__sort_orders is None:
+            sort_orders = SortOrders()
+            sort_orders.add_all(self._session_cm.session.execute(
+                'SELECT books.id, books.title, ' + BOOK_FIRST_AUTHOR_NAME.format(book_id='books.id')
+                + ', books.publisher_name, books.release_year FROM books'))
+            self.__sort_orders = sort_orders
+        return self.__sort_orders
+
+    def search_book_ids(self, search: str, *args) -> List[int]:
+        # The ids alone are read for every match, the books are only loaded for the page shown.
+        return list(dict.fromkeys(getattr(self, '_SqlAlchemyRepository__' + search + '_ids')(*args)))
+
+    def search_books_page(self, search: str, *args, page: int = 1, page_size: int = PAGE_SIZE,
+                          sort: str = None, descending: bool = False) -> BookPage:
+        book_ids = self.search_book_ids(search, *args)
+        if sort is not None:
+            book_ids = self.sort_orders.sorted(sort, book_ids, descending)
+        return page_of_ids(book_ids, page, page_size, self.__books_with_ranking)
+
+    def __author_id_ids(self, author_id: int):
+        if not isinstance(author_id,int) or author_id < 0:
+            return []
+        return [row[0] for row in self._session_cm.session.execute(
+            'SELECT book_id FROM books_authors WHERE author_id = :author_id ORDER BY id', {'author_id': author_id})]
+
+    def __author_name_ids(self, author_name: str):
+        if not isinstance(author_name,str) or author_name == "":
+            return []
+        return [row[0] for row in self._session_cm.session.execute(
+            'SELECT books_authors.book_id FROM books_authors JOIN authors ON authors.id = books_authors.author_id '
+            'WHERE authors.name = :author_name ORDER BY books_authors.id', {'author_name': author_name})]
+
+    def __release_year_ids(self, target_date: int):
+        if target_date is None:
+            return [row[0] for row in self._session_cm.session.execute('SELECT id FROM books ORDER BY id')]
+        return [row[0] for row in self._session_cm.session.execute(
+            'SELECT id FROM books WHERE release_year = :release_year ORDER BY id', {'release_year': target_date})]
+
+    def __title_ids(self, title: str):
+        if title is None:
+            return []
+        return sorted(self.title_index.search(title))
+
+    def __publisher_ids(self, publisher_name: str):
+        if publisher_name is None:
+            return []
+        return [row[0] for row in self._session_cm.session.execute(
+            'SELECT id FROM books WHERE publisher_name = :publisher_name ORDER BY id', {'publisher_name': publisher_name})]
+
+    def __text_ids(self, query: str, no_of_books: int = 10):
+        return self.__text_ranking(query, no_of_books)
+
+    def __criteria_ids(self, query: BookQuery):
+        # One statement with a condition per criterion. SQLite's planner starts from whichever of their
+        # indexes it judges most selective, equality on an indexed column ahead of a range, and checks the
+        # other conditions on the rows it finds. Title matches come from the trigram index: a short candidate list drives the
+        # statement by primary key, a long one is intersected with its results instead.
+        conditions = []
+        if query.author_name is not None:
+            conditions.append('books.id IN (SELECT books_authors.book_id FROM books_authors JOIN authors ON authors.id = books_authors.author_id '
+                              'WHERE authors.name = :author_name)')
+        if query.author_id is not None:
+            conditions.append('books.id IN (SELECT book_id FROM books_authors WHERE author_id = :author_id)')
+        if query.release_year_from is not None or query.release_year_to is not None:
+            # Unknown years are stored as 0, and match no range, as in the memory repository.
+            conditions.append('books.release_year > 0')
+        if query.release_year_from is not None:
+            conditions.append('books.release_year >= :release_year_from')
+        if query.release_year_to is not None:
+            conditions.append('books.release_year <= :release_year_to')
+        if query.publisher_name is not None:
+            conditions.append('books.publisher_name = :publisher_name')
+        if query.ebook is not None:
+            conditions.append('books.ebook = :ebook')
+        title_ids = None
+        if query.title is not None:
+            if self.title_index.estimate(query.title) <= TITLE_CANDIDATE_LIMIT or len(conditions) == 0:
+                title_ids = self.title_index.search(query.title)
+                if len(conditions) == 0 or len(title_ids) == 0:
+                    return title_ids
+                conditions.append('books.id IN (' + ', '.join(str(int(book_id)) for book_id in title_ids) + ')')
+        statement = 'SELECT books.id FROM books' + (' WHERE ' + ' AND '.join(conditions) if len(conditions) > 0 else '') + ' ORDER BY books.id'
+        book_ids = [row[0] for row in self._session_cm.session.execute(statement, query._asdict())]
+        if query.title is not None and title_ids is None:
+            book_ids = [book_id for book_id in book_ids if self.title_index.matches(book_id, query.title)]
+        return book_ids
+
+    def find_books(self, query: BookQuery) -> List[Book]:
+        return self.__books_with_ranking(self.__criteria_ids(query))
     
 ########################################        Reviews
 
     def add_review(self, review: Review):
         if review.user_associated == None:
             raise RepositoryException
-        with self._session_cm as scm:          
+        with self.__writing() as scm:
             scm.session.add(review)
-            scm.commit()
+        if self.__text_index is not None:
+            self.__text_index.add_review(review)
+        if self.__completion_index is not None:
+            self.__completion_index.add_review(review)
+        self.__recommendation_cache.invalidate(review.user_associated.user_name)
     
+    def add_reviews(self, reviews: List[Review]):
+        # Stores all of the reviews in one commit.
+        if any(review.user_associated == None for review in reviews):
+            raise RepositoryException
+        with self.__writing() as scm:
+            scm.session.add_all(reviews)
+        for review in reviews:
+            if self.__text_index is not None:
+                self.__text_index.add_review(review)
+            if self.__completion_index is not None:
+                self.__completion_index.add_review(review)
+            self.__recommendation_cache.invalidate(review.user_associated.user_name)
+
     def add_review_raw(self, book,review_text,rating,user_id):
-        with self._session_cm as scm:
+        with self.__writing() as scm:
             scm.session.add(Review(book,review_text,rating,user_id))
-            scm.commit()
 
     def get_reviews(self):
         return self._session_cm.session.query(Review).all()
@@ -228,9 +570,13 @@ class SqlAlchemyRepository(AbstractRepository):
         if isinstance(author,Author):
             # print(self._session_cm.session.query(Author).filter(Author._Author__unique_id == author.unique_id).first())
             if self._session_cm.session.query(Author).filter(Author._Author__unique_id == author.unique_id).first() == None:
-                with self._session_cm as scm:
+                with self.__writing() as scm:
                     scm.session.add(author)
-                    scm.commit()
+                if self.__completion_index is not None:
+                    self.__completion_index['author'].add(author.full_name, 0)
+                    self.__completion_index['author_id'].add(str(author.unique_id), 0)
+                if self.__suggestion_index is not None:
+                    self.__suggestion_index.add_author(author.full_name)
 
     def get_author_names(self):
         Authors = []
@@ -257,10 +603,10 @@ class SqlAlchemyRepository(AbstractRepository):
             
             # print(self._session_cm.session.query(Publisher).filter(Publisher.name==publisher.name).first())
             if self._session_cm.session.query(Publisher).filter(Publisher._Publisher__name==publisher.name).first() == None:
-                with self._session_cm as scm:
-
-                        scm.session.add(publisher)
-                        scm.commit()
+                with self.__writing() as scm:
+                    scm.session.add(publisher)
+                if self.__completion_index is not None:
+                    self.__completion_index['publisher'].add(publisher.name, 0)
 
     def get_all_publisher_names(self):
         Publishers = []
@@ -272,81 +618,95 @@ class SqlAlchemyRepository(AbstractRepository):
 
         return Publishers
 
+########################################        Completions
+
+    @property
+    def completion_index(self) -> CompletionIndex:
+        # Built from the tables on first use, then kept current by add_book, add_review, add_author and add_publisher.
+        self.__check_tables()
+        if self.__completion_index is None:
+            completion_index = CompletionIndex()
+            for field, query in COMPLETION_QUERIES.items():
+                completion_index[field].add_all(self._session_cm.session.execute(query))
+            self.__completion_index = completion_index
+        return self.__completion_index
+
+    def get_completions(self, field: str, prefix: str, limit: int = COMPLETIONS) -> List[str]:
+        return self.completion_index.complete(field, prefix, limit)
+
+    def known_value(self, field: str, value: str) -> Optional[str]:
+        return self.completion_index[field].known(value)
+
+########################################        Suggestions
+
+    @property
+    def suggestion_index(self) -> SuggestionIndex:
+        # Built from the tables on first use, then kept current by add_book and add_author.
+        self.__check_tables()
+        if self.__suggestion_index is None:
+            suggestion_index = SuggestionIndex()
+            for name, books in self._session_cm.session.execute(COMPLETION_QUERIES['author']):
+                suggestion_index.add_author(name, books)
+            for title, in self._session_cm.session.execute('SELECT title FROM books'):
+                suggestion_index.add_title(title)
+            self.__suggestion_index = suggestion_index
+        return self.__suggestion_index
+
+    def get_suggestions(self, field: str, text: str, limit: int = SUGGESTIONS) -> List[str]:
+        return self.suggestion_index.suggest(field, text, limit)
+
 ########################################        Recommendations
 
     def add_book_to_reading_list(self,book:Book,user_name:str):
         user = self.get_user(user_name)
         
-        
-        user.add_book_to_reading_list(book)
-        book.add_user(user)
-        
+        with self.__writing():
+            user.add_book_to_reading_list(book)
+            book.add_user(user)
 
         # self._session_cm.session.execute('INSERT INTO user_reading_list (book_id,user_id) VALUES (:book_id,:user_id)',{':book_id':book.book_id,':user_id':user.user_id})
 
-        self._session_cm.commit()
+        self.__recommendation_cache.invalidate(user.user_name)
         # with self._session_cm as scm:
         #     if scm.session.execute('SELECT books.id from user_reading_list a WHERE a.user_id = :user_id: AND book)
         #     scm.session.execute('SELECT books.id from books INNER JOIN books_authors WHERE books_authors.author_id = :author_id AND books_authors.book_id = books.id',{'author_id':author_id}).fetchall()
         
     def get_random_books(self,no_of_books:int):
-        return sample(self.get_all_books(),no_of_books)
+        if no_of_books <= 0:
+            return []
+        draws = {'draw' + str(i): random() for i in range(RANDOM_DRAWS_PER_BOOK * no_of_books)}
+        book_ids = [row[0] for row in self._session_cm.session.execute(
+            RANDOM_BOOKS_QUERY.format(draws=', '.join('(:' + name + ')' for name in draws)), dict(draws, limit=no_of_books))]
+        return self.__books_with_ranking(book_ids)
 
     def get_recommendations(self,user_name=None,no_of_books:int = 10):
-        # print(self.get_random_books(no_of_books))
-        
         if isinstance(user_name,str):
-            user = self.get_user(user_name)
-            if user == None:
-                return self.get_random_books(no_of_books)
-            else:
-                
-                if len(user.reading_list) > 0:
-                    recommendations = self.__find_recommendations(user.reading_list)
-                    # print(recommendations)
-                    if len(recommendations) < no_of_books:
-                        return recommendations + self.get_random_books(no_of_books-len(recommendations))
-                    elif len(recommendations)>= no_of_books:
-                        return recommendations[0:10]
-            
+            ranking = self.__find_recommendations(user_name,no_of_books)
+            if len(ranking) > 0:
+                recommendations = self.__books_with_ranking(ranking)
+                if len(recommendations) < no_of_books:
+                    return recommendations + self.get_random_books(no_of_books-len(recommendations))
+                return recommendations
         return self.get_random_books(no_of_books)
-        
-    def __find_recommendations(self,reading_list):
-        return_list = {}
-        for books in reading_list:
-            for authors in books.authors:
-                for book in self.get_books_by_author_id(authors.unique_id):
-                    if book not in reading_list:
-                        if book.book_id in return_list:
-                            return_list[book.book_id][1]+=4
-                        else:
-                            return_list[book.book_id] = [book,1]
-            
-            if books.release_year != None:
-                for book in self.get_books_by_release_year(books.release_year):
-                    if book not in reading_list:
-                        if book.book_id in return_list:
-                            return_list[book.book_id][1]+=1
-                        else:
-                            return_list[book.book_id] = [book,1]
-                for book in self.get_books_by_release_year(books.release_year-1):
-                    if book not in reading_list:
-                        if book.book_id in return_list:
-                            return_list[book.book_id][1]+=1
-                        else:
-                            return_list[book.book_id] = [book,1]
-                for book in self.get_books_by_release_year(books.release_year+1):
-                    if book not in reading_list:
-                        if book.book_id in return_list:
-                            return_list[book.book_id][1]+=1
-                        else:
-                            return_list[book.book_id] = [book,1]
-            # print(book)
-            # print(book.publisher)
-            for book in self.get_books_by_publisher_name(books.publisher.name):
-                if book not in reading_list:
-                    if book.book_id in return_list:
-                        return_list[book.book_id][1]+=2
-                    else:
-                        return_list[book.book_id] = [book,1]
-        return [self.get_book_by_id(item[0]) for item in sorted(return_list.items(),key=lambda x: x[1][1])]
\ No newline at end of file
+
+    def __find_recommendations(self,user_name:str,no_of_books:int):
+        # Ranked ids of the best no_of_books recommendations for the user's reading list, scored by
+        # RECOMMENDATION_QUERY. Rankings are cached per user until their reading list or reviews change,
+        # or a book is added, and serve any request for as many books or fewer.
+        key = user_name.strip().lower()
+        self.__check_tables()
+        cached = self.__recommendation_cache.get(key)
+        if cached is not None and cached[0] >= no_of_books:
+            return cached[1][0:no_of_books]
+        ranking = tuple(row[0] for row in self._session_cm.session.execute(RECOMMENDATION_QUERY, {
+            'user_name': key, 'author_weight': AUTHOR_WEIGHT, 'release_year_weight': RELEASE_YEAR_WEIGHT,
+            'publisher_weight': PUBLISHER_WEIGHT, 'limit': no_of_books}))
+        self.__recommendation_cache.put(key,(no_of_books,ranking))
+        return ranking
+
+    def get_recommendation_cache_stats(self):
+        return self.__recommendation_cache.stats
+
+    def build_recommendations(self):
+        # Recommendations are scored by the database when asked for, there is nothing to precompute.
+        pass
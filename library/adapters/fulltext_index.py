@@ -0,0 +1,115 @@
+import re
+from array import array
+from collections import Counter
+from heapq import nlargest
+from math import log
+from typing import Iterable, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOP_WORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "he", "her", "his",
+    "i", "if", "in", "into", "is", "it", "its", "of", "on", "or", "she", "so", "that", "the", "their",
+    "them", "they", "this", "to", "was", "were", "will", "with", "you"
+))
+
+# BM25 tuning constants
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    if not isinstance(text, str):
+        return []
+    return [token for token in TOKEN_PATTERN.findall(text.casefold()) if token not in STOP_WORDS]
+
+
+def encode_varint(value: int, buffer: bytearray):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def decode_postings(buffer: bytes):
+    # Posting lists are (document id gap, term frequency) pairs stored as varints.
+    doc_id = 0
+    value = 0
+    shift = 0
+    gap = None
+    for byte in buffer:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        if gap is None:
+            gap = value
+        else:
+            doc_id += gap
+            yield doc_id, value
+            gap = None
+        value = 0
+        shift = 0
+
+
+class FullTextIndex:
+    # Inverted index over book titles, authors, descriptions and review texts, ranked with BM25.
+    # Each description and each review is indexed as its own document so new reviews are
+    # appended without touching existing postings; a book scores the sum of its documents.
+
+    def __init__(self):
+        self.__postings = dict()
+        self.__last_doc_ids = dict()
+        self.__doc_books = array('q')
+        self.__doc_lengths = array('l')
+        self.__total_length = 0
+
+    def __len__(self):
+        return len(self.__doc_books)
+
+    def add_document(self, book_id: int, text: str):
+        tokens = tokenize(text)
+        if len(tokens) == 0:
+            return
+        doc_id = len(self.__doc_books) + 1
+        self.__doc_books.append(book_id)
+        self.__doc_lengths.append(len(tokens))
+        self.__total_length += len(tokens)
+        for term, frequency in Counter(tokens).items():
+            postings = self.__postings.get(term)
+            if postings is None:
+                postings = self.__postings[term] = bytearray()
+            encode_varint(doc_id - self.__last_doc_ids.get(term, 0), postings)
+            encode_varint(frequency, postings)
+            self.__last_doc_ids[term] = doc_id
+
+    def add_book(self, book):
+        fields = [book.title] + [author.full_name for author in book.authors] + [book.description]
+        self.add_document(book.book_id, ' '.join(field for field in fields if isinstance(field, str)))
+
+    def add_review(self, review):
+        if review.book is not None:
+            self.add_document(review.book.book_id, review.review_text)
+
+    def add_all(self, entries: Iterable):
+        for book_id, text in entries:
+            self.add_document(book_id, text)
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        # Returns up to limit (book id, score) pairs, best match first.
+        document_count = len(self.__doc_books)
+        if document_count == 0 or limit <= 0:
+            return []
+        average_length = self.__total_length / document_count
+        scores = dict()
+        for term in set(tokenize(query)):
+            postings = self.__postings.get(term)
+            if postings is None:
+                continue
+            matches = list(decode_postings(postings))
+            idf = log(1 + (document_count - len(matches) + 0.5) / (len(matches) + 0.5))
+            for doc_id, frequency in matches:
+                length_norm = K1 * (1 - B + B * self.__doc_lengths[doc_id - 1] / average_length)
+                score = idf * frequency * (K1 + 1) / (frequency + length_norm)
+                book_id = self.__doc_books[doc_id - 1]
+                scores[book_id] = scores.get(book_id, 0.0) + score
+        return nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
@@ -0,0 +1,166 @@
+from typing import List, Tuple
+
+from library.adapters.fulltext_index import TOKEN_PATTERN
+
+# Most edits a suggestion may be away from what was typed
+MAX_EDIT_DISTANCE = 2
+
+# Suggestions offered for a search that found nothing
+SUGGESTIONS = 5
+
+# Values a misspelt search can be corrected to, see SuggestionIndex
+SUGGESTION_FIELDS = ('author', 'title')
+
+
+def edit_distance(a: str, b: str, bound: int) -> int:
+    # Levenshtein distance between a and b, or bound + 1 when it is more than bound. Myers' bit-parallel
+    # algorithm: bit i of vp and vn says whether the distance rises or falls going down row i of the table,
+    # so each character of b advances a whole column in a few integer operations.
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    if len(a) == 0:
+        return len(b)
+    masks = dict()
+    for position, char in enumerate(a):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    everything = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    vp, vn, distance = everything, 0, len(a)
+    for position, char in enumerate(b, 1):
+        pm = masks.get(char, 0)
+        d0 = (((pm & vp) + vp) ^ vp) | pm | vn
+        hp = vn | ~(d0 | vp)
+        hn = vp & d0
+        if hp & last:
+            distance += 1
+        elif hn & last:
+            distance -= 1
+        if distance - (len(b) - position) > bound:
+            # Each character of b left can lower the distance by one at most
+            return bound + 1
+        hp = (hp << 1) | 1
+        hn = hn << 1
+        vp = (hn | ~(d0 | hp)) & everything
+        vn = hp & d0
+    return min(distance, bound + 1)
+
+
+def distance_bound(text: str) -> int:
+    # Short words allow fewer edits, two edits would turn a four letter name into most other short names.
+    return min(MAX_EDIT_DISTANCE, len(text) // 4)
+
+
+def deletions(text: str, distance: int) -> set:
+    # text and every string left by deleting up to distance of its characters
+    found = frontier = {text}
+    for _ in range(distance):
+        frontier = {word[:position] + word[position + 1:] for word in frontier for position in range(len(word))}
+        found = found | frontier
+    return found
+
+
+class DeletionIndex:
+    # Symmetric deletion dictionary over casefolded values: each value is filed under every string left by
+    # deleting up to MAX_EDIT_DISTANCE of its characters. Two strings within d edits of each other leave a
+    # common string after at most d deletions from each, so a lookup only generates the deletions of the
+    # query and measures the distance to the few values filed under them, however many values there are.
+
+    def __init__(self):
+        self.__deletions = dict()
+        self.__weights = dict()
+        self.__values = dict()
+
+    def __len__(self):
+        return len(self.__weights)
+
+    def __contains__(self, value: str):
+        return isinstance(value, str) and value.casefold() in self.__weights
+
+    def add(self, value: str, weight: int = 1):
+        # Adds weight to value's popularity, inserting value first if it is new.
+        if not isinstance(value, str) or value.strip() == "":
+            return
+        key = value.casefold()
+        if key in self.__weights:
+            self.__weights[key] += weight
+            return
+        self.__weights[key] = weight
+        self.__values[key] = value
+        for deletion in deletions(key, MAX_EDIT_DISTANCE):
+            self.__deletions.setdefault(deletion, []).append(key)
+
+    def search(self, query: str, bound: int) -> List[Tuple[int, str]]:
+        # (distance, key) of every value within bound edits of query, bound at most MAX_EDIT_DISTANCE.
+        query = query.casefold()
+        candidates = set()
+        for deletion in deletions(query, min(bound, MAX_EDIT_DISTANCE)):
+            candidates.update(self.__deletions.get(deletion, ()))
+        found = []
+        for key in candidates:
+            distance = edit_distance(query, key, bound)
+            if distance <= bound:
+                found.append((distance, key))
+        return found
+
+    def suggest(self, query: str, limit: int = SUGGESTIONS, bound: int = None) -> List[str]:
+        # The values closest to query, the more popular first among those as close.
+        if not isinstance(query, str) or query.strip() == "":
+            return []
+        if bound is None:
+            bound = distance_bound(query)
+        found = sorted((distance, -self.__weights[key], key) for distance, key in self.search(query, bound))
+        return [self.__values[key] for distance, weight, key in found[:limit]]
+
+
+class SuggestionIndex:
+    # Corrections for searches that found nothing: author names are matched whole, titles a word at a time.
+    # Authors are weighted by their books, title words by the titles they are in.
+
+    def __init__(self):
+        self.__authors = DeletionIndex()
+        self.__title_words = DeletionIndex()
+
+    def add_author(self, name: str, weight: int = 0):
+        self.__authors.add(name, weight)
+
+    def add_title(self, title: str):
+        # Words are added as the title spells them, so corrections read like the titles, once per title
+        # whatever their case.
+        if isinstance(title, str):
+            for word in {word.casefold(): word for word in TOKEN_PATTERN.findall(title)}.values():
+                self.__title_words.add(word)
+
+    def add_book(self, book):
+        self.add_title(book.title)
+        for author in book.authors:
+            self.add_author(author.full_name, 1)
+
+    def suggest(self, field: str, text: str, limit: int = SUGGESTIONS) -> List[str]:
+        if field == 'author':
+            return [name for name in self.__authors.suggest(text, limit + 1) if name != text][:limit]
+        if field == 'title':
+            return self.__correct_title(text, limit)
+        raise KeyError(field)
+
+    def __correct_title(self, text: str, limit: int) -> List[str]:
+        # text with each word that is in no title replaced by its closest title words, punctuation kept.
+        # The alternatives offered are those for the first misspelt word, every later one takes its best.
+        if not isinstance(text, str):
+            return []
+        corrections = []
+        for match in TOKEN_PATTERN.finditer(text):
+            if match.group() not in self.__title_words:
+                candidates = self.__title_words.suggest(match.group(), limit)
+                if len(candidates) == 0:
+                    return []
+                corrections.append((match.start(), match.end(), candidates))
+        if len(corrections) == 0:
+            return []
+        suggestions = []
+        for candidate in corrections[0][2]:
+            suggestion = text
+            for start, end, candidates in reversed(corrections[1:]):
+                suggestion = suggestion[:start] + candidates[0] + suggestion[end:]
+            start, end = corrections[0][0], corrections[0][1]
+            suggestions.append(suggestion[:start] + candidate + suggestion[end:])
+        return suggestions
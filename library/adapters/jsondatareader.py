@@ -1,5 +1,5 @@
 import json
-from typing import List
+from typing import Iterator, List
 
 from library.domain.model import Publisher, Author, Book
 
@@ -36,64 +36,53 @@ class BooksJSONReader:
         return authors_json
 
 
-    def read_json_files(self):
-        authors_json = self.read_authors_file()
-        books_json = self.read_books_file()
+    def read_author_names(self) -> dict:
+        # Only the id -> name pairs are kept, Author objects are made when a book first needs them.
+        author_names = {}
+        with open(self.__authors_file_name, encoding='UTF-8') as authors_jsonfile:
+            for line in authors_jsonfile:
+                author_json = json.loads(line)
+                author_names.setdefault(int(author_json['author_id']), author_json['name'])
+        return author_names
 
-        all_authors = {}
-        # extract the author ids:
-        for author_json in authors_json:
-            if int(author_json['author_id']) not in all_authors:
-                all_authors[int(author_json['author_id'])] = Author(int(author_json['author_id']),author_json['name'])
-        for book_json in books_json:
-            book_instance = Book(int(book_json['book_id']), book_json['title'])
+    def iter_books(self) -> Iterator[Book]:
+        # Yields one Book per line of the books file without holding the file or earlier books in memory.
+        author_names = self.read_author_names()
+        authors = {}
+        with open(self.__books_file_name, encoding='UTF-8') as books_jsonfile:
+            for line in books_jsonfile:
+                yield self.__make_book(json.loads(line), author_names, authors)
 
-            if not book_json['publisher']:
-                book_instance.publisher_name = "N.A."
-                book_instance.publisher = Publisher("N.A.")
-            else:
-                temp = book_json['publisher']
-                book_instance.publisher_name = temp
-                book_instance.publisher = Publisher(temp)
-            # print(book_instance.publisher)
-            if book_json['publication_year'] != "":
-                book_instance.release_year = int(book_json['publication_year'])
-            if book_json['is_ebook'].lower() == 'false':
-                book_instance.ebook = False
-            else:
-                if book_json['is_ebook'].lower() == 'true':
-                    book_instance.ebook = True
-            book_instance.description = book_json['description']
-            if book_json['num_pages'] != "":
-                book_instance.num_pages = int(book_json['num_pages'])
+    def read_json_files(self):
+        self.__dataset_of_books.extend(self.iter_books())
 
-            # extract the author ids:
-            list_of_authors_ids = book_json['authors']
-            for author_id in list_of_authors_ids:
-                
-                # print(all_authors[author_id])
-                book_instance.add_author(all_authors[int(author_id['author_id'])])
-            #     numerical_id = int(author_id['author_id'])
-            #     # We assume book authors are available in the authors file,
-            #     # otherwise more complex handling is required.
-            #     author_name = None
-            #     for author_json in authors_json:
-            #         if int(author_json['author_id']) == numerical_id:
-            #             author_name = author_json['name']
-                
-            #     book_instance.add_author(Author(numerical_id, author_name))
-                
+    def __make_book(self, book_json: dict, author_names: dict, authors: dict) -> Book:
+        book_instance = Book(int(book_json['book_id']), book_json['title'])
 
-            # for author_id in list_of_authors_ids:
+        if not book_json['publisher']:
+            book_instance.publisher_name = "N.A."
+            book_instance.publisher = Publisher("N.A.")
+        else:
+            temp = book_json['publisher']
+            book_instance.publisher_name = temp
+            book_instance.publisher = Publisher(temp)
+        if book_json['publication_year'] != "":
+            book_instance.release_year = int(book_json['publication_year'])
+        if book_json['is_ebook'].lower() == 'false':
+            book_instance.ebook = False
+        else:
+            if book_json['is_ebook'].lower() == 'true':
+                book_instance.ebook = True
+        book_instance.description = book_json['description']
+        if book_json['num_pages'] != "":
+            book_instance.num_pages = int(book_json['num_pages'])
 
-            #     numerical_id = int(author_id['author_id'])
-            #     # We assume book authors are available in the authors file,
-            #     # otherwise more complex handling is required.
-            #     author_name = None
-            #     for author_json in authors_json:
-            #         if int(author_json['author_id']) == numerical_id:
-            #             author_name = author_json['name']
-                
-            #     book_instance.add_author(Author(numerical_id, author_name))
-                # self.__authors.append(Author(numerical_id, author_name))
-            self.__dataset_of_books.append(book_instance)
+        # We assume book authors are available in the authors file,
+        # otherwise more complex handling is required.
+        for author_id in book_json['authors']:
+            numerical_id = int(author_id['author_id'])
+            author = authors.get(numerical_id)
+            if author is None:
+                author = authors[numerical_id] = Author(numerical_id, author_names[numerical_id])
+            book_instance.add_author(author)
+        return book_instance
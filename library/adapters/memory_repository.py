@@ -1,28 +1,69 @@
 import csv
 from pathlib import Path
 from datetime import date, datetime
-from typing import List
+from typing import List, Optional
 
 from bisect import bisect, bisect_left, insort_left
 
 from werkzeug.security import generate_password_hash
-from library.adapters import jsondatareader
+from library.adapters import jsondatareader, snapshot
 
-from library.adapters.repository import AbstractRepository, RepositoryException
+from library.adapters.repository import AbstractRepository, RepositoryException, BookPage, PAGE_SIZE, SEARCHES, page_of_ids, page_of_order
 from library.domain.model import Author, Book,Publisher,BooksInventory, ReadingList, User, Review, BooksInventory
 from library.adapters.jsondatareader import BooksJSONReader
+from library.adapters.repository_populate import hash_passwords, batched, make_reviews, REVIEW_BATCH_SIZE
+from library.adapters.trigram_index import TrigramIndex
+from library.adapters.fulltext_index import FullTextIndex
+from library.adapters.recommendations import NeighbourIndex, RECOMMENDATION_CACHE_SIZE
+from library.adapters.cache import LRUCache
+from library.adapters.random_pool import ShuffledPool
+from library.adapters.sort_orders import SortOrders, sort_row
+from library.adapters.query_planner import BookQuery, Criterion, execute
+from library.adapters.prefix_index import CompletionIndex, COMPLETIONS
+from library.adapters.fuzzy_index import SuggestionIndex, SUGGESTIONS
 from tqdm import tqdm
 
+try:
+    from library.adapters.columnar_store import ColumnarBookStore
+except ImportError:  # numpy is optional, filters fall back to the secondary indexes without it
+    ColumnarBookStore = None
+
 class MemoryRepository(AbstractRepository):
     # books ordered by date, not id. id is assumed unique.
 
-    def __init__(self):
+    def __init__(self, columnar: bool = None):
         self.__books_inventory = BooksInventory()
         self.__users = list()
         self.__reviews = list()
         self.__authors = list()
         self.__publishers = list()
 
+        # Secondary indexes, each key maps to its books kept in book id order.
+        self.__books_by_author_id = dict()
+        self.__books_by_author_name = dict()
+        self.__books_by_publisher_name = dict()
+        self.__books_by_release_year = dict()
+        self.__title_index = TrigramIndex()
+        self.__text_index = FullTextIndex()
+        self.__neighbour_index = NeighbourIndex()
+        self.__recommendation_cache = LRUCache(RECOMMENDATION_CACHE_SIZE)
+        self.__random_book_ids = ShuffledPool()
+        self.__sort_orders = None
+        self.__completion_index = None
+        self.__suggestion_index = None
+
+        # Numeric book columns the filters and criteria searches run on as vectorised masks, used whenever
+        # numpy is installed.
+        if columnar is None:
+            columnar = ColumnarBookStore is not None
+        if columnar and ColumnarBookStore is None:
+            raise RepositoryException("The columnar store needs numpy installed")
+        self.__columns = ColumnarBookStore() if columnar else None
+
+    @property
+    def columnar(self) -> bool:
+        return self.__columns is not None
+
     def __iter__(self):
         self._current = 0
         return self
@@ -45,6 +86,41 @@ class MemoryRepository(AbstractRepository):
     def get_user(self, user_name = None) -> User:
         return next((user for user in self.__users if user.user_name == user_name), None)
 
+########################################        Snapshots
+
+    def save_snapshot(self, path: str, sources):
+        # sources are the snapshot.source_stamps of the files this repository was populated from.
+        books = [self.get_book(book_id) for book_id in dict.fromkeys(book.book_id for book in self.__books_inventory.all_books)]
+        indexes = {'title': self.__title_index, 'text': self.__text_index, 'neighbours': self.__neighbour_index,
+                   'columns': self.__columns}
+        snapshot.save_repository(path, sources, books, self.__authors, self.__publishers, self.__users, self.__reviews, indexes)
+
+    def load_snapshot(self, path: str, sources) -> bool:
+        # Fills an empty repository from a snapshot taken from the same sources, the search and
+        # recommendation indexes come from the snapshot instead of being rebuilt.
+        # Returns False when there is no usable snapshot.
+        state = snapshot.load_repository(path, sources)
+        if state is None:
+            return False
+        for book in state.books:
+            self.__books_inventory.add_book(book)
+            self.__index_book_lookups(book)
+        self.__authors = state.authors
+        self.__publishers = state.publishers
+        self.__users = state.users
+        self.__reviews = state.reviews
+        self.__title_index = state.indexes['title']
+        self.__text_index = state.indexes['text']
+        self.__neighbour_index = state.indexes['neighbours']
+        if self.__columns is not None:
+            if state.indexes['columns'] is not None:
+                self.__columns = state.indexes['columns']
+            else:
+                for book in state.books:
+                    self.__columns.add_book(book)
+        self.__recommendation_cache.clear()
+        return True
+
 ########################################        Books
 
     def add_book(self, book: Book):
@@ -53,9 +129,38 @@ class MemoryRepository(AbstractRepository):
             for authors in book.authors:
                 self.add_author(authors)
             self.add_publisher(book.publisher)
+            self.__index_book(book)
         except ValueError:
             pass
 
+    def __index_book(self, book: Book):
+        self.__index_book_lookups(book)
+        self.__title_index.add(book.book_id, book.title)
+        self.__text_index.add_book(book)
+        self.__neighbour_index.add_book(book)
+        self.__recommendation_cache.clear()
+        if self.__columns is not None:
+            self.__columns.add_book(book)
+        if self.__sort_orders is not None:
+            self.__sort_orders.add(*sort_row(book))
+        if self.__completion_index is not None:
+            self.__completion_index.add_book(book)
+        if self.__suggestion_index is not None:
+            self.__suggestion_index.add_book(book)
+
+    def __index_book_lookups(self, book: Book):
+        author_names = set()
+        for authors in book.authors:
+            insort_left(self.__books_by_author_id.setdefault(authors.unique_id, []), book)
+            author_name = authors.full_name.casefold()
+            if author_name not in author_names:
+                author_names.add(author_name)
+                insort_left(self.__books_by_author_name.setdefault(author_name, []), book)
+        if book.publisher is not None:
+            insort_left(self.__books_by_publisher_name.setdefault(book.publisher.name, []), book)
+        insort_left(self.__books_by_release_year.setdefault(book.release_year, []), book)
+        self.__random_book_ids.add(book.book_id)
+
     def get_book(self, id: int) -> Book:
         book = None
         try:
@@ -64,6 +169,10 @@ class MemoryRepository(AbstractRepository):
             pass  # Ignore exception and return None.
         return book    
 
+    def get_books_by_ids(self, id_list: List[int]) -> List[Book]:
+        # Books with the given ids that exist, in id order.
+        return [book for book in map(self.get_book, sorted(set(id_list))) if book is not None]
+
     def get_number_of_books(self) -> int:
         return len(self.__books_inventory)
 
@@ -85,60 +194,20 @@ class MemoryRepository(AbstractRepository):
         return self.get_book(id)
     
     def get_books_by_author_name(self,author_name: str):
-        matching_books = list()
-        try:
-            for book in self.__books_inventory.all_books:
-                for authors in book.authors:
-                    if author_name.lower() == authors.full_name.lower():
-                        matching_books.append(book)
-                        break
-        except Exception:
-            # No books for specified author. Simply return an empty list.
-            pass
-
-        return matching_books
+        if not isinstance(author_name,str):
+            return []
+        return list(self.__books_by_author_name.get(author_name.casefold(), []))
 
     def get_books_by_author_id(self,author_id: int):
-        matching_books = list()
-        try:
-            for book in self.__books_inventory.all_books:
-                for authors in book.authors:
-                    if author_id == authors.unique_id:
-                        matching_books.append(book)
-                        break
-        except ValueError:
-            # No books for specified author. Simply return an empty list.
-            pass
-
-        return matching_books
+        return list(self.__books_by_author_id.get(author_id, []))
 
     def get_book_by_release_year(self, target_date: int) -> List[Book]:
-        matching_books = list()
-        try:
-            for book in self.__books_inventory.all_books:
-                if book.release_year == target_date:
-                    matching_books.append(book)
-                else:
-                    break
-        except ValueError:
-            # No books for specified date. Simply return an empty list.
-            pass
-
-        return matching_books
+        return list(self.__books_by_release_year.get(target_date, []))
 
     def get_books_by_release_year(self,year):
-        matching_books = list()
-        try:
-            if year == "":
-                year = None
-            for book in self.__books_inventory.all_books:
-                if year == book.release_year:
-                    matching_books.append(book)
-        except ValueError:
-            # No books for specified author. Simply return an empty list.
-            pass
-
-        return matching_books
+        if year == "":
+            year = None
+        return list(self.__books_by_release_year.get(year, []))
 
     def get_book_by_title_specific(self,title:str):
         matching_books = list()
@@ -152,36 +221,131 @@ class MemoryRepository(AbstractRepository):
         return matching_books
 
     def get_book_by_title_general(self,title:str):
-        matching_books = list()
-        try:
-            for book in self.__books_inventory.all_books:
-                if title.lower() in book.title.lower():
-                    matching_books.append(book)
-        except Exception:
-            pass
-
-        return matching_books
+        return [self.get_book(book_id) for book_id in self.__title_index.search(title)]
 
     def get_books_by_publisher_name(self,publisher_name:str):
-        matching_books = list()
-        try:
-            for book in self.__books_inventory.all_books:
-                if publisher_name == book.publisher.name:
-                    matching_books.append(book)
-        except ValueError:
-            # No books for specified author. Simply return an empty list.
-            pass
+        return list(self.__books_by_publisher_name.get(publisher_name, []))
 
-        return matching_books
+    def search_books_by_text(self,query:str,no_of_books:int = 10):
+        return [self.get_book(book_id) for book_id, score in self.__text_index.search(query, no_of_books)]
     
+    def filter_books(self, release_year_from: int = None, release_year_to: int = None, publisher_name: str = None,
+                     ebook: bool = None, author_id: int = None):
+        # Books matching every given filter in book id order. With the columnar store the filters are one
+        # vectorised mask and the result only looks up the Book objects that are actually read from it.
+        if self.__columns is not None:
+            rows = self.__columns.select(release_year_from, release_year_to, publisher_name, ebook, author_id)
+            return self.__columns.lazy_books(rows, self.get_book)
+        return self.find_books(BookQuery(author_id=author_id, release_year_from=release_year_from, release_year_to=release_year_to,
+                                         publisher_name=publisher_name, ebook=ebook))
+
+    def find_books(self, query: BookQuery) -> List[Book]:
+        return [self.get_book(book_id) for book_id in self.__criteria_ids(query)]
+
+    def __criteria_ids(self, query: BookQuery) -> List[int]:
+        # Ids of the books matching every criterion of query, in book id order. Each criterion with an index
+        # offers its posting list and the planner starts from the shortest. With the columnar store the
+        # numeric criteria and the publisher are answered together by one mask.
+        criteria = []
+        if query.author_name is not None:
+            author_name = str(query.author_name).casefold()
+            criteria.append(self.__posting_criterion('author_name', self.__books_by_author_name.get(author_name, []),
+                lambda book: any(author.full_name.casefold() == author_name for author in book.authors)))
+        if query.title is not None:
+            criteria.append(Criterion('title', self.__title_index.estimate(query.title),
+                lambda: self.__title_index.search(query.title),
+                lambda book_id: self.__title_index.matches(book_id, query.title)))
+        if self.__columns is not None:
+            if any(value is not None for value in (query.author_id, query.release_year_from, query.release_year_to,
+                                                   query.publisher_name, query.ebook)):
+                criteria.append(self.__columnar_criterion(query))
+            return execute(criteria, lambda: sorted(book.book_id for book in self.__books_inventory.all_books))
+        if query.author_id is not None:
+            criteria.append(self.__posting_criterion('author_id', self.__books_by_author_id.get(query.author_id, []),
+                lambda book: any(author.unique_id == query.author_id for author in book.authors)))
+        if query.release_year_from is not None or query.release_year_to is not None:
+            years = {year for year in self.__books_by_release_year if year is not None
+                     and (query.release_year_from is None or year >= query.release_year_from)
+                     and (query.release_year_to is None or year <= query.release_year_to)}
+            criteria.append(Criterion('release_year', sum(len(self.__books_by_release_year[year]) for year in years),
+                lambda: sorted(book.book_id for year in years for book in self.__books_by_release_year[year]),
+                lambda book_id: self.get_book(book_id).release_year in years))
+        if query.publisher_name is not None:
+            criteria.append(self.__posting_criterion('publisher_name', self.__books_by_publisher_name.get(query.publisher_name, []),
+                lambda book: book.publisher is not None and book.publisher.name == query.publisher_name))
+        if query.ebook is not None:
+            criteria.append(Criterion('ebook', len(self.__books_inventory), None,
+                lambda book_id: self.get_book(book_id).ebook == query.ebook))
+        return execute(criteria, lambda: sorted(book.book_id for book in self.__books_inventory.all_books))
+
+    def __columnar_criterion(self, query: BookQuery) -> Criterion:
+        # The author id, year range, publisher and ebook criteria as a single mask over the columns, whose
+        # size is known exactly before the planner orders the criteria.
+        mask = self.__columns.mask(query.release_year_from, query.release_year_to, query.publisher_name, query.ebook, query.author_id)
+        book_ids = self.__columns.book_ids_of(self.__columns.rows_of(mask))
+        return Criterion('columns', len(book_ids), book_ids.tolist, lambda book_id: self.__columns.in_mask(mask, book_id))
+
+    def __posting_criterion(self, name: str, books: List[Book], matches) -> Criterion:
+        # A criterion over one of the secondary indexes, whose postings are books in book id order.
+        return Criterion(name, len(books), lambda: [book.book_id for book in books], lambda book_id: matches(self.get_book(book_id)))
+
     def get_all_books(self):
         return self.__books_inventory.all_books
+
+    def get_books_page(self, page: int = 1, page_size: int = PAGE_SIZE, after: int = None, before: int = None,
+                       sort: str = 'id', descending: bool = False) -> BookPage:
+        # Pages are slices of the sort orders, so no page sorts the catalogue.
+        return page_of_order(self.sort_orders, sort, descending, page, page_size, after, before,
+                             lambda book_ids: [self.get_book(book_id) for book_id in book_ids])
+
+    @property
+    def sort_orders(self) -> SortOrders:
+        # Built from the inventory on first use, then kept current by add_book.
+        if self.__sort_orders is None:
+            sort_orders = SortOrders()
+            sort_orders.add_all(sort_row(book) for book in self.__books_inventory.all_books)
+            self.__sort_orders = sort_orders
+        return self.__sort_orders
+
+    def search_book_ids(self, search: str, *args) -> List[int]:
+        # Searches with an ids method find the ids alone, the others pick them off the books found.
+        search_ids = getattr(self, '_MemoryRepository__' + search + '_ids', None)
+        if search_ids is not None:
+            return search_ids(*args)
+        return [book.book_id for book in getattr(self, SEARCHES[search])(*args)]
+
+    def search_books_page(self, search: str, *args, page: int = 1, page_size: int = PAGE_SIZE,
+                          sort: str = None, descending: bool = False) -> BookPage:
+        # Only the books on the page shown are looked up.
+        book_ids = list(dict.fromkeys(self.search_book_ids(search, *args)))
+        if sort is not None:
+            book_ids = self.sort_orders.sorted(sort, book_ids, descending)
+        return page_of_ids(book_ids, page, page_size, lambda page_ids: [self.get_book(book_id) for book_id in page_ids])
+
 ########################################        Reviews
 
     def add_review(self, review: Review):
         review.user_associated.add_review(review)
         self.__reviews.append(review)
-        review.book.add_review(review)
+        # reviews.csv also reviews books that are not in books.json
+        if review.book is not None:
+            review.book.add_review(review)
+        self.__text_index.add_review(review)
+        if self.__completion_index is not None:
+            self.__completion_index.add_review(review)
+        self.__recommendation_cache.invalidate(review.user_associated.user_name)
+
+    def add_reviews(self, reviews: List[Review]):
+        # Bulk version of add_review for freshly made reviews, which skips the duplicate checks.
+        for review in reviews:
+            review.user_associated.reviews.append(review)
+            if review.book is not None:
+                review.book.reviews.append(review)
+            self.__text_index.add_review(review)
+            if self.__completion_index is not None:
+                self.__completion_index.add_review(review)
+            self.__recommendation_cache.invalidate(review.user_associated.user_name)
+        self.__reviews.extend(reviews)
 
     def get_reviews(self):
         return self.__reviews
@@ -190,61 +354,35 @@ class MemoryRepository(AbstractRepository):
 
     def get_recommendations(self,user_name=None,no_of_books = 10):
         if isinstance(user_name,str):
+            ranking = self.__find_recommendations(user_name)
+            if ranking is not None and len(ranking) > 0:
+                recommendations = [self.get_book(book_id) for book_id in ranking[0:no_of_books]]
+                if len(recommendations) < no_of_books:
+                    return recommendations + self.get_random_books(no_of_books-len(recommendations))
+                return recommendations
+        return self.get_random_books(no_of_books)
+
+    def get_random_books(self,no_of_books:int):
+        return [self.get_book(book_id) for book_id in self.__random_book_ids.sample(no_of_books)]
+
+    def __find_recommendations(self,user_name:str):
+        # Ranked ids of the books recommended for the user's reading list. Rankings are cached per user
+        # until their reading list or reviews change, or a book is added.
+        key = user_name.strip().lower()
+        ranking = self.__recommendation_cache.get(key)
+        if ranking is None:
             user = self.get_user(user_name)
             if user == None:
-                
-                return self.__books_inventory.get_random_books(no_of_books)
-            else:
-                
-                recommendations = self.__find_recommendations(user.reading_list)
-                # print(recommendations)
-                if len(recommendations) < no_of_books:
-                    return recommendations + self.__books_inventory.get_random_books(no_of_books-len(recommendations))
-                elif len(recommendations)>= no_of_books:
-                    return recommendations[0:10]
-        else:
-            return self.__books_inventory.get_random_books(no_of_books)
-        
-    def __find_recommendations(self,reading_list):
-        return_list = {}
-        for book_id in reading_list:
-            books = self.get_book_by_id(book_id)
-            # print(books)
-            # print(book_id)
-            for authors in books.authors:
-                for book in self.get_books_by_author_id(authors.unique_id):
-                    if book.book_id not in reading_list:
-                        if book.book_id in return_list:
-                            return_list[book.book_id][1]+=4
-                        else:
-                            return_list[book.book_id] = [book,1]
-            
-            if books.release_year != None:
-                for book in self.get_book_by_release_year(books.release_year):
-                    if book.book_id not in reading_list:
-                        if book.book_id in return_list:
-                            return_list[book.book_id][1]+=1
-                        else:
-                            return_list[book.book_id] = [book,1]
-                for book in self.get_book_by_release_year(books.release_year-1):
-                    if book.book_id not in reading_list:
-                        if book.book_id in return_list:
-                            return_list[book.book_id][1]+=1
-                        else:
-                            return_list[book.book_id] = [book,1]
-                for book in self.get_book_by_release_year(books.release_year+1):
-                    if book.book_id not in reading_list:
-                        if book.book_id in return_list:
-                            return_list[book.book_id][1]+=1
-                        else:
-                            return_list[book.book_id] = [book,1]
-            for book in self.get_books_by_publisher_name(books.publisher.name):
-                if book.book_id not in reading_list:
-                    if book.book_id in return_list:
-                        return_list[book.book_id][1]+=2
-                    else:
-                        return_list[book.book_id] = [book,1]
-        return [self.get_book_by_id(item[0]) for item in sorted(return_list.items(),key=lambda x: x[1][1])]
+                return None
+            ranking = tuple(self.__neighbour_index.recommend([book.book_id for book in user.reading_list],None))
+            self.__recommendation_cache.put(key,ranking)
+        return ranking
+
+    def get_recommendation_cache_stats(self):
+        return self.__recommendation_cache.stats
+
+    def build_recommendations(self):
+        self.__neighbour_index.build()
 
 ########################################        Authors and Publishers
     
@@ -252,6 +390,11 @@ class MemoryRepository(AbstractRepository):
         if isinstance(author,Author):
             if len(self.__authors) == 0 or author not in self.__authors:
                 self.__authors.append(author)
+                if self.__completion_index is not None:
+                    self.__completion_index['author'].add(author.full_name, 0)
+                    self.__completion_index['author_id'].add(str(author.unique_id), 0)
+                if self.__suggestion_index is not None:
+                    self.__suggestion_index.add_author(author.full_name)
     
     def get_author_names(self):
         if len(self.__authors) != 0:
@@ -269,6 +412,8 @@ class MemoryRepository(AbstractRepository):
         if isinstance(publisher,Publisher):
             if len(self.__publishers) == 0 or publisher not in self.__publishers:
                 self.__publishers.append(publisher)
+                if self.__completion_index is not None:
+                    self.__completion_index['publisher'].add(publisher.name, 0)
 
     def get_all_publisher_names(self):
         if len(self.__publishers) != 0:
@@ -276,6 +421,48 @@ class MemoryRepository(AbstractRepository):
         else:
             return []
 
+########################################        Completions
+
+    @property
+    def completion_index(self) -> CompletionIndex:
+        # Built on first use, then kept current by add_book, add_review, add_author and add_publisher.
+        if self.__completion_index is None:
+            completion_index = CompletionIndex()
+            for author in self.__authors:
+                completion_index['author'].add(author.full_name, 0)
+                completion_index['author_id'].add(str(author.unique_id), 0)
+            for publisher in self.__publishers:
+                completion_index['publisher'].add(publisher.name, 0)
+            for book in self.__books_inventory.all_books:
+                completion_index.add_book(book)
+            for review in self.__reviews:
+                completion_index.add_review(review)
+            self.__completion_index = completion_index
+        return self.__completion_index
+
+    def get_completions(self, field: str, prefix: str, limit: int = COMPLETIONS) -> List[str]:
+        return self.completion_index.complete(field, prefix, limit)
+
+    def known_value(self, field: str, value: str) -> Optional[str]:
+        return self.completion_index[field].known(value)
+
+########################################        Suggestions
+
+    @property
+    def suggestion_index(self) -> SuggestionIndex:
+        # Built on first use, then kept current by add_book and add_author.
+        if self.__suggestion_index is None:
+            suggestion_index = SuggestionIndex()
+            for author in self.__authors:
+                suggestion_index.add_author(author.full_name)
+            for book in self.__books_inventory.all_books:
+                suggestion_index.add_book(book)
+            self.__suggestion_index = suggestion_index
+        return self.__suggestion_index
+
+    def get_suggestions(self, field: str, text: str, limit: int = SUGGESTIONS) -> List[str]:
+        return self.suggestion_index.suggest(field, text, limit)
+
 
 ########################################        Reading List
 
@@ -284,11 +471,14 @@ class MemoryRepository(AbstractRepository):
         if user:
             return user.reading_list
         else:
-            return self.recommendations(None)
+            return []
     
-    def add_book_to_reading_list(self,user:User,book:Book):
+    def add_book_to_reading_list(self,book:Book,user_name:str):
+        user = self.get_user(user_name)
         if isinstance(book,Book) and isinstance(user,User):
-            user.add_book_to_reading_list(book.book_id)
+            user.add_book_to_reading_list(book)
+            book.add_user(user)
+            self.__recommendation_cache.invalidate(user.user_name)
 
 
 def read_json_file(books_file_name:str,authors_file_name:str):
@@ -310,28 +500,31 @@ def read_csv_file(filename: str):
             row = [item.strip() for item in row]
             yield row
     
-def populate(repo: MemoryRepository,data_path:str="library\\adapters"):
+def populate(repo: MemoryRepository,data_path:str="library\\adapters", hash_workers: int = None, hash_chunksize: int = None):
     # Load books and tags into the repository.
     print("Loading Books")
-    for books in tqdm(read_json_file(books_file_name=data_path+"\\data\\books.json",authors_file_name=data_path+"\\data\\authors.json")):
+    json_reader = BooksJSONReader(books_file_name=data_path+"\\data\\books.json",authors_file_name=data_path+"\\data\\authors.json")
+    for books in tqdm(json_reader.iter_books()):
         repo.add_book(books)
 
     # Load users into the repository.
-    users = load_users(data_path, repo)
+    users = load_users(data_path, repo, hash_workers, hash_chunksize)
 
     # Load reviews into the repository.
     load_reviews(data_path, repo, users)
     print("Loading Complete")
 
-def load_users(data_path: str, repo: MemoryRepository):
+def load_users(data_path: str, repo: MemoryRepository, hash_workers: int = None, hash_chunksize: int = None):
     users = []
     print("Loading Users")
     users_filename = data_path + "\\data\\users.csv"
-    
-    for data_row in tqdm(read_csv_file(users_filename)):
+
+    data_rows = list(read_csv_file(users_filename))
+    passwords = hash_passwords([data_row[2] for data_row in data_rows], hash_workers, hash_chunksize)
+    for data_row, password in tqdm(zip(data_rows, passwords), total=len(data_rows)):
         user = User(
             user_name=data_row[1],
-            password=generate_password_hash(data_row[2])
+            password=password
         )
         repo.add_user(user)
         users.append(user)
@@ -340,23 +533,7 @@ def load_users(data_path: str, repo: MemoryRepository):
 def load_reviews(data_path: str, repo: MemoryRepository, users):
     print("Loading Reviews")
     reviews_filename = data_path + "\\data\\reviews.csv"
-    for data_row in tqdm(read_csv_file(reviews_filename)):
-        for user in users:
-            if user.user_name == data_row[2]:
-                temp_user = user
-                break
-        
-        new_review = Review(
-            book=repo.get_book_by_id(int(data_row[1])),
-            review_text=data_row[3],
-            rating=int(data_row[4]),
-            review_id=int(data_row[0]),
-            user=temp_user,
-            timestamp=datetime.fromisoformat(data_row[5])
-        )
-
-        repo.add_review(new_review)
-
-
-
-
+    users_by_name = {user.user_name: user for user in users}
+    for data_rows in batched(tqdm(read_csv_file(reviews_filename)), REVIEW_BATCH_SIZE):
+        books_by_id = {book.book_id: book for book in repo.get_books_by_ids(sorted({int(data_row[1]) for data_row in data_rows}))}
+        repo.add_reviews(make_reviews(data_rows, books_by_id, users_by_name))
@@ -1,9 +1,12 @@
 from sqlalchemy import (
-    Table, MetaData, Column, Integer, String, Date, DateTime,
-    ForeignKey
+    Table, MetaData, Column, Integer, String, Date, DateTime, Boolean,
+    ForeignKey, Index, event, func, inspect
 )
 from sqlalchemy.orm import interfaces, mapper, relation, relationship, synonym,registry
 from sqlalchemy.sql.expression import column, false
+from sqlalchemy.ext.instrumentation import InstrumentationManager
+
+from weakref import ref
 
 from library.domain import model
 
@@ -47,7 +50,8 @@ books_table = Table(
     Column('release_year', Integer, default=0),
     Column('title', String(255), nullable=False),
     Column('description', String(1024), nullable=True),
-    Column('publisher_name',ForeignKey('publishers.name'))
+    Column('publisher_name',ForeignKey('publishers.name')),
+    Column('ebook', Boolean, nullable=True)
 )
 books_authors_table = Table(
     'books_authors',metadata,
@@ -62,7 +66,201 @@ user_reading_list_table = Table(
     Column('book_id',ForeignKey('books.id')),
     Column('user_id',ForeignKey('users.id'))
 )
+
+# One row counting every row inserted, updated or deleted in the tables the repository's in-process indexes
+# are built from. On SQLite the triggers made by create_change_counter keep it.
+table_changes_table = Table(
+    'table_changes', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('changes', Integer, nullable=False)
+)
+
+# Secondary indexes on the columns SqlAlchemyRepository filters and joins on. get_user compares lowercased
+# user names, so that lookup gets an expression index.
+secondary_indexes = [
+    Index('ix_books_release_year', books_table.c.release_year),
+    Index('ix_books_title', books_table.c.title),
+    Index('ix_books_publisher_name', books_table.c.publisher_name),
+    Index('ix_books_authors_author_id', books_authors_table.c.author_id),
+    Index('ix_books_authors_book_id', books_authors_table.c.book_id),
+    Index('ix_reviews_book_id', reviews_table.c.book_id),
+    Index('ix_reviews_user_name', reviews_table.c.user_name),
+    Index('ix_user_reading_list_user_id', user_reading_list_table.c.user_id),
+    Index('ix_authors_name', authors_table.c.name),
+    Index('ix_users_user_name_lower', func.lower(users_table.c.user_name)),
+]
+
+# Columns added after the first release, which add_missing_columns adds to databases created without them
+added_columns = [books_table.c.ebook]
+
+def add_missing_columns(connection) -> list:
+    # Returns the columns it added. Their values are NULL in the rows already there.
+    added = []
+    for column in added_columns:
+        if column.name not in [column_info['name'] for column_info in inspect(connection).get_columns(column.table.name)]:
+            connection.execute('ALTER TABLE {} ADD COLUMN {} {}'.format(
+                column.table.name, column.name, column.type.compile(connection.dialect)))
+            added.append(column)
+    return added
+
+def index_exists(connection, index):
+    # SQLite does not reflect expression indexes, so they are looked up by name in its catalogue.
+    if connection.dialect.name == 'sqlite':
+        return connection.execute("SELECT count(*) FROM sqlite_master WHERE type = 'index' AND name = :name",
+                                  {'name': index.name}).scalar() > 0
+    return connection.dialect.has_index(connection, index.table.name, index.name)
+
+def create_indexes(connection):
+    # Safe to run against an existing database, indexes that are already there are left alone.
+    for index in secondary_indexes:
+        if not index_exists(connection, index):
+            index.create(connection)
+
+def drop_indexes(connection):
+    for index in secondary_indexes:
+        if index_exists(connection, index):
+            index.drop(connection)
+
+# SQLite FTS5 index over every book's title, description, author names and review texts.
+# The rowid of each entry is the book id; triggers on the source tables keep it in sync.
+BOOK_AUTHOR_NAMES = "(SELECT group_concat(authors.name, ' ') FROM books_authors JOIN authors ON authors.id = books_authors.author_id WHERE books_authors.book_id = {book_id})"
+BOOK_FIRST_AUTHOR_NAME = "(SELECT authors.name FROM books_authors JOIN authors ON authors.id = books_authors.author_id WHERE books_authors.book_id = {book_id} ORDER BY books_authors.id LIMIT 1)"
+BOOK_REVIEW_TEXTS = "(SELECT group_concat(reviews.review_text, ' ') FROM reviews WHERE reviews.book_id = {book_id})"
+
+search_index_statements = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(title, description, authors, reviews)',
+    'CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN '
+    'INSERT OR REPLACE INTO books_fts (rowid, title, description, authors, reviews) VALUES (new.id, new.title, new.description, '
+    + BOOK_AUTHOR_NAMES.format(book_id='new.id') + ', ' + BOOK_REVIEW_TEXTS.format(book_id='new.id') + '); END',
+    'CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, description ON books BEGIN '
+    'UPDATE books_fts SET title = new.title, description = new.description WHERE rowid = new.id; END',
+    'CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN '
+    'DELETE FROM books_fts WHERE rowid = old.id; END',
+    'CREATE TRIGGER IF NOT EXISTS books_authors_fts_insert AFTER INSERT ON books_authors BEGIN '
+    'UPDATE books_fts SET authors = ' + BOOK_AUTHOR_NAMES.format(book_id='new.book_id') + ' WHERE rowid = new.book_id; END',
+    'CREATE TRIGGER IF NOT EXISTS books_authors_fts_delete AFTER DELETE ON books_authors BEGIN '
+    'UPDATE books_fts SET authors = ' + BOOK_AUTHOR_NAMES.format(book_id='old.book_id') + ' WHERE rowid = old.book_id; END',
+    'CREATE TRIGGER IF NOT EXISTS authors_fts_insert AFTER INSERT ON authors BEGIN '
+    'UPDATE books_fts SET authors = ' + BOOK_AUTHOR_NAMES.format(book_id='books_fts.rowid')
+    + ' WHERE rowid IN (SELECT book_id FROM books_authors WHERE author_id = new.id); END',
+    'CREATE TRIGGER IF NOT EXISTS authors_fts_update AFTER UPDATE OF name ON authors BEGIN '
+    'UPDATE books_fts SET authors = ' + BOOK_AUTHOR_NAMES.format(book_id='books_fts.rowid')
+    + ' WHERE rowid IN (SELECT book_id FROM books_authors WHERE author_id = new.id); END',
+    'CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN '
+    'UPDATE books_fts SET reviews = ' + BOOK_REVIEW_TEXTS.format(book_id='new.book_id') + ' WHERE rowid = new.book_id; END',
+    'CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF review_text, book_id ON reviews BEGIN '
+    'UPDATE books_fts SET reviews = ' + BOOK_REVIEW_TEXTS.format(book_id='books_fts.rowid')
+    + ' WHERE rowid IN (old.book_id, new.book_id); END',
+    'CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN '
+    'UPDATE books_fts SET reviews = ' + BOOK_REVIEW_TEXTS.format(book_id='old.book_id') + ' WHERE rowid = old.book_id; END',
+]
+
+def create_search_index(connection):
+    # Safe to run against an existing database: entries are backfilled when the index is new.
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in search_index_statements:
+        connection.execute(statement)
+    if connection.execute('SELECT count(*) FROM books_fts').scalar() == 0:
+        connection.execute(
+            'INSERT INTO books_fts (rowid, title, description, authors, reviews) SELECT books.id, books.title, books.description, '
+            + BOOK_AUTHOR_NAMES.format(book_id='books.id') + ', ' + BOOK_REVIEW_TEXTS.format(book_id='books.id') + ' FROM books'
+        )
+
+def drop_search_index(connection):
+    # The triggers go too, they would fail on every write to the source tables without the index.
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in search_index_statements:
+        if statement.startswith('CREATE TRIGGER'):
+            connection.execute('DROP TRIGGER IF EXISTS ' + statement.split()[5])
+    connection.execute('DROP TABLE IF EXISTS books_fts')
+
+CHANGE_COUNTED_TABLES = ['books', 'books_authors', 'authors', 'publishers', 'reviews', 'user_reading_list']
+
+change_counter_statements = [
+    'CREATE TRIGGER IF NOT EXISTS ' + table + '_changes_' + operation.lower() + ' AFTER ' + operation + ' ON ' + table
+    + ' BEGIN INSERT INTO table_changes (id, changes) VALUES (1, 1) ON CONFLICT (id) DO UPDATE SET changes = changes + 1; END'
+    for table in CHANGE_COUNTED_TABLES for operation in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+def create_change_counter(connection):
+    # Safe to run against an existing database, the count starts from its first change after.
+    table_changes_table.create(connection, checkfirst=True)
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in change_counter_statements:
+        connection.execute(statement)
+
+@event.listens_for(metadata, 'after_create')
+def _create_change_counter(target, connection, **kw):
+    create_change_counter(connection)
+
+@event.listens_for(metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    create_search_index(connection)
+
+@event.listens_for(metadata, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    drop_search_index(connection)
+
+class _SideTableEntry(ref):
+    # A mapped instance's entry in the side table, a weak reference to the instance carrying its state and dict.
+    __slots__ = ('key', 'state', 'dict')
+
+class SideTableInstrumentation(InstrumentationManager):
+    # Instruments the domain classes, whose __slots__ leave their instances without a __dict__. Each mapped
+    # instance's InstanceState and loaded attribute values are kept in a side table under the instance's id,
+    # and the entry goes when the instance is collected. The slot descriptors and members that mapping
+    # replaces are put back when the class is unmapped, so clear_mappers leaves plain slotted classes.
+
+    def __init__(self, class_):
+        self.__originals = dict()
+        self.__instances = dict()
+        self.__forget_entry = self.__forget
+
+    def install_descriptor(self, class_, key, inst):
+        self.__originals.setdefault(key, vars(class_).get(key))
+        setattr(class_, key, inst)
+
+    def uninstall_descriptor(self, class_, key):
+        original = self.__originals.pop(key, None)
+        if original is None:
+            delattr(class_, key)
+        else:
+            setattr(class_, key, original)
+
+    install_member = install_descriptor
+    uninstall_member = uninstall_descriptor
+
+    def unregister(self, class_, manager):
+        # Unmapping doesn't uninstall the descriptors one by one, so they are all put back here.
+        for key in list(self.__originals):
+            self.uninstall_descriptor(class_, key)
+        super().unregister(class_, manager)
+
+    def install_state(self, class_, instance, state):
+        # the weak reference's callback runs as the instance is freed, before its id can be reused
+        entry = _SideTableEntry(instance, self.__forget_entry)
+        entry.key, entry.state, entry.dict = id(instance), state, dict()
+        self.__instances[entry.key] = entry
+
+    def __forget(self, entry):
+        self.__instances.pop(entry.key, None)
+
+    def remove_state(self, class_, instance):
+        self.__instances.pop(id(instance), None)
+
+    def state_getter(self, class_):
+        # A KeyError tells SQLAlchemy the instance has no state, like an AttributeError would.
+        return lambda instance: self.__instances[id(instance)].state
+
+    def get_instance_dict(self, class_, instance):
+        return self.__instances[id(instance)].dict
+
 def map_model_to_tables():
+    for cls in (model.User, model.Review, model.Publisher, model.Book, model.Author):
+        cls.__sa_instrumentation_manager__ = SideTableInstrumentation
     mapper_registry = registry()
     mapper_registry.map_imperatively(model.User, users_table, properties={
         '_User__user_id': users_table.c.id,
@@ -93,6 +291,8 @@ def map_model_to_tables():
         '_Book__release_year': books_table.c.release_year,
         '_Book__title': books_table.c.title,
         '_Book__description': books_table.c.description,
+        '_Book__ebook': books_table.c.ebook,
+        'publisher_name': books_table.c.publisher_name,
         '_Book__publisher': relationship(model.Publisher,back_populates="_Publisher__books",viewonly=True),
         '_Book__authors': relationship(model.Author,secondary=books_authors_table,back_populates='_Author__books'),
         '_Book__users':relationship(model.User,secondary=user_reading_list_table,back_populates='_User__reading_list'),
@@ -0,0 +1,150 @@
+from typing import Iterable, List
+
+# Completions kept per trie node, the most an autocomplete lookup returns
+COMPLETIONS = 10
+
+# Values the search forms complete, see CompletionIndex
+COMPLETION_FIELDS = ('title', 'author', 'author_id', 'publisher')
+
+
+class _Node:
+    __slots__ = ('children', 'top')
+
+    def __init__(self, top=None):
+        # First character of each edge -> (edge label, child node)
+        self.children = dict()
+        # (-weight, key) of the heaviest keys at or below this node, heaviest first
+        self.top = list(top) if top is not None else []
+
+    def rank(self, key: str, entry: tuple, size: int):
+        for position, (weight, ranked_key) in enumerate(self.top):
+            if ranked_key == key:
+                del self.top[position]
+                break
+        self.top.append(entry)
+        self.top.sort()
+        del self.top[size:]
+
+
+class PrefixIndex:
+    # Radix trie over casefolded values, each edge labelled with the run of characters its branch shares.
+    # Every node keeps the heaviest values below it, so completing a prefix walks the prefix and reads
+    # that list: O(len(prefix) + k) whatever the number of values. Weights only ever grow, which keeps
+    # the lists exact as they are updated along a value's path.
+
+    def __init__(self, size: int = COMPLETIONS):
+        self.__root = _Node()
+        self.__size = size
+        self.__weights = dict()
+        self.__values = dict()
+        self.__exact = set()
+
+    def __len__(self):
+        return len(self.__weights)
+
+    def __contains__(self, value: str):
+        # Exact, case-sensitive membership, as a select of the values would check it.
+        return value in self.__exact
+
+    def known(self, value: str):
+        # value as it was added, matched exactly or else ignoring case, or None when it never was.
+        if value in self.__exact:
+            return value
+        if not isinstance(value, str):
+            return None
+        return self.__values.get(value.casefold())
+
+    def add(self, value: str, weight: int = 1):
+        # Adds weight to value's popularity, inserting value first if it is new.
+        if not isinstance(value, str) or value.strip() == "":
+            return
+        key = value.casefold()
+        self.__exact.add(value)
+        self.__values.setdefault(key, value)
+        self.__weights[key] = self.__weights.get(key, 0) + weight
+        entry = (-self.__weights[key], key)
+        for node in self.__path(key):
+            node.rank(key, entry, self.__size)
+
+    def add_all(self, entries: Iterable):
+        for value, weight in entries:
+            self.add(value, weight)
+
+    def complete(self, prefix: str, limit: int = COMPLETIONS) -> List[str]:
+        # The heaviest values starting with prefix, ignoring case, ties in alphabetical order.
+        if not isinstance(prefix, str):
+            return []
+        node = self.__find(prefix.casefold())
+        if node is None:
+            return []
+        return [self.__values[key] for weight, key in node.top[:limit]]
+
+    def __find(self, prefix: str):
+        # The node whose subtree holds every key starting with prefix, which may end part way along an edge.
+        node = self.__root
+        rest = prefix
+        while rest:
+            edge = node.children.get(rest[0])
+            if edge is None:
+                return None
+            label, child = edge
+            if label.startswith(rest):
+                return child
+            if not rest.startswith(label):
+                return None
+            rest = rest[len(label):]
+            node = child
+        return node
+
+    def __path(self, key: str) -> List[_Node]:
+        # The nodes from the root down to key's own node, splitting an edge or adding a leaf as needed.
+        node = self.__root
+        path = [node]
+        rest = key
+        while rest:
+            edge = node.children.get(rest[0])
+            if edge is None:
+                leaf = _Node()
+                node.children[rest[0]] = (rest, leaf)
+                path.append(leaf)
+                return path
+            label, child = edge
+            common = 0
+            while common < len(label) and common < len(rest) and label[common] == rest[common]:
+                common += 1
+            if common < len(label):
+                # key leaves the edge part way along, which becomes a node of its own with the same keys below it.
+                middle = _Node(child.top)
+                middle.children[label[common]] = (label[common:], child)
+                node.children[rest[0]] = (label[:common], middle)
+                child = middle
+            path.append(child)
+            node = child
+            rest = rest[common:]
+        return path
+
+
+class CompletionIndex:
+    # A PrefixIndex per field of COMPLETION_FIELDS. Titles are weighted by their reviews, authors, author
+    # ids and publishers by their books.
+
+    def __init__(self, size: int = COMPLETIONS):
+        self.__fields = {field: PrefixIndex(size) for field in COMPLETION_FIELDS}
+
+    def __getitem__(self, field: str) -> PrefixIndex:
+        return self.__fields[field]
+
+    def add_book(self, book):
+        self.__fields['title'].add(book.title)
+        for author in book.authors:
+            self.__fields['author'].add(author.full_name)
+            self.__fields['author_id'].add(str(author.unique_id))
+        if book.publisher is not None:
+            self.__fields['publisher'].add(book.publisher.name)
+
+    def add_review(self, review):
+        if review.book is not None:
+            self.__fields['title'].add(review.book.title)
+
+    def complete(self, field: str, prefix: str, limit: int = COMPLETIONS) -> List[str]:
+        return self.__fields[field].complete(prefix, limit)
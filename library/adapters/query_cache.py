@@ -0,0 +1,211 @@
+from threading import Lock
+from time import monotonic
+from typing import List
+
+from library.adapters.cache import LRUCache
+from library.adapters.repository import PAGE_SIZE, SEARCHES, books_in_order, page_of_ids
+from library.domain.model import Book
+
+# Tables each cached query reads, and each write changes. A write makes every cached result that read
+# one of its tables stale.
+BOOK_QUERY_TABLES = {
+    'get_books_by_author_name': ('books', 'books_authors', 'authors'),
+    'get_books_by_author_id': ('books', 'books_authors'),
+    'get_books_by_release_year': ('books',),
+    'get_book_by_title_specific': ('books',),
+    'get_book_by_title_general': ('books',),
+    'get_books_by_publisher_name': ('books',),
+    'search_books_by_text': ('books', 'books_authors', 'authors', 'reviews'),
+    'find_books': ('books', 'books_authors', 'authors'),
+}
+VALUE_QUERY_TABLES = {
+    'get_author_names': ('authors',),
+    'get_author_ids': ('authors',),
+    'get_all_publisher_names': ('publishers',),
+}
+WRITE_TABLES = {
+    'add_book': ('books', 'books_authors', 'authors', 'publishers'),
+    'add_review': ('reviews',),
+    'add_reviews': ('reviews',),
+    'add_review_raw': ('reviews',),
+    'add_user': ('users',),
+    'add_book_to_reading_list': ('user_reading_list',),
+    'add_author': ('authors',),
+    'add_publisher': ('publishers',),
+}
+
+QUERY_CACHE_SIZE = 1024         # cached results
+QUERY_CACHE_TTL = 60            # seconds a result is served for, bounds how stale another process' writes leave it
+MAX_CACHED_RESULT_LENGTH = 1000 # longer results are not cached
+
+
+class QueryCachingRepository:
+    # Wraps a repository and keeps the results of its search queries, keyed by method and arguments.
+    # Book queries keep only the book ids and load the books again by id, so no ORM object outlives the
+    # session that loaded it. Each table has a generation that its writes bump; a result remembers the
+    # generations it was read at and is dropped once any of them moves on or it is older than ttl.
+    # Everything not cached is passed straight through to the wrapped repository.
+
+    def __init__(self, repository, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.__repository = repository
+        self.__results = LRUCache(maxsize)
+        self.__ttl = ttl
+        self.__generations = dict()
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def repository(self):
+        return self.__repository
+
+    @property
+    def stats(self):
+        with self.__lock:
+            return {'hits': self.__hits, 'misses': self.__misses, 'size': len(self.__results), 'maxsize': self.__results.maxsize}
+
+    def __getattr__(self, name):
+        if name.startswith('_QueryCachingRepository__'):
+            raise AttributeError(name)
+        return getattr(self.__repository, name)
+
+    def clear(self):
+        with self.__lock:
+            self.__results.clear()
+
+########################################        Cached queries
+
+    def get_books_by_author_name(self, author_name: str):
+        return self.__cached_books('get_books_by_author_name', author_name)
+
+    def get_books_by_author_id(self, author_id: int):
+        return self.__cached_books('get_books_by_author_id', author_id)
+
+    def get_books_by_release_year(self, target_date: int) -> List[Book]:
+        return self.__cached_books('get_books_by_release_year', target_date)
+
+    def get_book_by_title_specific(self, title: str):
+        return self.__cached_books('get_book_by_title_specific', title)
+
+    def get_book_by_title_general(self, title: str):
+        return self.__cached_books('get_book_by_title_general', title)
+
+    def get_books_by_publisher_name(self, publisher_name: str):
+        return self.__cached_books('get_books_by_publisher_name', publisher_name)
+
+    def search_books_by_text(self, query: str, no_of_books: int = 10):
+        return self.__cached_books('search_books_by_text', query, no_of_books)
+
+    def find_books(self, query):
+        return self.__cached_books('find_books', query)
+
+    def search_book_ids(self, search: str, *args) -> List[int]:
+        book_ids = self.__lookup('search_book_ids', (search,) + args, BOOK_QUERY_TABLES[SEARCHES[search]])
+        if book_ids is None:
+            generations = self.__current_generations(BOOK_QUERY_TABLES[SEARCHES[search]])
+            book_ids = tuple(self.__repository.search_book_ids(search, *args))
+            if len(book_ids) <= MAX_CACHED_RESULT_LENGTH:
+                self.__store('search_book_ids', (search,) + args, generations, book_ids)
+        return list(book_ids)
+
+    def search_books_page(self, search: str, *args, page: int = 1, page_size: int = PAGE_SIZE, sort: str = None, descending: bool = False):
+        book_ids = self.search_book_ids(search, *args)
+        if sort is not None:
+            book_ids = self.__repository.sort_orders.sorted(sort, book_ids, descending)
+        return page_of_ids(book_ids, page, page_size, lambda book_ids: books_in_order(self.__repository, book_ids))
+
+    def get_author_names(self):
+        return self.__cached_value('get_author_names')
+
+    def get_author_ids(self):
+        return self.__cached_value('get_author_ids')
+
+    def get_all_publisher_names(self):
+        return self.__cached_value('get_all_publisher_names')
+
+########################################        Writes
+
+    def add_book(self, book: Book):
+        return self.__write('add_book', book)
+
+    def add_review(self, review):
+        return self.__write('add_review', review)
+
+    def add_reviews(self, reviews):
+        return self.__write('add_reviews', reviews)
+
+    def add_review_raw(self, book, review_text, rating, user_id):
+        return self.__write('add_review_raw', book, review_text, rating, user_id)
+
+    def add_user(self, user):
+        return self.__write('add_user', user)
+
+    def add_book_to_reading_list(self, book: Book, user_name: str):
+        return self.__write('add_book_to_reading_list', book, user_name)
+
+    def add_author(self, author):
+        return self.__write('add_author', author)
+
+    def add_publisher(self, publisher):
+        return self.__write('add_publisher', publisher)
+
+########################################        Cache entries
+
+    def __cached_books(self, method: str, *args):
+        book_ids = self.__lookup(method, args, BOOK_QUERY_TABLES[method])
+        if book_ids is not None:
+            return books_in_order(self.__repository, book_ids)
+        generations = self.__current_generations(BOOK_QUERY_TABLES[method])
+        books = getattr(self.__repository, method)(*args)
+        if len(books) <= MAX_CACHED_RESULT_LENGTH:
+            self.__store(method, args, generations, tuple(book.book_id for book in books))
+        return books
+
+    def __cached_value(self, method: str):
+        # Lists of names and ids, handed out as copies so callers cannot change the cached one.
+        values = self.__lookup(method, (), VALUE_QUERY_TABLES[method])
+        if values is None:
+            generations = self.__current_generations(VALUE_QUERY_TABLES[method])
+            values = tuple(getattr(self.__repository, method)())
+            self.__store(method, (), generations, values)
+        return list(values)
+
+    def __write(self, method: str, *args):
+        try:
+            return getattr(self.__repository, method)(*args)
+        finally:
+            # Bumped even when the write fails part way, it may have changed some rows already.
+            with self.__lock:
+                for table in WRITE_TABLES[method]:
+                    self.__generations[table] = self.__generations.get(table, 0) + 1
+
+    def __current_generations(self, tables):
+        # Read before the query runs, so a write that lands while it runs leaves the result stale.
+        with self.__lock:
+            return tuple(self.__generations.get(table, 0) for table in tables)
+
+    def __lookup(self, method: str, args: tuple, tables):
+        try:
+            key = (method, args)
+            hash(key)
+        except TypeError:
+            return None
+        with self.__lock:
+            entry = self.__results.get(key)
+            if entry is not None:
+                generations, stored_at, value = entry
+                if generations == tuple(self.__generations.get(table, 0) for table in tables) and monotonic() - stored_at < self.__ttl:
+                    self.__hits += 1
+                    return value
+                self.__results.invalidate(key)
+            self.__misses += 1
+        return None
+
+    def __store(self, method: str, args: tuple, generations: tuple, value: tuple):
+        try:
+            key = (method, args)
+            hash(key)
+        except TypeError:
+            return
+        with self.__lock:
+            self.__results.put(key, (generations, monotonic(), value))
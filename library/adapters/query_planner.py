@@ -0,0 +1,44 @@
+from collections import namedtuple
+from typing import Callable, Iterable, List
+
+# A multi-criteria book search, every criterion that is not None has to match. The year bounds are
+# inclusive, title matches part of a title and the author criteria match any one of a book's authors.
+BookQuery = namedtuple('BookQuery', ['author_name', 'author_id', 'release_year_from', 'release_year_to',
+                                     'publisher_name', 'title', 'ebook'], defaults=(None,) * 7)
+
+# One criterion of a plan. estimate is the most books it can match, book_ids lists the ids of the books it
+# matches in id order, or is None when there is no index to list them from, and matches checks one book id.
+Criterion = namedtuple('Criterion', ['name', 'estimate', 'book_ids', 'matches'])
+
+
+def is_empty(query: BookQuery) -> bool:
+    return all(value is None for value in query)
+
+
+def plan(criteria: Iterable[Criterion]) -> List[Criterion]:
+    # Most selective first. A criterion without an index can only check the candidates, so it goes last.
+    return sorted(criteria, key=lambda criterion: (criterion.book_ids is None, criterion.estimate))
+
+
+def execute(criteria: Iterable[Criterion], all_book_ids: Callable) -> List[int]:
+    # Ids of the books matching every criterion, in id order. The candidates start as the smallest posting
+    # list and each other criterion narrows them down: a posting list no longer than the candidates is
+    # intersected as a set, a longer one is skipped in favour of checking each candidate, so the work stays
+    # proportional to the smallest list rather than the largest.
+    criteria = plan(criteria)
+    if len(criteria) == 0:
+        return list(all_book_ids())
+    first = criteria[0]
+    if first.book_ids is None:
+        book_ids = [book_id for book_id in all_book_ids() if first.matches(book_id)]
+    else:
+        book_ids = list(first.book_ids())
+    for criterion in criteria[1:]:
+        if len(book_ids) == 0:
+            break
+        if criterion.book_ids is not None and criterion.estimate <= len(book_ids):
+            members = set(criterion.book_ids())
+            book_ids = [book_id for book_id in book_ids if book_id in members]
+        else:
+            book_ids = [book_id for book_id in book_ids if criterion.matches(book_id)]
+    return book_ids
@@ -0,0 +1,75 @@
+from random import shuffle
+from threading import Lock, Thread
+from typing import Hashable, List
+
+
+class ShuffledPool:
+    # Hands out random items by walking a shuffled copy of the pool, so a draw of n items costs O(n)
+    # and the items in one draw are distinct. Once half of the current order has been handed out the
+    # next order is shuffled on a background thread, and swapped in when the current one runs out.
+
+    def __init__(self):
+        self.__items = []
+        self.__members = set()
+        self.__order = []
+        self.__next_order = None
+        self.__refreshing = False
+        self.__cursor = 0
+        self.__unshuffled = False
+        self.__lock = Lock()
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __contains__(self, item: Hashable):
+        return item in self.__members
+
+    def add(self, item: Hashable):
+        with self.__lock:
+            if item in self.__members:
+                return
+            self.__members.add(item)
+            self.__items.append(item)
+            # New items join the part of the order not handed out yet, which is shuffled again before
+            # the next draw, and a pending order shuffled without them is dropped. Appending keeps an
+            # add O(1), so loading n items costs O(n) rather than an insert per item.
+            self.__order.append(item)
+            self.__unshuffled = True
+            self.__next_order = None
+
+    def sample(self, n: int) -> List[Hashable]:
+        if not isinstance(n, int) or n < 0:
+            raise ValueError
+        with self.__lock:
+            n = min(n, len(self.__items))
+            if self.__cursor + n > len(self.__order):
+                # Items left at the end of the old order are skipped rather than mixed into the new
+                # one, which could repeat an item within this draw.
+                self.__order = self.__next_order if self.__next_order is not None else self.__shuffled()
+                self.__next_order = None
+                self.__cursor = 0
+            elif self.__unshuffled:
+                rest = self.__order[self.__cursor:]
+                shuffle(rest)
+                self.__order[self.__cursor:] = rest
+            self.__unshuffled = False
+            items = self.__order[self.__cursor:self.__cursor + n]
+            self.__cursor += n
+            if self.__next_order is None and not self.__refreshing and 2 * self.__cursor >= len(self.__order):
+                self.__refreshing = True
+                Thread(target=self.__refresh, daemon=True).start()
+        return items
+
+    def __shuffled(self) -> List[Hashable]:
+        order = list(self.__items)
+        shuffle(order)
+        return order
+
+    def __refresh(self):
+        with self.__lock:
+            items = list(self.__items)
+        shuffle(items)
+        with self.__lock:
+            if len(items) == len(self.__items):
+                self.__next_order = items
+            self.__refreshing = False
@@ -0,0 +1,144 @@
+from bisect import bisect_left, insort_left
+from heapq import merge, nsmallest
+from typing import Iterable, List, Tuple
+
+# Score a book earns for every way it resembles a book in the reading list
+AUTHOR_WEIGHT = 4           # per shared author
+RELEASE_YEAR_WEIGHT = 1     # released within a year of it
+PUBLISHER_WEIGHT = 2        # same publisher
+
+NEIGHBOUR_COUNT = 20
+
+# Number of users whose recommendation rankings are kept between requests
+RECOMMENDATION_CACHE_SIZE = 1024
+
+
+class NeighbourIndex:
+    # Keeps each book's NEIGHBOUR_COUNT best scoring neighbours so a recommendation only has to
+    # merge the short neighbour lists of the books in a reading list. Lists are worked out on first
+    # use (or all at once with build) and dropped whenever the catalogue changes.
+
+    def __init__(self, neighbour_count: int = NEIGHBOUR_COUNT):
+        self.__neighbour_count = neighbour_count
+        self.__books = dict()
+        self.__by_author = dict()
+        self.__by_publisher = dict()
+        self.__by_release_year = dict()
+        self.__by_publisher_year = dict()
+        self.__neighbours = dict()
+
+    def __len__(self):
+        return len(self.__books)
+
+    def __contains__(self, book_id: int):
+        return book_id in self.__books
+
+    def add(self, book_id: int, release_year: int, publisher_name: str, author_ids: Iterable[int]):
+        entry = (release_year, publisher_name, tuple(sorted(set(author_ids))))
+        if self.__books.get(book_id) == entry:
+            return
+        self.remove(book_id)
+        self.__books[book_id] = entry
+        for key, group in self.__groups(entry):
+            insort_left(group.setdefault(key, []), book_id)
+        self.__neighbours.clear()
+
+    def add_book(self, book):
+        publisher_name = None if book.publisher is None else book.publisher.name
+        self.add(book.book_id, book.release_year, publisher_name, [author.unique_id for author in book.authors])
+
+    def add_all(self, entries: Iterable):
+        for book_id, release_year, publisher_name, author_ids in entries:
+            self.add(book_id, release_year, publisher_name, author_ids)
+
+    def remove(self, book_id: int):
+        entry = self.__books.pop(book_id, None)
+        if entry is None:
+            return
+        for key, group in self.__groups(entry):
+            book_ids = group[key]
+            del book_ids[bisect_left(book_ids, book_id)]
+            if len(book_ids) == 0:
+                del group[key]
+        self.__neighbours.clear()
+
+    def build(self):
+        for book_id in self.__books:
+            self.neighbours(book_id)
+
+    def neighbours(self, book_id: int) -> List[Tuple[int, int]]:
+        # (book id, score) pairs, best first and ties in book id order.
+        neighbours = self.__neighbours.get(book_id)
+        if neighbours is None:
+            if book_id not in self.__books:
+                return []
+            neighbours = self.__neighbours[book_id] = self.__find_neighbours(book_id)
+        return neighbours
+
+    def recommend(self, book_ids: Iterable[int], no_of_books: int = 10) -> List[int]:
+        # Best scoring book ids for a reading list, or every scored book when no_of_books is None.
+        book_ids = list(book_ids)
+        reading_list = set(book_ids)
+        scores = dict()
+        for book_id in book_ids:
+            for neighbour, score in self.neighbours(book_id):
+                if neighbour not in reading_list:
+                    scores[neighbour] = scores.get(neighbour, 0) + score
+        key = lambda item: (-item[1], item[0])
+        if no_of_books is None:
+            ranking = sorted(scores.items(), key=key)
+        else:
+            ranking = nsmallest(no_of_books, scores.items(), key=key)
+        return [book_id for book_id, score in ranking]
+
+    def __groups(self, entry):
+        release_year, publisher_name, author_ids = entry
+        for author_id in author_ids:
+            yield author_id, self.__by_author
+        if publisher_name is not None:
+            yield publisher_name, self.__by_publisher
+        if release_year is not None:
+            yield release_year, self.__by_release_year
+            if publisher_name is not None:
+                yield (publisher_name, release_year), self.__by_publisher_year
+
+    def __score(self, entry, other_entry) -> int:
+        release_year, publisher_name, author_ids = entry
+        other_year, other_publisher, other_author_ids = other_entry
+        score = AUTHOR_WEIGHT * len(set(author_ids).intersection(other_author_ids))
+        if release_year is not None and other_year is not None and abs(release_year - other_year) <= 1:
+            score += RELEASE_YEAR_WEIGHT
+        if publisher_name is not None and publisher_name == other_publisher:
+            score += PUBLISHER_WEIGHT
+        return score
+
+    def __find_neighbours(self, book_id: int) -> List[Tuple[int, int]]:
+        entry = self.__books[book_id]
+        release_year, publisher_name, author_ids = entry
+
+        # Author groups are small, so every book sharing an author is scored in full.
+        candidates = set()
+        for author_id in author_ids:
+            candidates.update(self.__by_author[author_id])
+        candidates.discard(book_id)
+        neighbours = sorted(((other, self.__score(entry, self.__books[other])) for other in candidates),
+                            key=lambda item: (-item[1], item[0]))[:self.__neighbour_count]
+
+        # Everything else scores one of three fixed values, so the remaining places are filled tier by
+        # tier from the sorted groups without scoring whole publishers or years.
+        candidates.add(book_id)
+        years = [] if release_year is None else [release_year - 1, release_year, release_year + 1]
+        tiers = [
+            (PUBLISHER_WEIGHT + RELEASE_YEAR_WEIGHT,
+             merge(*(self.__by_publisher_year.get((publisher_name, year), []) for year in years))),
+            (PUBLISHER_WEIGHT, self.__by_publisher.get(publisher_name, [])),
+            (RELEASE_YEAR_WEIGHT, merge(*(self.__by_release_year.get(year, []) for year in years))),
+        ]
+        for score, book_ids in tiers:
+            for other in book_ids:
+                if len(neighbours) >= self.__neighbour_count:
+                    return neighbours
+                if other not in candidates:
+                    candidates.add(other)
+                    neighbours.append((other, score))
+        return neighbours
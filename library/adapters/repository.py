@@ -1,11 +1,66 @@
 import abc
 import re
-from typing import List
+from collections import namedtuple
+from typing import List, Optional
 
 from library.domain.model import User,Book,Review,Author,Publisher
+from library.adapters.sort_orders import SORT_KEYS
+from library.adapters.query_planner import BookQuery
+from library.adapters.prefix_index import COMPLETION_FIELDS, COMPLETIONS
+from library.adapters.fuzzy_index import SUGGESTION_FIELDS, SUGGESTIONS
 
 repo_instance = None
 
+# Books shown per page of the book list and of search results
+PAGE_SIZE = 10
+
+# Searches search_books_page can page through, and the repository method each one matches
+SEARCHES = {
+    'author_id': 'get_books_by_author_id',
+    'author_name': 'get_books_by_author_name',
+    'release_year': 'get_books_by_release_year',
+    'title': 'get_book_by_title_general',
+    'publisher': 'get_books_by_publisher_name',
+    'text': 'search_books_by_text',
+    'criteria': 'find_books',
+}
+
+# One page of books. page is clamped to the pages there are, total counts every book on every page and
+# cursor, for pages of the whole catalogue, is the id to pass as after for the next page, or None on the last.
+BookPage = namedtuple('BookPage', ['books', 'page', 'page_size', 'total', 'cursor'])
+
+def last_page(total: int, page_size: int) -> int:
+    return max(1, -(-total // page_size))
+
+def page_of(books: list, page: int, page_size: int = PAGE_SIZE) -> BookPage:
+    # Slices a page out of a list of books that is already at hand.
+    page = min(max(page, 1), last_page(len(books), page_size))
+    return BookPage(books[(page - 1) * page_size:page * page_size], page, page_size, len(books), None)
+
+def page_of_ids(book_ids: List[int], page: int, page_size: int, load_books) -> BookPage:
+    # Slices a page out of a list of book ids, only the books on that page are loaded, in id list order.
+    page = min(max(page, 1), last_page(len(book_ids), page_size))
+    return BookPage(load_books(book_ids[(page - 1) * page_size:page * page_size]), page, page_size, len(book_ids), None)
+
+def books_in_order(repository, book_ids: List[int]) -> list:
+    # The books with the given ids that exist, in the order of book_ids.
+    books = {book.book_id: book for book in repository.get_books_by_ids(book_ids)}
+    return [books[book_id] for book_id in book_ids if book_id in books]
+
+def page_of_order(sort_orders, sort: str, descending: bool, page: int, page_size: int, after: int, before: int, load_books) -> BookPage:
+    # Slices a page out of one of the catalogue's sort orders. A cursor is found in the order by bisection,
+    # without one the page number gives the slice.
+    total = len(sort_orders)
+    page = min(max(page, 1), last_page(total, page_size))
+    start = (page - 1) * page_size
+    if after is not None and sort_orders.position(sort, after, descending) is not None:
+        start = sort_orders.position(sort, after, descending) + 1
+    elif before is not None and (sort_orders.position(sort, before, descending) or 0) >= page_size:
+        start = sort_orders.position(sort, before, descending) - page_size
+    book_ids = sort_orders.ids(sort, start, start + page_size + 1, descending)
+    cursor = book_ids[page_size - 1] if len(book_ids) > page_size else None
+    return BookPage(load_books(book_ids[0:page_size]), page, page_size, total, cursor)
+
 class RepositoryException(Exception):
 
     def __init__(self, message=None):
@@ -73,9 +128,37 @@ class AbstractRepository():
 
     def get_books_by_publisher_name(self,publisher_name:str):
         raise NotImplementedError
+
+    def search_books_by_text(self,query:str,no_of_books:int = 10):
+        raise NotImplementedError
     
     def get_all_books(self):
         raise NotImplementedError
+
+    def find_books(self, query: BookQuery) -> List[Book]:
+        # Books matching every criterion of query, in book id order; an empty query matches every book.
+        raise NotImplementedError
+
+    def get_books_page(self, page: int = 1, page_size: int = PAGE_SIZE, after: int = None, before: int = None,
+                       sort: str = 'id', descending: bool = False) -> BookPage:
+        # A page of the catalogue sorted by one of SORT_KEYS. after and before are book ids taken from the last
+        # or first book of a neighbouring page, which find the page without counting through the ones before it.
+        raise NotImplementedError
+
+    def search_book_ids(self, search: str, *args) -> List[int]:
+        # Ids of the books the SEARCHES method named by search finds for args, in the order it finds them.
+        raise NotImplementedError
+
+    def search_books_page(self, search: str, *args, page: int = 1, page_size: int = PAGE_SIZE,
+                          sort: str = None, descending: bool = False) -> BookPage:
+        # A page of the books the SEARCHES method named by search finds for args, in the order it finds them
+        # or sorted by one of SORT_KEYS.
+        raise NotImplementedError
+
+    @property
+    def sort_orders(self):
+        # The SortOrders of every book, kept current as books are added.
+        raise NotImplementedError
     
 ########################################        Reviews
 
@@ -86,6 +169,9 @@ class AbstractRepository():
         # if review.book is None or review not in review.book.reviews:
         #     raise RepositoryException('REview not correctly attached to an Article')
 
+    def add_reviews(self, reviews: List[Review]):
+        raise NotImplementedError
+
     def get_reviews(self):
         raise NotImplementedError
 
@@ -93,10 +179,22 @@ class AbstractRepository():
 
     def get_recommendations(self,user_name=None,no_of_books = 10):
         raise NotImplementedError
+
+    def get_random_books(self,no_of_books:int):
+        # Distinct books picked at random, or every book when there are fewer than no_of_books
+        raise NotImplementedError
         
     def __find_recommendations(self,reading_list):
         raise NotImplementedError
 
+    def build_recommendations(self):
+        # Precomputes every book's recommendation neighbours
+        raise NotImplementedError
+
+    def get_recommendation_cache_stats(self):
+        # Hits, misses, size and maxsize of the per user recommendation cache
+        raise NotImplementedError
+
 ########################################        Authors and Publishers
     
     def add_author(self,author:Author):
@@ -114,12 +212,30 @@ class AbstractRepository():
     def get_all_publisher_names(self):
         raise NotImplementedError
 
+########################################        Completions
+
+    def get_completions(self, field: str, prefix: str, limit: int = COMPLETIONS) -> List[str]:
+        # The most popular values of field, one of COMPLETION_FIELDS, starting with prefix, ignoring case
+        raise NotImplementedError
+
+    def known_value(self, field: str, value: str) -> Optional[str]:
+        # The value of field that value names, as the completions offer it, matched exactly or else ignoring
+        # case, or None when field has no such value
+        raise NotImplementedError
+
+########################################        Suggestions
+
+    def get_suggestions(self, field: str, text: str, limit: int = SUGGESTIONS) -> List[str]:
+        # Corrections of a misspelt search of field, one of SUGGESTION_FIELDS, closest first, within
+        # MAX_EDIT_DISTANCE edits of text
+        raise NotImplementedError
+
 
 ########################################        Reading List
 
     def get_reading_list_for_user(self,user_name=None):
         raise NotImplementedError
     
-    def add_book_to_reading_list(self,user:User,book:Book):
+    def add_book_to_reading_list(self,book:Book,user_name:str):
         raise NotImplementedError
 
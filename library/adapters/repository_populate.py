@@ -1,6 +1,9 @@
 #from pathlib import Path
 
 import csv
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 from datetime import datetime
 from werkzeug.security import generate_password_hash
@@ -8,6 +11,7 @@ from werkzeug.security import generate_password_hash
 import ast
 from library.adapters.repository import AbstractRepository
 from library.adapters.jsondatareader import BooksJSONReader
+from library.adapters.snapshot import source_stamps
 from library.domain.model import Author, Book,Publisher,BooksInventory, ReadingList, User, Review, BooksInventory
 
 def read_json_file(books_file_name:str,authors_file_name:str):
@@ -32,23 +36,41 @@ def read_csv_file(filename: str):
 
 def load_books(data_path: str, repo: AbstractRepository):
     print("Loading Books")
-    temp = read_json_file(books_file_name=data_path+"\\data\\books.json",authors_file_name=data_path+"\\data\\authors.json")
-    for author in tqdm(temp[1]):
-        repo.add_author(author)
-    for books in tqdm(temp[0]):
+    json_reader = BooksJSONReader(books_file_name=data_path+"\\data\\books.json",authors_file_name=data_path+"\\data\\authors.json")
+    for books in tqdm(json_reader.iter_books()):
         repo.add_book(books)
     
 
 
-def load_users(data_path: str, repo: AbstractRepository):
+# Below this many users starting worker processes costs more than it saves
+PARALLEL_HASHING_THRESHOLD = 64
+
+def hash_passwords(passwords, workers: int = None, chunksize: int = None):
+    # Hashes the passwords across a process pool (one worker per core by default),
+    # returning the hashes in the same order as the passwords.
+    passwords = list(passwords)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(passwords))
+    # Worker processes started by spawn re-import the app, they must not start pools of their own.
+    if workers <= 1 or len(passwords) < PARALLEL_HASHING_THRESHOLD or multiprocessing.parent_process() is not None:
+        return [generate_password_hash(password) for password in passwords]
+    if chunksize is None:
+        chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(generate_password_hash, passwords, chunksize=chunksize))
+
+def load_users(data_path: str, repo: AbstractRepository, hash_workers: int = None, hash_chunksize: int = None):
     users = []
     print("Loading Users")
     users_filename = data_path + "\\data\\users.csv"
-    
-    for data_row in tqdm(read_csv_file(users_filename)):
+
+    data_rows = list(read_csv_file(users_filename))
+    passwords = hash_passwords([data_row[2] for data_row in data_rows], hash_workers, hash_chunksize)
+    for data_row, password in tqdm(zip(data_rows, passwords), total=len(data_rows)):
         user = User(
             user_name=data_row[1],
-            password=generate_password_hash(data_row[2]),
+            password=password,
             user_id=int(data_row[0])
         )
         
@@ -60,34 +82,72 @@ def load_users(data_path: str, repo: AbstractRepository):
         users.append(user)
     return users
 
-def load_reviews(data_path: str, repo: AbstractRepository, users):
-    print("Loading Reviews")
-    reviews_filename = data_path + "\\data\\reviews.csv"
-    for data_row in tqdm(read_csv_file(reviews_filename)):
-        for user in users:
-            if user.user_name == data_row[2]:
-                temp_user = user
-                break
-        
-        new_review = Review(
-            book=repo.get_book_by_id(int(data_row[1])),
+# Reviews are read, matched to their books and users, and added this many rows at a time
+REVIEW_BATCH_SIZE = 1000
+
+def batched(rows, batch_size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if len(batch) != 0:
+        yield batch
+
+def make_reviews(data_rows, books_by_id: dict, users_by_name: dict):
+    # User names in reviews.csv are not always lower case like User.user_name. Rows whose user is
+    # unknown are skipped; a review of a book that is not in the catalogue keeps book None.
+    reviews = []
+    for data_row in data_rows:
+        user = users_by_name.get(data_row[2].lower())
+        if user is None:
+            continue
+        reviews.append(Review(
+            book=books_by_id.get(int(data_row[1])),
             review_text=data_row[3],
             rating=int(data_row[4]),
             review_id=int(data_row[0]),
-            user=temp_user,
+            user=user,
             timestamp=datetime.fromisoformat(data_row[5])
-        )
+        ))
+    return reviews
 
-        repo.add_review(new_review)
+def load_reviews(data_path: str, repo: AbstractRepository, users):
+    print("Loading Reviews")
+    reviews_filename = data_path + "\\data\\reviews.csv"
+    users_by_name = {user.user_name: user for user in users}
+    for data_rows in batched(tqdm(read_csv_file(reviews_filename)), REVIEW_BATCH_SIZE):
+        book_ids = sorted({int(data_row[1]) for data_row in data_rows})
+        books_by_id = {book.book_id: book for book in repo.get_books_by_ids(book_ids)}
+        repo.add_reviews(make_reviews(data_rows, books_by_id, users_by_name))
+
+def source_files(data_path: str):
+    return [data_path + "\\data\\" + file_name for file_name in ["books.json", "authors.json", "users.csv", "reviews.csv"]]
+
+def populate(repo: AbstractRepository,data_path:str="library\\adapters", database_mode: bool=False,lite=False,
+             hash_workers: int = None, hash_chunksize: int = None, snapshot_path: str = None):
+
+    if database_mode:
+        # Bulk load straight into the tables, the repository builds its indexes from them on first use.
+        from library.adapters import database_populate
+        database_populate.populate(repo.engine, data_path, lite, hash_workers, hash_chunksize)
+        return
 
-def populate(repo: AbstractRepository,data_path:str="library\\adapters", database_mode: bool=False,lite=False):
-    
     # Load articles and tags into the repository.
     load_books(data_path, repo)
     if not lite:
         # Load users into the repository.
-        users = load_users(data_path, repo)
+        users = load_users(data_path, repo, hash_workers, hash_chunksize)
 
         # Load Reviews into the repository.
         load_reviews(data_path, repo, users)
     
+
+    if snapshot_path is not None and not lite:
+        # Memory repositories only, the next start up loads this snapshot instead of the source files.
+        repo.build_recommendations()
+        try:
+            repo.save_snapshot(snapshot_path, source_stamps(source_files(data_path)))
+        except OSError as error:
+            print("Could not write snapshot " + snapshot_path + ": " + str(error))
@@ -0,0 +1,302 @@
+import json
+import mmap
+import os
+import pickle
+import struct
+from array import array
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from library.domain.model import Author, Book, Publisher, Review, User
+
+# Snapshot layout: a header, a table of named sections, then the sections themselves, each
+# starting on an 8 byte boundary. Numeric sections are little endian int64 arrays that are
+# read straight out of the memory mapped file; strings live in one UTF-8 blob addressed by
+# an array of end offsets. Any change to the layout must bump VERSION so old files are ignored.
+MAGIC = b'LIBSNAP\x00'
+VERSION = 3
+HEADER = struct.Struct('<8sII')         # magic, version, number of sections
+SECTION = struct.Struct('<32sQQ')       # name, offset, length
+ALIGNMENT = 8
+
+BOOK_COLUMNS = 8        # book id, title, description, publisher, publisher_name, release year, ebook, pages
+AUTHOR_COLUMNS = 2      # author id, name
+USER_COLUMNS = 3        # user id, user name, password
+REVIEW_COLUMNS = 5      # book id, user row, review text, rating, timestamp (microseconds since EPOCH)
+
+NONE = -1
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+RepositoryState = namedtuple('RepositoryState', ['books', 'authors', 'publishers', 'users', 'reviews', 'indexes'])
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def source_stamps(paths: List[str]) -> Dict[str, List[int]]:
+    # Size and modification time of every source file, a snapshot is only used while these match.
+    stamps = dict()
+    for path in paths:
+        stat = os.stat(path)
+        stamps[path] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+def write_sections(path: str, sections: Dict[str, bytes]):
+    # Writes to a temporary file first so a reader never sees a half written snapshot.
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = []
+    for name, data in sections.items():
+        offset += -offset % ALIGNMENT
+        table.append((name, offset, len(data)))
+        offset += len(data)
+
+    for name in sections:
+        if len(name.encode('ascii')) > SECTION.size - 16:
+            raise SnapshotError("Section name too long: " + name)
+
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+        for name, offset, length in table:
+            snapshot_file.write(SECTION.pack(name.encode('ascii'), offset, length))
+        for (name, offset, length), data in zip(table, sections.values()):
+            snapshot_file.write(b'\x00' * (offset - snapshot_file.tell()))
+            snapshot_file.write(data)
+    os.replace(temporary_path, path)
+
+
+class SnapshotReader:
+    # Memory maps a snapshot and hands out its sections as zero-copy views.
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as snapshot_file:
+            self.__map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__view = memoryview(self.__map)
+        self.__sections = dict()
+        try:
+            magic, version, section_count = HEADER.unpack_from(self.__map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise SnapshotError("Not a version {} snapshot".format(VERSION))
+            for index in range(section_count):
+                name, offset, length = SECTION.unpack_from(self.__map, HEADER.size + index * SECTION.size)
+                if offset + length > len(self.__map):
+                    raise SnapshotError("Truncated snapshot")
+                self.__sections[name.rstrip(b'\x00').decode('ascii')] = (offset, length)
+        except (struct.error, UnicodeDecodeError) as error:
+            self.close()
+            raise SnapshotError("Corrupt snapshot") from error
+        except SnapshotError:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        try:
+            self.__view.release()
+            self.__map.close()
+        except BufferError:
+            # Section views are still referenced (e.g. by a traceback), the map closes once they are freed.
+            pass
+
+    def section(self, name: str) -> memoryview:
+        try:
+            offset, length = self.__sections[name]
+        except KeyError:
+            raise SnapshotError("Missing section " + name)
+        return self.__view[offset:offset + length]
+
+    def integers(self, name: str) -> memoryview:
+        return self.section(name).cast('q')
+
+
+class StringTable:
+    # Collects the snapshot's strings once each, None is stored as NONE.
+
+    def __init__(self):
+        self.__indexes = dict()
+        self.__blob = bytearray()
+        self.__ends = array('q')
+
+    def add(self, text: Optional[str]) -> int:
+        if text is None:
+            return NONE
+        index = self.__indexes.get(text)
+        if index is None:
+            index = self.__indexes[text] = len(self.__ends)
+            self.__blob += text.encode('utf-8')
+            self.__ends.append(len(self.__blob))
+        return index
+
+    @property
+    def blob(self) -> bytes:
+        return bytes(self.__blob)
+
+    @property
+    def ends(self) -> bytes:
+        return self.__ends.tobytes()
+
+
+class StringReader:
+
+    def __init__(self, blob: memoryview, ends: memoryview):
+        self.__blob = blob
+        self.__ends = ends
+        self.__decoded = dict()
+
+    def get(self, index: int) -> Optional[str]:
+        if index == NONE:
+            return None
+        text = self.__decoded.get(index)
+        if text is None:
+            start = self.__ends[index - 1] if index > 0 else 0
+            text = self.__decoded[index] = str(self.__blob[start:self.__ends[index]], 'utf-8')
+        return text
+
+
+def pack_rows(rows: List[tuple]) -> bytes:
+    return array('q', [value for row in rows for value in row]).tobytes()
+
+
+def pack_lists(lists: List[list]) -> Dict[str, bytes]:
+    # Variable length lists as a CSR pair: items i sit between offsets[i] and offsets[i + 1].
+    offsets = array('q', [0])
+    items = array('q')
+    for values in lists:
+        items.extend(values)
+        offsets.append(len(items))
+    return {'offsets': offsets.tobytes(), 'items': items.tobytes()}
+
+
+def save_repository(path: str, sources: Dict[str, List[int]], books: List[Book], authors: List[Author],
+                    publishers: List[Publisher], users: List[User], reviews: List[Review], indexes: dict):
+    strings = StringTable()
+
+    known_authors = {author.unique_id: author for author in authors}
+    for book in books:
+        for author in book.authors:
+            known_authors.setdefault(author.unique_id, author)
+    author_list = list(known_authors.values())
+
+    book_rows = []
+    for book in books:
+        ebook = NONE if book.ebook is None else int(book.ebook)
+        book_rows.append((book.book_id, strings.add(book.title), strings.add(book.description),
+                          strings.add(None if book.publisher is None else book.publisher.name),
+                          strings.add(getattr(book, 'publisher_name', None)),
+                          NONE if book.release_year is None else book.release_year, ebook,
+                          NONE if book.num_pages is None else book.num_pages))
+
+    user_rows = {user.user_name: row for row, user in enumerate(users)}
+
+    review_rows = []
+    for review in reviews:
+        user = review.user_associated
+        review_rows.append((NONE if review.book is None else review.book.book_id, NONE if user is None else user_rows.get(user.user_name, NONE),
+                            strings.add(review.review_text), review.rating,
+                            (review.timestamp - EPOCH) // MICROSECOND))
+
+    sections = {
+        'sources': json.dumps(sources).encode('utf-8'),
+        'books': pack_rows(book_rows),
+        'authors': pack_rows([(author.unique_id, strings.add(author.full_name)) for author in author_list]),
+        'author_count': array('q', [len(authors)]).tobytes(),
+        'publishers': array('q', [strings.add(publisher.name) for publisher in publishers]).tobytes(),
+        'users': pack_rows([(user.user_id, strings.add(user.user_name), strings.add(user.password)) for user in users]),
+        'reviews': pack_rows(review_rows),
+    }
+    for name, lists in [('book_authors', [[author.unique_id for author in book.authors] for book in books]),
+                        ('coauthors', [author.coauthors for author in author_list]),
+                        ('reading_lists', [[book.book_id for book in user.reading_list] for user in users]),
+                        ('read_books', [[book.book_id for book in user.read_books] for user in users])]:
+        for part, data in pack_lists(lists).items():
+            sections[name + '_' + part] = data
+    sections['indexes'] = pickle.dumps(indexes, protocol=pickle.HIGHEST_PROTOCOL)
+    sections['strings'] = strings.blob
+    sections['string_ends'] = strings.ends
+    write_sections(path, sections)
+
+
+def load_repository(path: str, sources: Dict[str, List[int]]) -> Optional[RepositoryState]:
+    # Returns None when there is no usable snapshot for these source files.
+    try:
+        with SnapshotReader(path) as reader:
+            if json.loads(str(reader.section('sources'), 'utf-8')) != sources:
+                return None
+            return read_repository(reader)
+    except (OSError, ValueError, SnapshotError, pickle.UnpicklingError, ImportError, AttributeError, EOFError):
+        return None
+
+
+def read_repository(reader: SnapshotReader) -> RepositoryState:
+    strings = StringReader(reader.section('strings'), reader.integers('string_ends'))
+
+    def lists(name):
+        offsets = reader.integers(name + '_offsets')
+        items = reader.integers(name + '_items')
+        return [items[offsets[i]:offsets[i + 1]].tolist() for i in range(len(offsets) - 1)]
+
+    authors = dict()
+    rows = reader.integers('authors')
+    for row, coauthors in zip(range(0, len(rows), AUTHOR_COLUMNS), lists('coauthors')):
+        author = Author(rows[row], strings.get(rows[row + 1]))
+        author.coauthors = coauthors
+        authors[author.unique_id] = author
+    repository_authors = list(authors.values())[:reader.integers('author_count')[0]]
+
+    repository_publishers = [Publisher(name) for name in map(strings.get, reader.integers('publishers').tolist())]
+    publishers = {publisher.name: publisher for publisher in repository_publishers}
+
+    books = dict()
+    rows = reader.integers('books')
+    for row, author_ids in zip(range(0, len(rows), BOOK_COLUMNS), lists('book_authors')):
+        book_id, title, description, publisher, publisher_name, release_year, ebook, num_pages = rows[row:row + BOOK_COLUMNS]
+        book = Book(book_id, strings.get(title))
+        book.description = strings.get(description)
+        publisher = strings.get(publisher)
+        if publisher is not None:
+            book.publisher = publishers.setdefault(publisher, Publisher(publisher))
+        if publisher_name != NONE:
+            book.publisher_name = strings.get(publisher_name)
+        if release_year != NONE:
+            book.release_year = release_year
+        if ebook != NONE:
+            book.ebook = bool(ebook)
+        if num_pages != NONE:
+            book.num_pages = num_pages
+        book.authors.extend(authors[author_id] for author_id in author_ids)
+        books[book_id] = book
+
+    users = []
+    rows = reader.integers('users')
+    for row, reading_list, read_books in zip(range(0, len(rows), USER_COLUMNS), lists('reading_lists'), lists('read_books')):
+        user = User(strings.get(rows[row + 1]), strings.get(rows[row + 2]), rows[row])
+        for book_id in reading_list:
+            user.add_book_to_reading_list(books[book_id])
+        for book_id in read_books:
+            user.read_a_book(books[book_id])
+        users.append(user)
+
+    reviews = []
+    rows = reader.integers('reviews')
+    for row in range(0, len(rows), REVIEW_COLUMNS):
+        book_id, user_row, review_text, rating, timestamp = rows[row:row + REVIEW_COLUMNS]
+        book = None if book_id == NONE else books[book_id]
+        user = None if user_row == NONE else users[user_row]
+        review = Review(book, strings.get(review_text), rating, user=user, timestamp=EPOCH + timestamp * MICROSECOND)
+        if book is not None:
+            book.reviews.append(review)
+        if user is not None:
+            user.reviews.append(review)
+        reviews.append(review)
+
+    indexes = pickle.loads(reader.section('indexes'))
+    return RepositoryState(list(books.values()), repository_authors, repository_publishers, users, reviews, indexes)
@@ -0,0 +1,94 @@
+from bisect import bisect_left, insort
+from typing import Iterable, List
+
+# Columns the book table can be sorted by
+SORT_KEYS = ('id', 'title', 'author', 'publisher', 'release_year')
+
+
+def collation_key(value):
+    # Strings compare casefolded, missing values sort after every present one.
+    if value is None or value == '':
+        return (1, '')
+    if isinstance(value, str):
+        return (0, value.casefold())
+    return (0, value)
+
+
+def sort_row(book) -> tuple:
+    # The values a book is sorted by, in SORT_KEYS order; its first author stands for all of them.
+    return (book.book_id, book.title, book.authors[0].full_name if len(book.authors) > 0 else None,
+            book.publisher.name if book.publisher is not None else None, book.release_year)
+
+
+class SortOrders:
+    # A permutation of the book ids for each sort key, kept sorted by (collation key, book id) so every
+    # order is total and ties fall back to id order. Pages of a sorted catalogue are slices of these
+    # lists, and a book's place in an order is found by bisection on its own entry.
+
+    def __init__(self):
+        self.__orders = {key: [] for key in SORT_KEYS}
+        self.__entries = dict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, book_id: int):
+        return book_id in self.__entries
+
+    def add(self, book_id: int, *values):
+        if book_id in self.__entries:
+            self.remove(book_id)
+        entries = self.__entries[book_id] = self.__entries_of(book_id, values)
+        for key, entry in zip(SORT_KEYS, entries):
+            insort(self.__orders[key], entry)
+
+    def add_all(self, rows: Iterable):
+        # Rows of (book id, title, first author, publisher, release year). Sorted once at the end
+        # rather than inserted one at a time.
+        for book_id, *values in rows:
+            if book_id in self.__entries:
+                self.remove(book_id)
+            self.__entries[book_id] = self.__entries_of(book_id, values)
+        for position, key in enumerate(SORT_KEYS):
+            self.__orders[key] = sorted(entries[position] for entries in self.__entries.values())
+
+    def remove(self, book_id: int):
+        entries = self.__entries.pop(book_id, None)
+        if entries is None:
+            return
+        for key, entry in zip(SORT_KEYS, entries):
+            order = self.__orders[key]
+            del order[bisect_left(order, entry)]
+
+    def ids(self, key: str, start: int, stop: int, descending: bool = False) -> List[int]:
+        # Book ids at positions start to stop of the order.
+        order = self.__orders[key]
+        if descending:
+            start, stop = len(order) - min(stop, len(order)), len(order) - max(start, 0)
+            return [entry[-1] for entry in reversed(order[start:stop])]
+        return [entry[-1] for entry in order[max(start, 0):stop]]
+
+    def position(self, key: str, book_id: int, descending: bool = False) -> int:
+        # Where book_id stands in the order, or None for a book not in it.
+        entries = self.__entries.get(book_id)
+        if entries is None:
+            return None
+        position = bisect_left(self.__orders[key], entries[SORT_KEYS.index(key)])
+        return len(self.__entries) - 1 - position if descending else position
+
+    def sorted(self, key: str, book_ids: Iterable[int], descending: bool = False) -> List[int]:
+        # book_ids in the order, books not in it last. Costs a bisection per id, not a sort of the catalogue.
+        order = self.__orders[key]
+        ranks = dict()
+        missing = []
+        for book_id in dict.fromkeys(book_ids):
+            entries = self.__entries.get(book_id)
+            if entries is None:
+                missing.append(book_id)
+            else:
+                ranks[book_id] = bisect_left(order, entries[SORT_KEYS.index(key)])
+        return sorted(ranks, key=ranks.get, reverse=descending) + missing
+
+    @staticmethod
+    def __entries_of(book_id: int, values) -> tuple:
+        return ((book_id,),) + tuple((collation_key(value), book_id) for value in values)
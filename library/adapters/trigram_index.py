@@ -0,0 +1,82 @@
+from typing import Iterable, List, Set
+
+TRIGRAM_LENGTH = 3
+
+
+def normalise(text: str) -> str:
+    return text.casefold()
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+class TrigramIndex:
+    # Substring index over book titles. Every title is split into its trigrams and each
+    # trigram keeps a posting set of the book ids containing it, so a query only has to
+    # verify the books found in the intersection of its own trigrams' postings.
+
+    def __init__(self):
+        self.__postings = dict()
+        self.__titles = dict()
+
+    def __len__(self):
+        return len(self.__titles)
+
+    def __contains__(self, book_id: int):
+        return book_id in self.__titles
+
+    def add(self, book_id: int, title: str):
+        if book_id in self.__titles:
+            self.remove(book_id)
+        title = normalise(title)
+        self.__titles[book_id] = title
+        for gram in trigrams(title):
+            self.__postings.setdefault(gram, set()).add(book_id)
+
+    def add_all(self, entries: Iterable):
+        for book_id, title in entries:
+            self.add(book_id, title)
+
+    def remove(self, book_id: int):
+        title = self.__titles.pop(book_id, None)
+        if title is None:
+            return
+        for gram in trigrams(title):
+            posting = self.__postings.get(gram)
+            if posting is not None:
+                posting.discard(book_id)
+                if len(posting) == 0:
+                    del self.__postings[gram]
+
+    def estimate(self, query: str) -> int:
+        # The most titles search can return for query, the length of its rarest trigram's posting.
+        if not isinstance(query, str) or query == "":
+            return 0
+        query_grams = trigrams(normalise(query))
+        if len(query_grams) == 0:
+            return len(self.__titles)
+        return min(len(self.__postings.get(gram, ())) for gram in query_grams)
+
+    def matches(self, book_id: int, query: str) -> bool:
+        return isinstance(query, str) and query != "" and normalise(query) in self.__titles.get(book_id, "")
+
+    def search(self, query: str) -> List[int]:
+        # Returns the ids of every indexed title containing query, in ascending id order.
+        if not isinstance(query, str) or query == "":
+            return []
+        query = normalise(query)
+        query_grams = trigrams(query)
+        if len(query_grams) == 0:
+            # Too short to have a trigram, the stored titles are already normalised.
+            candidates = self.__titles.keys()
+        else:
+            postings = []
+            for gram in query_grams:
+                posting = self.__postings.get(gram)
+                if posting is None:
+                    return []
+                postings.append(posting)
+            postings.sort(key=len)
+            candidates = postings[0].intersection(*postings[1:])
+        return sorted(book_id for book_id in candidates if query in self.__titles[book_id])
@@ -23,15 +23,25 @@ def list_books():
         page = int(request.args.get('page'))
     else:
         page = 1
+    # after and before are the book ids the Next and Previous links carry, so the page is found by its first
+    # or last book rather than by counting the books before it.
+    after = int(request.args.get('after')) if request.args.get('after') and request.args.get('after').isnumeric() else None
+    before = int(request.args.get('before')) if request.args.get('before') and request.args.get('before').isnumeric() else None
+    sort_args = utilities.get_sort_args('id')
+    book_page = repo.repo_instance.get_books_page(page, after=after, before=before, **sort_args)
 
     return render_template("books/list_books.html",
-    books=repo.repo_instance.get_all_books(),
+    books=book_page.books,
+    book_page=book_page,
     list_url = utilities.get_list_url(),
     search_url = utilities.get_search_url(),
     register_url = utilities.get_register_url(),
     logout_url= utilities.get_logout_url(),
     login_url = utilities.get_login_url(),
-    page = page
+    page = book_page.page,
+    sort = sort_args['sort'],
+    order = 'desc' if sort_args['descending'] else None,
+    sort_urls = utilities.get_sort_urls()
     )
 
 @book_blueprint.route('/book',methods=['GET','POST'])
@@ -41,11 +51,11 @@ def show_book():
     else:
         book_id = None
     try:
-        if repo.repo_instance.get_book(book_id) != None:
+        book = repo.repo_instance.get_book(book_id)
+        if book != None:
             if session.get('logged_in'):
                 return redirect(url_for('book_bp.review_book',book_id=book_id))
             else:
-                book = repo.repo_instance.get_book(book_id)
                 if book:
                     return render_template('search/simple_book.html',
                         book = book,
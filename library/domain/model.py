@@ -1,8 +1,14 @@
+from array import array
 from bisect import insort_left
+from collections.abc import Mapping
 import datetime
-from random import choice, choices
+from random import choices, sample
 import re
 class Author:
+    # No __dict__: when mapped, SQLAlchemy keeps the ORM state in a side table (see
+    # orm.SideTableInstrumentation). __weakref__ stays for the session's identity map.
+    __slots__ = ('__author_full_name', '__unique_id', 'coauthors', '__books', '__weakref__')
+
     def __init__(self,author_id,author_full_name) -> None:
         self.__author_full_name = None
         self.__unique_id = None
@@ -57,6 +63,7 @@ class Author:
             return author.unique_id in self.coauthors
 
 class Publisher:
+    __slots__ = ('__name', '__publisher_id', '__books', '__weakref__')
 
     def __init__(self, publisher_name: str):
         self.__name = "N.A."
@@ -90,6 +97,9 @@ class Publisher:
         return self.__publisher_id
 
 class Book:
+    __slots__ = ('__book_id', '__title', '__description', '__publisher', 'publisher_name', '__authors', '__release_year',
+                 '__ebook', '__num_pages', '__reviews', '__users', '__weakref__')
+
     def __init__(self,book_id:int,book_title:str) -> None:
         self.__book_id = None
         self.__title = None
@@ -100,8 +110,7 @@ class Book:
         self.__release_year = None
         self.__ebook = None
         self.__num_pages = None
-        self.__reviews = []
-        self.__users = []
+        # The reviews and users lists are only allocated once something is added to them.
 
         if isinstance(book_id,int) and book_id >=0:
             self.__book_id = book_id
@@ -120,15 +129,22 @@ class Book:
     #         self.__publisher_name = new_name
 
     def add_user(self,user):
-        self.__users.append(user)
+        try:
+            self.__users.append(user)
+        except AttributeError:
+            self.__users = [user]
     @property
     def reviews(self):
-        return self.__reviews
+        try:
+            return self.__reviews
+        except AttributeError:
+            self.__reviews = []
+            return self.__reviews
         
     def add_review(self,review):
         if isinstance(review,Review):
-            if review not in self.__reviews:
-                self.__reviews.append(review)
+            if review not in self.reviews:
+                self.reviews.append(review)
 
     @property
     def title(self):
@@ -224,20 +240,50 @@ class Book:
             if author in self.__authors:
                 self.__authors.remove(author)
 
+class InventoryView(Mapping):
+    # A read-only view of the stock, by book id, over the inventory's rows. Looking up a book builds
+    # just its entry, so nothing is copied up front.
+    def __init__(self, rows, books, prices, stock_counts) -> None:
+        self.__rows = rows
+        self.__books = books
+        self.__prices = prices
+        self.__stock_counts = stock_counts
+
+    def __getitem__(self, book_id):
+        row = self.__rows[book_id]
+        return {"book": self.__books[row], "price": self.__prices[row], "nr_books_in_stock": self.__stock_counts[row]}
+
+    def __iter__(self):
+        return iter(self.__rows)
+
+    def __len__(self):
+        return len(self.__rows)
+
 class BooksInventory:
     def __init__(self) -> None:
-        self.__books_inventory = {}
+        # Each stocked book owns one row of the parallel book, price and stock arrays,
+        # found through its book id.
+        self.__rows = {}
+        self.__books = []
+        self.__prices = array('d')
+        self.__stock_counts = array('q')
         self.__book_title_dict = {}
         self.__all_books = []
+        self.__view = InventoryView(self.__rows, self.__books, self.__prices, self.__stock_counts)
     
     def add_book(self,book, price = 0, nr_books_in_stock = 0):
         if isinstance(book,Book) and type(price) in [int,float] and isinstance(nr_books_in_stock,int) and price >=0 or nr_books_in_stock >=0:
-            storage_dict = {}
-            storage_dict["book"] = book
             self.__book_title_dict[book.title] = book
-            storage_dict["price"] = price
-            storage_dict["nr_books_in_stock"] = nr_books_in_stock
-            self.__books_inventory[book.book_id] = storage_dict
+            row = self.__rows.get(book.book_id)
+            if row is None:
+                self.__rows[book.book_id] = len(self.__books)
+                self.__books.append(book)
+                self.__prices.append(price)
+                self.__stock_counts.append(nr_books_in_stock)
+            else:
+                self.__books[row] = book
+                self.__prices[row] = price
+                self.__stock_counts[row] = nr_books_in_stock
             insort_left(self.__all_books,book)
         else:
             raise ValueError   
@@ -248,30 +294,30 @@ class BooksInventory:
 
     @property
     def books_inventory(self):
-        return self.__books_inventory
+        return self.__view
 
     def __len__(self):
         return len(self.__all_books)
 
     def remove_book(self,book_id):
         if isinstance(book_id,int):
-            if book_id in self.__books_inventory:
-                self.__books_inventory.pop(book_id)
+            if book_id in self.__rows:
+                self.__books[self.__rows.pop(book_id)] = None
 
     def find_book(self,book_id): #BookID
         if isinstance(book_id,int):
-           if book_id in self.__books_inventory:
-               return self.__books_inventory[book_id]["book"]
+           if book_id in self.__rows:
+               return self.__books[self.__rows[book_id]]
 
     def find_price(self,book_id):
         if isinstance(book_id,int):
-           if book_id in self.__books_inventory:
-               return self.__books_inventory[book_id]["price"]
+           if book_id in self.__rows:
+               return self.__prices[self.__rows[book_id]]
     
     def find_stock_count(self,book_id):
         if isinstance(book_id,int):
-            if book_id in self.__books_inventory:
-                return self.__books_inventory[book_id]["nr_books_in_stock"]
+            if book_id in self.__rows:
+                return self.__stock_counts[self.__rows[book_id]]
     
     def search_book_by_title(self,title):
         if isinstance(title,str):
@@ -279,13 +325,10 @@ class BooksInventory:
                 return self.__book_title_dict[title]
     
     def get_random_books(self,n):
-        return_list = []
         if isinstance(n,int):
-            while len(return_list)!=n:
-                temp = choice(self.__all_books)
-                if len(return_list) == 0 or temp not in return_list:
-                    return_list.append(temp)
-            return return_list
+            # Distinct books, drawn from the stocked rows so a book added twice is no more likely to come up.
+            rows = sample(list(self.__rows.values()), min(n, len(self.__rows)))
+            return [self.__books[row] for row in rows]
         else:
             raise ValueError
             
@@ -319,6 +362,8 @@ class ReadingList:
             return self.reading_list[0]
 
 class Review:
+    __slots__ = ('__book', '__review_text', '__rating', '__id', '__user_associated', '__timestamp', '__weakref__')
+
     def __init__(self,book,review_text,rating,review_id = 0,user=None,timestamp = None) -> None:
         self.__book = None
         self.__review_text = 'N/A'
@@ -382,6 +427,9 @@ class Review:
             return False
 
 class User:
+    __slots__ = ('__user_name', '__password', '__read_books', '__reviews', '__pages_read', '__reading_list', '__user_id',
+                 '__weakref__')
+
     def __init__(self,user_name:str,password:str,user_id:int=0) -> None:
         self.__user_name = None
         self.__password = None
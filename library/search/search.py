@@ -2,9 +2,10 @@ from os import error
 from wtforms.fields.simple import HiddenField
 
 from wtforms.form import Form
-from wtforms.widgets.core import HiddenInput
+from wtforms.widgets.core import HiddenInput, TextInput
+from markupsafe import Markup, escape
 from library.authentication.authentication import register
-from flask import Flask,Blueprint, render_template, url_for, request,redirect,session
+from flask import Flask,Blueprint, render_template, url_for, request,redirect,session,jsonify
 from flask_wtf import FlaskForm
 from wtforms import IntegerField,SubmitField,SelectField,StringField,validators
 from wtforms.validators import DataRequired
@@ -17,6 +18,14 @@ search_blueprint = Blueprint(
     'search_bp',__name__,url_prefix='/search'
 )
 
+FULL_TEXT_RESULTS = 100
+
+# The handler a suggested correction of each SUGGESTION_FIELDS search links to, and its argument
+SUGGESTION_HANDLERS = {
+    'author': ('search_bp.author_name_handler', 'author_name'),
+    'title': ('search_bp.title_handler', 'title'),
+}
+
 @search_blueprint.route('/')
 def search_interface():
     if session.get('logged_in'):
@@ -139,10 +148,28 @@ def search_book(arg):
                     return redirect(url_for('search_bp.publisher_handler',publisher_name = precision_form.publisher_name.data))
                 if search_option =="BookID":
                     return redirect(url_for('search_bp.book_id_handler',book_id = precision_form.book_id.data))
+                if search_option =="All Fields":
+                    criteria = {'author_name': precision_form.author_name.data, 'author_id': precision_form.author_id.data,
+                        'release_year_from': precision_form.release_year.data, 'release_year_to': precision_form.release_year.data,
+                        'title': precision_form.title.data, 'publisher_name': precision_form.publisher_name.data}
+                    return redirect(url_for('search_bp.criteria_handler',
+                        **{name: value for name, value in criteria.items() if value not in (None, '', 'None')}))
+            else:
+                data = "Invalid Input/s, \n Please Try Again"
+        elif arg == 6:  #Description and review text
+            if basic_form.validate_on_submit():
+                try:
+                    if basic_form.name.data == "":
+                        raise TypeError
+                    query = str(basic_form.name.data)
+                except TypeError:
+                    data = "Invalid Input/s, \n Please Try Again"
+                else:
+                    return redirect(url_for('search_bp.full_text_handler',query=query))
             else:
                 data = "Invalid Input/s, \n Please Try Again"
                 
-    if arg in range(0,5):
+    if arg in range(0,5) or arg == 6:
         if session.get('logged_in'):
             return render_template('books/basic_search_form.html',
                 form=basic_form,
@@ -205,7 +232,7 @@ def author_id_handler():
         page = int(request.args.get('page'))
     else:
         page = 1
-    return search_handler_renderer(repo.repo_instance.get_books_by_author_id(author_id),page)
+    return search_handler_renderer(repo.repo_instance.search_books_page('author_id',author_id,page=page,**utilities.get_sort_args()))
     
 @search_blueprint.route('/0/1/query')
 def author_name_handler():
@@ -217,7 +244,8 @@ def author_name_handler():
         page = int(request.args.get('page'))
     else:
         page = 1
-    return search_handler_renderer(repo.repo_instance.get_books_by_author_name(author_name),page)
+    return search_handler_renderer(repo.repo_instance.search_books_page('author_name',author_name,page=page,**utilities.get_sort_args()),
+        suggestions_for=('author',author_name))
     
 @search_blueprint.route('/0/2/query')
 def author_name_id_handler():
@@ -233,11 +261,14 @@ def author_name_id_handler():
         page = int(request.args.get('page'))
     else:
         page = 1
-    books = set(repo.repo_instance.get_books_by_author_name(author_name))
-    for book in repo.repo_instance.get_books_by_author_id(author_id):
-        books.add(book)
-    books = sorted(list(books))
-    return search_handler_renderer(books,page)
+    # Books by either author, merged as ids so only the books on the page are loaded.
+    book_ids = sorted(set(repo.repo_instance.search_book_ids('author_name',author_name)).union(
+        repo.repo_instance.search_book_ids('author_id',author_id)))
+    sort_args = utilities.get_sort_args()
+    if sort_args['sort'] is not None:
+        book_ids = repo.repo_instance.sort_orders.sorted(sort_args['sort'],book_ids,sort_args['descending'])
+    return search_handler_renderer(repo.page_of_ids(book_ids,page,repo.PAGE_SIZE,
+        lambda page_ids: repo.books_in_order(repo.repo_instance,page_ids)))
 
 @search_blueprint.route('/1/query')
 def release_year_handler():
@@ -249,7 +280,7 @@ def release_year_handler():
         page = int(request.args.get('page'))
     else:
         page = 1
-    return search_handler_renderer(repo.repo_instance.get_books_by_release_year(release_year),page)
+    return search_handler_renderer(repo.repo_instance.search_books_page('release_year',release_year,page=page,**utilities.get_sort_args()))
     
 @search_blueprint.route('/2/query')
 def title_handler():
@@ -261,7 +292,8 @@ def title_handler():
         page = int(request.args.get('page'))
     else:
         page = 1
-    return search_handler_renderer(repo.repo_instance.get_book_by_title_general(title),page)
+    return search_handler_renderer(repo.repo_instance.search_books_page('title',title,page=page,**utilities.get_sort_args()),
+        suggestions_for=('title',title))
     
 @search_blueprint.route('/3/query')
 def publisher_handler():
@@ -273,8 +305,51 @@ def publisher_handler():
         page = int(request.args.get('page'))
     else:
         page = 1
-    return search_handler_renderer(repo.repo_instance.get_books_by_publisher_name(publisher_name),page=page)
+    return search_handler_renderer(repo.repo_instance.search_books_page('publisher',publisher_name,page=page,**utilities.get_sort_args()))
     
+@search_blueprint.route('/6/query')
+def full_text_handler():
+    if request.args.get('query'):
+        query = request.args.get('query')
+    else:
+        query = None
+    if request.args.get('page') and request.args.get('page').isnumeric():
+        page = int(request.args.get('page'))
+    else:
+        page = 1
+    return search_handler_renderer(repo.repo_instance.search_books_page('text',query,FULL_TEXT_RESULTS,page=page,**utilities.get_sort_args()))
+
+@search_blueprint.route('/query')
+def criteria_handler():
+    # Any combination of criteria, every one given has to match.
+    query = repo.BookQuery(
+        author_name = request.args.get('author_name') or None,
+        author_id = int(request.args.get('author_id')) if request.args.get('author_id') and request.args.get('author_id').isnumeric() else None,
+        release_year_from = int(request.args.get('release_year_from')) if request.args.get('release_year_from') and request.args.get('release_year_from').isnumeric() else None,
+        release_year_to = int(request.args.get('release_year_to')) if request.args.get('release_year_to') and request.args.get('release_year_to').isnumeric() else None,
+        publisher_name = request.args.get('publisher_name') or None,
+        title = request.args.get('title') or None,
+        ebook = {'true': True, 'false': False}.get(request.args.get('ebook'))
+    )
+    if request.args.get('page') and request.args.get('page').isnumeric():
+        page = int(request.args.get('page'))
+    else:
+        page = 1
+    return search_handler_renderer(repo.repo_instance.search_books_page('criteria',query,page=page,**utilities.get_sort_args()))
+
+@search_blueprint.route('/complete')
+def complete_handler():
+    # The most popular values of a field starting with prefix, as JSON for the search forms to offer.
+    field = request.args.get('field')
+    if field not in repo.COMPLETION_FIELDS:
+        return jsonify(error="Unknown field, expected one of " + ", ".join(repo.COMPLETION_FIELDS)), 400
+    prefix = request.args.get('prefix', '')
+    if request.args.get('limit') and request.args.get('limit').isnumeric():
+        limit = min(int(request.args.get('limit')), repo.COMPLETIONS)
+    else:
+        limit = repo.COMPLETIONS
+    return jsonify(field=field, prefix=prefix, completions=repo.repo_instance.get_completions(field, prefix, limit))
+
 @search_blueprint.route('/4/query')
 def book_id_handler():
     if request.args.get('book_id') and request.args.get('book_id').isnumeric():
@@ -285,15 +360,25 @@ def book_id_handler():
         book_id= book_id      
     ))
 
-def search_handler_renderer(books,page):
-    if len(books)==1:
+def search_handler_renderer(book_page, suggestions_for=None):
+    # book_page holds only the books on the page asked for, total counts every book found. suggestions_for,
+    # a (field, text) pair of a search by one of SUGGESTION_FIELDS, has the 404 offer corrections of text.
+    page = book_page.page
+    if book_page.total==1:
         return redirect(url_for('book_bp.show_book',
-            book_id= books[0].book_id            
+            book_id= book_page.books[0].book_id            
         ))
-    elif len(books)==0:
+    elif book_page.total==0:
+        suggestions = []
+        if suggestions_for is not None:
+            field, text = suggestions_for
+            endpoint, argument = SUGGESTION_HANDLERS[field]
+            suggestions = [(suggestion, url_for(endpoint, **{argument: suggestion}))
+                           for suggestion in repo.repo_instance.get_suggestions(field, text)]
         return render_template('error.html',
         error_code = 404,
-        error_message = "Book Not Found"
+        error_message = "Book Not Found",
+        suggestions = suggestions
         ),404
     else:
         NextPage = NextPageForm(request.args)
@@ -309,35 +394,63 @@ def search_handler_renderer(books,page):
             register_url = utilities.get_register_url(),
             logout_url= utilities.get_logout_url(),
             login_url = utilities.get_login_url(),
-            books=books,
+            books=book_page.books,
+            book_page=book_page,
             NextPage=NextPageData,
             PreviousPage=PreviousPageData,
+            sort_urls = utilities.get_sort_urls(),
             page = page
             )
 
+class CompletionInput(TextInput):
+    # A text input with an empty datalist that scripts/autocomplete.js fills from complete_handler as the user types.
+    def __init__(self, completion_field: str):
+        super().__init__()
+        self.completion_field = completion_field
+
+    def __call__(self, field, **kwargs):
+        kwargs.setdefault('list', field.id + '-completions')
+        kwargs.setdefault('autocomplete', 'off')
+        kwargs.setdefault('data-completion-url', url_for('search_bp.complete_handler', field=self.completion_field))
+        return Markup(super().__call__(field, **kwargs) + '<datalist id="%s"></datalist>' % escape(kwargs['list']))
+
+class CompletedField(StringField):
+    # Takes one of the values the repository knows for completion_field, as a select of them all would,
+    # without rendering them: they are checked when posted and offered a prefix at a time. A value typed in
+    # another case is taken as the known value it names.
+    def __init__(self, label=None, validators=None, completion_field=None, **kwargs):
+        super().__init__(label, validators, widget=CompletionInput(completion_field), **kwargs)
+        self.completion_field = completion_field
+
+    def process_formdata(self, valuelist):
+        # Left as None when not posted, like a select
+        if valuelist:
+            self.data = valuelist[0]
+
+    def pre_validate(self, form):
+        if self.data is not None:
+            known = repo.repo_instance.known_value(self.completion_field, self.data)
+            if known is None:
+                raise ValueError(self.gettext('Not a valid choice'))
+            self.data = known
+
 class GeneralSearchForm(FlaskForm):
-    author_name_options = repo.repo_instance.get_author_names()
-    author_id_options = repo.repo_instance.get_author_ids()
-    publisher_options = repo.repo_instance.get_all_publisher_names()
     id = IntegerField("ID",[validators.optional()])
     name = StringField("Names",[validators.optional()])
-    author_name = SelectField("Author Name:",[validators.optional()],choices=author_name_options)
-    author_id = SelectField("Author ID:",[validators.optional()],choices=author_id_options)
-    publisher_name = SelectField("Publisher Name:",[validators.optional()],choices=publisher_options)
+    author_name = CompletedField("Author Name:",[validators.optional()],completion_field='author')
+    author_id = CompletedField("Author ID:",[validators.optional()],completion_field='author_id')
+    publisher_name = CompletedField("Publisher Name:",[validators.optional()],completion_field='publisher')
     submit = SubmitField("Find")
 
 class PrecisionSearchForm(FlaskForm):
-    searchOptions = ["Author","Author ID","Release Year","Title","Publisher","BookID"]
-    author_name_options = repo.repo_instance.get_author_names()+[None]
-    author_id_options = repo.repo_instance.get_author_ids()+[None]
-    publisher_options = repo.repo_instance.get_all_publisher_names()+[None]
+    searchOptions = ["Author","Author ID","Release Year","Title","Publisher","BookID","All Fields"]
 
     book_id = IntegerField("Book ID:",[validators.optional()])
-    author_name = SelectField("Author Name:",[validators.optional()],choices=author_name_options)
-    author_id = SelectField("Author ID:",[validators.optional()],choices=author_id_options)
-    title = StringField("Title:",[validators.optional()])
+    author_name = CompletedField("Author Name:",[validators.optional()],completion_field='author')
+    author_id = CompletedField("Author ID:",[validators.optional()],completion_field='author_id')
+    title = StringField("Title:",[validators.optional()],widget=CompletionInput('title'))
     release_year = IntegerField("Release Year:",[validators.optional()])
-    publisher_name = SelectField("Publisher Name:",[validators.optional()],choices=publisher_options)
+    publisher_name = CompletedField("Publisher Name:",[validators.optional()],completion_field='publisher')
     searchOption = SelectField(label="Search By:",choices=searchOptions)
     submit = SubmitField("Find")
 
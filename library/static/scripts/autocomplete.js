@@ -0,0 +1,34 @@
+// Fills the datalist of each input with a data-completion-url from /search/complete as the user types.
+var completionRequests = {};
+
+function complete(input){
+  var list = document.getElementById(input.getAttribute("list"));
+  var prefix = input.value;
+  if (prefix.length == 0){
+    list.innerHTML = "";
+    return;
+  }
+  var request = completionRequests[input.id] = new XMLHttpRequest();
+  request.open("GET", input.getAttribute("data-completion-url") + "&prefix=" + encodeURIComponent(prefix));
+  request.onload = function(){
+    // Only the answer to the latest prefix is shown
+    if (request !== completionRequests[input.id] || request.status != 200){
+      return;
+    }
+    list.innerHTML = "";
+    JSON.parse(request.responseText).completions.forEach(function(completion){
+      var option = document.createElement("option");
+      option.value = completion;
+      list.appendChild(option);
+    });
+  };
+  request.send();
+}
+
+function setupCompletions(){
+  document.querySelectorAll("input[data-completion-url]").forEach(function(input){
+    input.addEventListener("input", function(){ complete(input); });
+  });
+}
+
+document.addEventListener("DOMContentLoaded", setupCompletions);
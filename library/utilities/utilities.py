@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, redirect, url_for
+from flask import Blueprint, render_template, redirect, url_for, request
 
 import library.adapters.repository as repo
 
@@ -26,6 +26,20 @@ def get_login_url():
 def get_logout_url():
     return url_for('authentication_bp.logout')
 
+def get_sort_args(default: str = None):
+    # The sort column and direction asked for by the query string, as keyword arguments for the paged
+    # repository methods. Columns that cannot be sorted by fall back to default.
+    sort = request.args.get('sort') if request.args.get('sort') in repo.SORT_KEYS else default
+    return {'sort': sort, 'descending': request.args.get('order') == 'desc'}
+
+def get_sort_urls():
+    # Links for the book table headers. Each sorts the current results by its column from the first page,
+    # and the column already sorted by links to the other direction.
+    sort_args = get_sort_args()
+    args = {name: value for name, value in request.args.items() if name not in ('page', 'after', 'before', 'sort', 'order')}
+    return {key: url_for(request.endpoint, **args, sort=key, order='desc' if key == sort_args['sort'] and not sort_args['descending'] else 'asc')
+            for key in repo.SORT_KEYS}
+
 # def get_selected_articles(quantity=3):
 #     articles = services.get_random_articles(quantity, repo.repo_instance)
 
@@ -28,7 +28,8 @@ def client():
     my_app = create_app({
         'TESTING': True,                                # Set to True during testing.
         'WTF_CSRF_ENABLED': False,                       # test_client will not send a CSRF token, so disable validation.
-        'REPOSITORY': 'memory'
+        'REPOSITORY': 'memory',
+        'MEMORY_SNAPSHOT': None                         # Always populate from the test data files.
     })
 
     return my_app.test_client()
@@ -150,6 +150,17 @@ def test_list_pages_invalid_page(client):
     assert b'707611' in response_2.data
     assert b'2168737' in response_2.data
 
+def test_list_pages_sorted(client):
+    response = client.get('/list?sort=title')
+    response_1 = client.get('/list?sort=title&order=desc')
+
+    assert response.status_code == 200
+    assert b'sort=title&amp;order=desc' in response.data
+    assert response.data.index(b'>13340336<') < response.data.index(b'>2250580<')
+    assert b'>707611<' not in response.data
+    assert response_1.data.index(b'>18711343<') < response_1.data.index(b'>707611<')
+    assert b'>13340336<' not in response_1.data
+
 def test_search_list_pages(client):
     response = client.get('/search/1/query?release_year=2012')
 
@@ -232,6 +243,17 @@ def test_search_author_index_with_correct_input(client,author_name,author_id,mes
     for i in range(messages):
         assert response.status_code == 302
 
+def test_search_author_index_takes_an_author_name_in_any_case(client):
+    response = client.post(
+        '/search/0',
+        data={
+            'author_name': 'naoki urasawa'
+            }
+    )
+    # The name is looked up as the known author it names
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('author_name=Naoki+Urasawa')
+
 def test_search_author_index_with_incorrect_inputs(client):
     # Attempt to search with wrong author name only (Right Type)
     response = client.post(
@@ -424,6 +446,35 @@ def test_search_title_with_incorrect_inputs(client):
 
 ################################################################################################################
 
+def test_search_description_index(client):
+    # Check that we can retrieve the description search page.
+    response = client.get('/search/6')
+    assert response.status_code == 200
+
+    #Checking that Elements are appearing
+    assert b'Words in title, author, description or reviews:' in response.data
+    assert b'Find' in response.data
+
+def test_search_description_with_correct_input(client):
+    # Attempt to search descriptions and reviews
+    response = client.post(
+        '/search/6',
+        data={
+            'name': "catapulted"
+            }
+    )
+    # Check that supplying correct data returns a result i.e. 302 Redirect.
+    assert response.status_code == 302
+
+    # Check that a single match redirects to the book and no match is a 404
+    response = client.get('/search/6/query?query=catapulted')
+    assert response.status_code == 302
+    assert response.location.endswith('/book?book_id=707611')
+    response = client.get('/search/6/query?query=zyzzyva')
+    assert response.status_code == 404
+
+################################################################################################################
+
 def test_search_publisher_index(client):
     # Check that we can retrieve the home page.
     response = client.get('/search/3')
@@ -544,6 +595,21 @@ def test_general_search_index(client):
     assert b'Search By:' in response.data
     assert b'Find' in response.data
     
+def test_search_forms_complete_values_instead_of_listing_them(client):
+    response = client.get('/search/5')
+    assert b'<option value="Katsura Hoshino"' not in response.data
+    assert b'data-completion-url="/search/complete?field=author"' in response.data
+
+    response = client.get('/search/complete?field=author&prefix=k')
+    assert response.status_code == 200
+    assert response.get_json() == {'field': 'author', 'prefix': 'k', 'completions': ['Katsura Hoshino', 'Keith Burns', 'Kieron Dwyer']}
+    response = client.get('/search/complete?field=publisher&prefix=d&limit=1')
+    assert response.get_json()['completions'] == ['Dargaud']
+
+    response = client.get('/search/complete?field=password&prefix=a')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    
 def test_general_search_with_correct_input(client):
     # Attempt to search with each different type of data
 
@@ -932,6 +998,20 @@ def test_book_by_author_name_with_author_name(client):
     assert b"12349663" in response_1.data
     assert b"12349665" in response_1.data  
 
+def test_misspelt_search_offers_corrections(client):
+    response = client.get('/search/0/1/query?author_name=Naoki+Urasowa')
+    assert response.status_code == 404
+    assert b'Did you mean' in response.data
+    assert b'href="/search/0/1/query?author_name=Naoki+Urasawa"' in response.data
+
+    response = client.get('/search/2/query?title=Supermn+Archives')
+    assert response.status_code == 404
+    assert b'href="/search/2/query?title=Superman+Archives"' in response.data
+
+    response = client.get('/search/0/1/query?author_name=27182818284590452353602874713527')
+    assert response.status_code == 404
+    assert b'Did you mean' not in response.data
+
 def test_book_by_author_name_with_invalid_author_name(client):
     #Check that we can get an error response with an invalid request
     response = client.get('/search/0/0/query?author_name=27182818284590452353602874713527')
@@ -1031,6 +1111,27 @@ def test_book_by_author_nameid_with_missing_arg_and_invalid_author_name_id(clien
     assert b'404' in response_2.data
     assert b'404' in response_3.data
 
+def test_book_by_several_criteria(client):
+    response = client.get('/search/query?author_id=294649&release_year_from=2000')
+    response_1 = client.get('/search/query?author_name=Naoki+Urasawa&title=volume+20', follow_redirects=True)
+    response_2 = client.get('/search/query?publisher_name=Dargaud&title=zyzzyva')
+
+    assert response.status_code == 200
+    assert b'12349663' in response.data
+    assert b'12349665' in response.data
+    assert response_1.status_code == 200
+    assert b"20th Century Boys, Volume 20" in response_1.data
+    assert response_2.status_code == 404
+
+def test_precision_search_on_all_fields(client):
+    response = client.post('/search/5', data={'author_name': "Naoki Urasawa", 'title': "volume", 'searchOption': "All Fields"})
+
+    assert response.status_code == 302
+    assert '/search/query' in response.headers['Location']
+    assert 'author_name=Naoki+Urasawa' in response.headers['Location']
+    assert 'title=volume' in response.headers['Location']
+    assert 'publisher_name' not in response.headers['Location']
+
 def test_book_by_author_nameid_with_review(client):
     # Check that we can retrieve the book
     response = client.get('/search/0/2/query?author_name=Jerry+Siegel&author_id=89537',follow_redirects=True)
@@ -457,6 +457,18 @@ class TestBooksJSONReader:
         dataset_of_books = read_books_and_authors
         assert  dataset_of_books[16].title == "續．星守犬"
 
+    def test_iter_books_streams_the_same_books(self, read_books_and_authors):
+        root_folder = get_project_root()
+        data_folder = Path("library/adapters/data")
+        reader = BooksJSONReader(str(root_folder / data_folder / 'books.json'),
+                                 str(root_folder / data_folder / 'authors.json'))
+        books = reader.iter_books()
+        assert next(books) == read_books_and_authors[0]
+        assert reader.dataset_of_books == []
+        rest = list(books)
+        assert [book.book_id for book in rest] == [book.book_id for book in read_books_and_authors[1:]]
+        assert [book.authors for book in rest] == [book.authors for book in read_books_and_authors[1:]]
+
 class TestBooksInventory:
 
     def test_construction_and_find(self):
@@ -504,6 +516,35 @@ class TestBooksInventory:
         assert inventory.find_stock_count(64) is None
         assert inventory.find_stock_count(17) == 7
 
+    def test_readding_book_updates_price_and_stock(self):
+        inventory = BooksInventory()
+
+        book1 = Book(17, "Lord of the Rings")
+        book2 = Book(64, "Our Memoires")
+
+        inventory.add_book(book1, 20, 7)
+        inventory.add_book(book2, 30, 2)
+        inventory.add_book(book1, 25, 1)
+
+        assert inventory.find_price(17) == 25
+        assert inventory.find_stock_count(17) == 1
+        assert inventory.books_inventory[64] == {"book": book2, "price": 30, "nr_books_in_stock": 2}
+
+    def test_books_inventory_is_a_live_view_of_the_stock(self):
+        inventory = BooksInventory()
+        stock = inventory.books_inventory
+
+        book1 = Book(17, "Lord of the Rings")
+        book2 = Book(64, "Our Memoires")
+        inventory.add_book(book1, 20, 7)
+        inventory.add_book(book2, 30, 2)
+        inventory.remove_book(17)
+
+        assert stock is inventory.books_inventory
+        assert list(stock) == [64] and len(stock) == 1
+        assert 17 not in stock
+        assert stock[64]["price"] == 30
+
     def test_find_books_successful_check_types(self):
         inventory = BooksInventory()
 
@@ -1,11 +1,17 @@
 from datetime import date, datetime
+from random import shuffle
 from typing import List
 from attr.validators import in_
 
 import pytest
-from library.adapters import memory_repository
+from library.adapters import memory_repository, snapshot, random_pool
+from library.adapters.query_planner import BookQuery, Criterion, execute
+from library.adapters.prefix_index import PrefixIndex
+from library.adapters.random_pool import ShuffledPool
+from library.adapters.fuzzy_index import DeletionIndex, edit_distance
+from library.adapters.columnar_store import ColumnarBookStore
 
-from library.domain.model import User, Book,Publisher,Author,Review
+from library.domain.model import User, Book,Publisher,Author,Review,make_review
 # from library.adapters.repository import RepositoryException
 
 def test_repository_can_add_book(in_memory_repo):
@@ -114,6 +120,15 @@ def test_repository_can_get_book_by_title(in_memory_repo):
     assert len(another_book) == 1
     assert another_book[0].book_id == 707611
 
+def test_repository_can_get_books_by_partial_title(in_memory_repo):
+    books = in_memory_repo.get_book_by_title_general("20TH century boys")
+    assert [book.book_id for book in books] == [12349663, 12349665, 13340336]
+
+    book = Book(1111,"THIS IS A TEST")
+    in_memory_repo.add_book(book)
+    assert in_memory_repo.get_book_by_title_general("is a t") == [book]
+    assert book in in_memory_repo.get_book_by_title_general("t")
+
 def test_repository_DNGNEB_(in_memory_repo):
     #DNGNEB: Does_not_get_non_existant_book
     book = in_memory_repo.get_book_by_title_specific("The Adventures of Cthulu All-Spark")
@@ -136,12 +151,398 @@ def test_repository_DNGNEB_(in_memory_repo):
     book = in_memory_repo.get_books_by_publisher_name("Kash and the Register")
     assert len(book) == 0
 
+def test_repository_indexes_added_book(in_memory_repo):
+    book = Book(1111,"THIS IS A TEST")
+    book.add_author(Author(1,"Hello World"))
+    book.publisher = Publisher("TESTTEST")
+    book.release_year = 1776
+    in_memory_repo.add_book(book)
+
+    assert in_memory_repo.get_books_by_author_id(1) == [book]
+    assert in_memory_repo.get_books_by_author_name("hello WORLD") == [book]
+    assert in_memory_repo.get_books_by_publisher_name("TESTTEST") == [book]
+    assert in_memory_repo.get_books_by_release_year(1776) == [book]
+
+    books = in_memory_repo.get_books_by_author_id(294649)
+    books.clear()
+    assert len(in_memory_repo.get_books_by_author_id(294649)) == 3
+
+def test_repository_can_search_books_by_text(in_memory_repo):
+    books = in_memory_repo.search_books_by_text("superman catapulted into the SPOTLIGHT")
+    assert books[0].book_id == 707611
+
+    books = in_memory_repo.search_books_by_text("Cthulu zyzzyva")
+    assert books == []
+
+def test_repository_text_search_includes_added_reviews(in_memory_repo):
+    assert in_memory_repo.search_books_by_text("zyzzyva") == []
+
+    book = in_memory_repo.get_book(27036536)
+    review = make_review("A real zyzzyva of a comic", in_memory_repo.get_user('thorke'), book, 5)
+    in_memory_repo.add_review(review)
+
+    assert in_memory_repo.search_books_by_text("zyzzyva") == [book]
+
+def test_repository_can_filter_books(in_memory_repo):
+    assert in_memory_repo.columnar
+
+    books = in_memory_repo.filter_books(release_year_from=2012, release_year_to=2012)
+    assert [book.book_id for book in books] == [book.book_id for book in sorted(in_memory_repo.get_books_by_release_year(2012))]
+
+    books = in_memory_repo.filter_books(publisher_name="Dargaud", ebook=False)
+    assert all(book.publisher.name == "Dargaud" and book.ebook == False for book in books)
+
+    books = in_memory_repo.filter_books(author_id=294649)
+    assert [book.book_id for book in books] == [book.book_id for book in in_memory_repo.get_books_by_author_id(294649)]
+
+    assert len(in_memory_repo.filter_books(publisher_name="Kash and the Register")) == 0
+
+def test_repository_can_find_books_by_several_criteria(in_memory_repo):
+    books = in_memory_repo.get_all_books()
+    def matching(predicate):
+        return sorted(book.book_id for book in books if predicate(book))
+
+    found = in_memory_repo.find_books(BookQuery(author_name="naoki urasawa", release_year_from=2000, release_year_to=2012))
+    assert [book.book_id for book in found] == matching(lambda book: any(author.full_name == "Naoki Urasawa" for author in book.authors)
+                                                        and book.release_year is not None and 2000 <= book.release_year <= 2012)
+    found = in_memory_repo.find_books(BookQuery(publisher_name="Dargaud", title="cr"))
+    assert [book.book_id for book in found] == matching(lambda book: book.publisher.name == "Dargaud" and "cr" in book.title.casefold())
+    found = in_memory_repo.find_books(BookQuery(ebook=False, author_id=294649))
+    assert [book.book_id for book in found] == matching(lambda book: book.ebook == False and 294649 in [author.unique_id for author in book.authors])
+    assert len(in_memory_repo.find_books(BookQuery())) == len(books)
+    assert in_memory_repo.find_books(BookQuery(author_id=294649, publisher_name="Kash and the Register")) == []
+
+def test_query_plan_starts_from_the_smallest_posting_list():
+    listed = []
+    def criterion(name, book_ids):
+        return Criterion(name, len(book_ids), lambda: listed.append(name) or book_ids, lambda book_id: book_id in book_ids)
+
+    book_ids = execute([criterion('large', list(range(1000))), criterion('small', [3, 5, 7]), criterion('medium', [1, 2, 3, 4, 5])],
+                       lambda: range(1000))
+    assert book_ids == [3, 5]
+    # the larger lists are checked against the candidates, never listed
+    assert listed == ['small']
+
+def test_repository_filters_match_every_book_checked_in_turn(in_memory_repo):
+    def matches(book, release_year_from=None, release_year_to=None, publisher_name=None, ebook=None, author_id=None):
+        if release_year_from is not None or release_year_to is not None:
+            if book.release_year is None:
+                return False
+            if release_year_from is not None and book.release_year < release_year_from:
+                return False
+            if release_year_to is not None and book.release_year > release_year_to:
+                return False
+        return ((publisher_name is None or book.publisher.name == publisher_name) and (ebook is None or book.ebook == ebook)
+                and (author_id is None or author_id in [author.unique_id for author in book.authors]))
+
+    filters = [dict(release_year_from=2010), dict(release_year_to=2000, ebook=True),
+               dict(publisher_name="Dargaud"), dict(author_id=294649, release_year_from=2014)]
+    for criteria in filters:
+        assert [book.book_id for book in in_memory_repo.filter_books(**criteria)] == \
+            sorted(book.book_id for book in in_memory_repo.get_all_books() if matches(book, **criteria))
+
+def test_repository_searches_match_without_columns(in_memory_repo):
+    repo = memory_repository.MemoryRepository(columnar=False)
+    for book in in_memory_repo.get_all_books():
+        repo.add_book(book)
+    assert not repo.columnar
+
+    queries = [BookQuery(release_year_from=2010), BookQuery(release_year_to=2000, ebook=True), BookQuery(publisher_name="Dargaud", title="cr"),
+               BookQuery(author_id=294649, release_year_from=2014), BookQuery(author_name="naoki urasawa", ebook=False),
+               BookQuery(publisher_name="Kash and the Register"), BookQuery(title="the", release_year_to=2012)]
+    for query in queries:
+        assert repo.find_books(query) == in_memory_repo.find_books(query)
+        assert list(repo.filter_books(query.release_year_from, query.release_year_to, query.publisher_name, query.ebook, query.author_id)) == \
+            list(in_memory_repo.filter_books(query.release_year_from, query.release_year_to, query.publisher_name, query.ebook, query.author_id))
+
+def test_criteria_search_page_runs_on_the_columns(in_memory_repo, monkeypatch):
+    masks = []
+    mask = ColumnarBookStore.mask
+    monkeypatch.setattr(ColumnarBookStore, 'mask', lambda store, *args: masks.append(args) or mask(store, *args))
+    looked_up = []
+    get_book = in_memory_repo.get_book
+    monkeypatch.setattr(in_memory_repo, 'get_book', lambda book_id: looked_up.append(book_id) or get_book(book_id))
+
+    book_page = in_memory_repo.search_books_page('criteria', BookQuery(ebook=False, release_year_from=2010), page=2, page_size=2)
+
+    assert masks == [(2010, None, None, False, None)]
+    matching = [book.book_id for book in sorted(in_memory_repo.get_all_books())
+                if book.ebook == False and book.release_year is not None and book.release_year >= 2010]
+    assert book_page.total == len(matching)
+    # only the books on the page are looked up
+    assert looked_up == [book.book_id for book in book_page.books] == matching[2:4]
+
+def test_repository_filters_added_book(in_memory_repo):
+    book = Book(1111,"THIS IS A TEST")
+    book.add_author(Author(1,"Hello World"))
+    book.publisher = Publisher("TESTTEST")
+    book.release_year = 1776
+    book.ebook = True
+    in_memory_repo.add_book(book)
+
+    assert list(in_memory_repo.filter_books(release_year_to=1800)) == [book]
+    assert list(in_memory_repo.filter_books(publisher_name="TESTTEST", ebook=True, author_id=1)) == [book]
+    assert len(in_memory_repo.filter_books(publisher_name="TESTTEST", ebook=False)) == 0
+
+def test_repository_can_add_reviews_in_bulk(in_memory_repo):
+    assert len(in_memory_repo.get_reviews()) == 4
+    user = in_memory_repo.get_user('thorke')
+    books = in_memory_repo.get_books_by_ids([35452242, 13340336, 1])
+    assert [book.book_id for book in books] == [13340336, 35452242]
+
+    reviews = [Review(book, "zyzzyva", 4, user=user) for book in books]
+    in_memory_repo.add_reviews(reviews)
+
+    assert in_memory_repo.get_reviews()[4:] == reviews
+    assert user.reviews[-2:] == reviews
+    assert reviews[0] in books[0].reviews
+    assert in_memory_repo.search_books_by_text("zyzzyva") == books
+
 def test_get_recommendations_with_no_user(in_memory_repo):
     books = in_memory_repo.get_recommendations()
     assert len(books) == 10
     books = in_memory_repo.get_recommendations(None,5)
     assert len(books) == 5
 
+def test_random_books_are_distinct_and_cycle_through_every_book(in_memory_repo):
+    books = in_memory_repo.get_random_books(5)
+    assert len(set(book.book_id for book in books)) == 5
+
+    # a full pass over the shuffled pool hands out each book once
+    number_of_books = len(set(book.book_id for book in in_memory_repo.get_all_books()))
+    seen = [book.book_id for book in in_memory_repo.get_random_books(number_of_books)]
+    assert len(seen) == len(set(seen)) == number_of_books
+    assert len(in_memory_repo.get_random_books(number_of_books + 5)) == number_of_books
+
+    in_memory_repo.add_book(Book(1111,"THIS IS A TEST"))
+    assert in_memory_repo.get_book(1111) in in_memory_repo.get_random_books(number_of_books + 1)
+
+def test_shuffled_pool_add_never_shuffles(monkeypatch):
+    shuffled = []
+    def counting_shuffle(items):
+        shuffled.append(len(items))
+        shuffle(items)
+    monkeypatch.setattr(random_pool, 'shuffle', counting_shuffle)
+
+    pool = ShuffledPool()
+    for item in range(1000):
+        pool.add(item)
+    assert shuffled == []
+
+    drawn = pool.sample(10)
+    for item in range(1000, 1500):
+        pool.add(item)
+    assert shuffled == [1000]
+    # only the part of the order not handed out yet is shuffled, once, at the next draw
+    drawn += pool.sample(10)
+    assert shuffled == [1000, 1490]
+
+    pool.add(-1)
+    drawn += pool.sample(len(pool) - 20)
+    assert len(drawn) == len(set(drawn)) == len(pool)
+    assert -1 in drawn
+
+def test_repository_can_add_book_to_reading_list(in_memory_repo):
+    book = in_memory_repo.get_book(707611)
+    in_memory_repo.add_book_to_reading_list(book,'thorke')
+    assert book in in_memory_repo.get_reading_list_for_user('thorke')
+    assert in_memory_repo.get_reading_list_for_user('This is evidently fake') == []
+
+def test_get_recommendations_with_reading_list(in_memory_repo):
+    for book_id in [18955715, 23272155, 25742454, 27036536, 27036537, 27036538, 27036539, 30128855, 30735315, 35452242]:
+        in_memory_repo.add_book_to_reading_list(in_memory_repo.get_book(book_id),'thorke')
+
+    books = in_memory_repo.get_recommendations('thorke')
+    assert len(books) == 10
+    assert books[0] == in_memory_repo.get_book(17405342)
+
+def test_get_recommendations_rank_shared_authors_first(in_memory_repo):
+    book = in_memory_repo.get_book(27036536)
+    in_memory_repo.add_book_to_reading_list(book,'thorke')
+
+    books = in_memory_repo.get_recommendations('thorke',3)
+    assert [book.book_id for book in books] == [27036539, 27036537, 27036538]
+
+    new_book = Book(1111,"THIS IS A TEST")
+    for author in book.authors:
+        new_book.add_author(author)
+    new_book.publisher = book.publisher
+    new_book.release_year = book.release_year
+    in_memory_repo.add_book(new_book)
+    assert in_memory_repo.get_recommendations('thorke',1) == [new_book]
+
+def test_recommendations_are_cached_until_reading_list_changes(in_memory_repo):
+    in_memory_repo.add_book_to_reading_list(in_memory_repo.get_book(27036536),'thorke')
+    first = in_memory_repo.get_recommendations('thorke',3)
+    assert in_memory_repo.get_recommendations('thorke',3) == first
+    assert in_memory_repo.get_recommendation_cache_stats()['hits'] == 1
+    assert in_memory_repo.get_recommendation_cache_stats()['misses'] == 1
+
+    in_memory_repo.add_book_to_reading_list(in_memory_repo.get_book(27036539),'thorke')
+    books = in_memory_repo.get_recommendations('thorke',3)
+    assert in_memory_repo.get_book(27036539) not in books
+    assert in_memory_repo.get_recommendation_cache_stats()['misses'] == 2
+
+    review = make_review("Good", in_memory_repo.get_user('thorke'), in_memory_repo.get_book(27036536), 5)
+    in_memory_repo.add_review(review)
+    in_memory_repo.get_recommendations('thorke',3)
+    assert in_memory_repo.get_recommendation_cache_stats()['misses'] == 3
+
+def test_books_page_slices_the_catalogue_in_id_order(in_memory_repo):
+    book_ids = [book.book_id for book in in_memory_repo.get_all_books()]
+
+    first = in_memory_repo.get_books_page(1, 6)
+    assert [book.book_id for book in first.books] == book_ids[0:6]
+    assert first.total == 20
+    assert first.cursor == book_ids[5]
+
+    second = in_memory_repo.get_books_page(2, 6, after=first.cursor)
+    assert [book.book_id for book in second.books] == book_ids[6:12]
+    assert [book.book_id for book in in_memory_repo.get_books_page(1, 6, before=second.books[0].book_id).books] == book_ids[0:6]
+
+    last = in_memory_repo.get_books_page(9999, 6)
+    assert last.page == 4
+    assert [book.book_id for book in last.books] == book_ids[18:20]
+    assert last.cursor is None
+    assert in_memory_repo.get_books_page(-5, 6).page == 1
+
+def test_search_pages_count_every_match(in_memory_repo):
+    books = in_memory_repo.get_books_by_release_year(None)
+
+    book_page = in_memory_repo.search_books_page('release_year', None, page=2, page_size=2)
+    assert book_page.books == books[2:4]
+    assert book_page.total == len(books)
+    assert in_memory_repo.search_book_ids('author_id', 81563) == [book.book_id for book in in_memory_repo.get_books_by_author_id(81563)]
+    assert in_memory_repo.search_books_page('title', 'zyzzyva').total == 0
+
+def test_books_page_can_be_sorted(in_memory_repo):
+    books = in_memory_repo.get_all_books()
+    by_title = sorted(books, key=lambda book: (book.title.casefold(), book.book_id))
+
+    first = in_memory_repo.get_books_page(1, 6, sort='title')
+    assert first.books == by_title[0:6]
+    assert in_memory_repo.get_books_page(2, 6, after=first.cursor, sort='title').books == by_title[6:12]
+    assert in_memory_repo.get_books_page(2, 6, sort='title', descending=True).books == by_title[::-1][6:12]
+
+    by_year = [book.book_id for book in in_memory_repo.get_books_page(1, 20, sort='release_year').books]
+    assert by_year[-4:] == sorted(book.book_id for book in books if book.release_year is None)
+
+    new_book = Book(1111, "0 aardvark")
+    new_book.publisher = Publisher("Zyzzyva Press")
+    in_memory_repo.add_book(new_book)
+    assert in_memory_repo.get_books_page(1, 6, sort='title').books[0] == new_book
+    assert in_memory_repo.get_books_page(1, 6, sort='publisher', descending=True).books[0] == new_book
+
+def test_search_pages_can_be_sorted(in_memory_repo):
+    books = in_memory_repo.get_book_by_title_general('volume')
+
+    book_page = in_memory_repo.search_books_page('title', 'volume', page_size=50, sort='title')
+    assert book_page.books == sorted(books, key=lambda book: (book.title.casefold(), book.book_id))
+
+def test_repository_snapshot_round_trip(in_memory_repo, tmp_path):
+    path = str(tmp_path / "library.snapshot")
+    sources = {"books.json": [1, 2]}
+    in_memory_repo.add_book_to_reading_list(in_memory_repo.get_book(27036536),'thorke')
+    in_memory_repo.save_snapshot(path, sources)
+
+    repo = memory_repository.MemoryRepository()
+    assert repo.load_snapshot(path, sources)
+    assert repo.get_all_books() == in_memory_repo.get_all_books()
+    book = repo.get_book(27036536)
+    assert book.authors == in_memory_repo.get_book(27036536).authors
+    assert book.publisher == in_memory_repo.get_book(27036536).publisher
+    assert book.description == in_memory_repo.get_book(27036536).description
+    assert repo.get_author_ids() == in_memory_repo.get_author_ids()
+    assert repo.get_all_publisher_names() == in_memory_repo.get_all_publisher_names()
+    assert repo.get_reviews() == in_memory_repo.get_reviews()
+    assert repo.get_user('thorke').password == in_memory_repo.get_user('thorke').password
+    assert repo.get_user('thorke').reading_list == [book]
+    assert repo.get_books_by_author_id(294649) == in_memory_repo.get_books_by_author_id(294649)
+    assert repo.get_book_by_title_general('volume') == in_memory_repo.get_book_by_title_general('volume')
+    assert repo.search_books_by_text('superman') == in_memory_repo.search_books_by_text('superman')
+    assert list(repo.filter_books(release_year_from=2012)) == list(in_memory_repo.filter_books(release_year_from=2012))
+    assert repo.get_recommendations('thorke',3) == in_memory_repo.get_recommendations('thorke',3)
+
+def test_repository_ignores_stale_snapshot(in_memory_repo, tmp_path):
+    path = str(tmp_path / "library.snapshot")
+    in_memory_repo.save_snapshot(path, {"books.json": [1, 2]})
+
+    assert not memory_repository.MemoryRepository().load_snapshot(path, {"books.json": [1, 3]})
+    assert not memory_repository.MemoryRepository().load_snapshot(str(tmp_path / "missing.snapshot"), {})
+
+    with open(path, 'r+b') as snapshot_file:
+        snapshot_file.seek(len(snapshot.MAGIC))
+        snapshot_file.write((snapshot.VERSION + 1).to_bytes(4, 'little'))
+    assert not memory_repository.MemoryRepository().load_snapshot(path, {"books.json": [1, 2]})
+
+def test_prefix_index_ranks_completions_by_weight():
+    index = PrefixIndex(size=3)
+    index.add_all([("Superman", 2), ("Super Sons", 5), ("Supergirl", 1), ("Sandman", 9), ("Superb", 1)])
+    assert index.complete("sup") == ["Super Sons", "Superman", "Superb"]
+    assert index.complete("SUPERM") == ["Superman"]
+    assert index.complete("s", 2) == ["Sandman", "Super Sons"]
+    index.add("Supergirl", 5)
+    assert index.complete("super") == ["Supergirl", "Super Sons", "Superman"]
+    assert index.complete("x") == []
+    assert "Superman" in index and "superman" not in index
+    assert index.known("superman") == "Superman" and index.known("Supergirl") == "Supergirl"
+    assert index.known("super") is None
+
+def test_repository_completes_prefixes_by_popularity(in_memory_repo):
+    assert in_memory_repo.get_completions('author', 'k') == ['Katsura Hoshino', 'Keith Burns', 'Kieron Dwyer']
+    assert in_memory_repo.get_completions('author', '', 1) == ['Naoki Urasawa']
+    assert in_memory_repo.get_completions('publisher', 'D') == ['Dargaud', 'DC Comics', 'Dynamite Entertainment']
+    assert in_memory_repo.get_completions('author_id', '31') == ['3188368', '311098']
+    assert in_memory_repo.get_completions('title', 'zyzzyva') == []
+    assert in_memory_repo.known_value('author', 'Katsura Hoshino') == 'Katsura Hoshino'
+    assert in_memory_repo.known_value('author', 'katsura HOSHINO') == 'Katsura Hoshino'
+    assert in_memory_repo.known_value('author', 'Katsura') is None
+
+    book = Book(1111, "Kaleidoscope")
+    book.add_author(Author(2222, "Kaa Kaa"))
+    in_memory_repo.add_book(book)
+    in_memory_repo.add_book(Book(1112, "Kafka"))
+    in_memory_repo.add_author(Author(3333, "Kab"))
+    assert in_memory_repo.get_completions('author', 'ka') == ['Kaa Kaa', 'Katsura Hoshino', 'Kab']
+    assert in_memory_repo.get_completions('title', 'ka') == ['Kafka', 'Kaleidoscope']
+    in_memory_repo.add_review(make_review("Colourful", in_memory_repo.get_user('thorke'), in_memory_repo.get_book(1111), 5))
+    assert in_memory_repo.get_completions('title', 'ka') == ['Kaleidoscope', 'Kafka']
+    assert in_memory_repo.known_value('author_id', '2222') == '2222'
+
+def test_edit_distance_is_bounded():
+    assert edit_distance("kitten", "sitting", 5) == 3
+    assert edit_distance("kitten", "sitting", 2) == 3
+    assert edit_distance("", "ab", 2) == 2
+    assert edit_distance("naoki urasawa", "naoki urasowa", 2) == 1
+    assert edit_distance("a" * 70, "b" + "a" * 69, 2) == 1
+
+def test_deletion_index_ranks_suggestions_by_distance_then_weight():
+    index = DeletionIndex()
+    index.add("Garth Ennis", 3)
+    index.add("Garth Innis", 7)
+    index.add("Gareth Ennis", 5)
+    index.add("Grant Morrison", 9)
+    assert index.suggest("Garth Enis") == ["Garth Ennis", "Garth Innis", "Gareth Ennis"]
+    assert index.suggest("garth ennis", 1) == ["Garth Ennis"]
+    assert index.suggest("Grant Morrison", bound=0) == ["Grant Morrison"]
+    assert index.suggest("Alan Moore") == []
+    assert "garth ennis" in index
+
+def test_repository_suggests_corrections_of_misspelt_searches(in_memory_repo):
+    assert in_memory_repo.get_suggestions('author', 'Naoki Urasowa') == ['Naoki Urasawa']
+    assert in_memory_repo.get_suggestions('author', 'Kieth Burns') == ['Keith Burns']
+    assert in_memory_repo.get_suggestions('author', 'Naoki Urasawa') == []
+    assert in_memory_repo.get_suggestions('author', 'Zyzzyva Quux') == []
+    assert in_memory_repo.get_suggestions('title', 'Supermn Archives') == ['Superman Archives']
+    assert in_memory_repo.get_suggestions('title', '20th Centry Boys, Volme 20') == ['20th Century Boys, Volume 20']
+    assert in_memory_repo.get_suggestions('title', 'Superman Archives') == []
+    assert len(in_memory_repo.get_book_by_title_general(in_memory_repo.get_suggestions('title', 'Supermn Archives')[0])) == 1
+
+    book = Book(1111, "Kaleidoscope")
+    book.add_author(Author(2222, "Grant Morrison"))
+    in_memory_repo.add_book(book)
+    assert in_memory_repo.get_suggestions('author', 'Grant Morison') == ['Grant Morrison']
+    assert in_memory_repo.get_suggestions('title', 'kaleidoscop') == ['Kaleidoscope']
 
 def test_repository_(in_memory_repo):
     pass #These are incomplete for copy paste
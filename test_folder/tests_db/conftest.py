@@ -3,6 +3,7 @@ import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, clear_mappers
 
+from library import create_app
 from library.adapters import database_repository, repository_populate
 from library.adapters.orm import metadata, map_model_to_tables
 from pathlib import Path
@@ -98,4 +99,15 @@ def empty_session():
     map_model_to_tables()
     session_factory = sessionmaker(bind=engine)
     yield session_factory()
-    metadata.drop_all(engine)
\ No newline at end of file
+    metadata.drop_all(engine)
+
+@pytest.fixture
+def database_client(tmp_path):
+    my_app = create_app({
+        'TESTING': 'True',                              # Populate from the small test data set.
+        'WTF_CSRF_ENABLED': False,
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'library-test.db')
+    })
+    yield my_app.test_client()
+    clear_mappers()
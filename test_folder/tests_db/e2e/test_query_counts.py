@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import event
+
+from library.adapters import repository as repo
+
+# Most SQL statements a page may issue, whatever the number of books, reviews or authors on it.
+# The first /list also counts the books and reads the tables' fingerprint, later pages reuse both until
+# INDEX_TTL has passed.
+@pytest.mark.parametrize(('url', 'max_statements'), (
+        ('/list', 5),
+        ('/list?page=2&after=2168737', 5),
+        ('/book?book_id=707611', 6),
+        ('/book?book_id=12349665', 6),
+))
+def test_page_runs_a_bounded_number_of_statements(database_client, url, max_statements):
+    statements = []
+    engine = repo.repo_instance.engine
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = database_client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 200
+    assert len(statements) <= max_statements
+
+def test_criteria_search_filters_on_the_ebook_flag(database_client):
+    response = database_client.get('/search/query?ebook=true')
+    assert response.status_code == 200
+    assert b'Showing 1 to 4 out of 4' in response.data
+    response = database_client.get('/search/query?ebook=false&title=the')
+    assert response.status_code == 200
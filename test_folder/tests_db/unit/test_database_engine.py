@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+
+from library.adapters.database_engine import create_database_engine
+
+SQLITE_SETTINGS = {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL', 'SQLITE_CACHE_SIZE': -2000,
+                   'SQLITE_MMAP_SIZE': 1048576, 'SQLITE_TEMP_STORE': 'MEMORY'}
+
+def test_file_database_gets_a_sized_queue_pool_and_pragmas(tmp_path):
+    config = dict(SQLITE_SETTINGS, SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'pooled.db'),
+                  DATABASE_POOL_SIZE=3, DATABASE_MAX_OVERFLOW=0)
+    engine = create_database_engine(config)
+
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 3
+    with engine.connect() as connection:
+        assert connection.execute('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.execute('PRAGMA synchronous').scalar() == 1
+        assert connection.execute('PRAGMA cache_size').scalar() == -2000
+        assert connection.execute('PRAGMA temp_store').scalar() == 2
+
+def test_in_memory_database_is_shared_by_every_connection():
+    engine = create_database_engine(dict(SQLITE_SETTINGS, SQLALCHEMY_DATABASE_URI='sqlite://'))
+
+    assert isinstance(engine.pool, StaticPool)
+    with engine.connect() as connection:
+        connection.execute('CREATE TABLE shared (id INTEGER)')
+    with engine.connect() as connection:
+        assert connection.execute('SELECT count(*) FROM shared').scalar() == 0
+
+def test_pool_can_be_chosen(tmp_path):
+    config = {'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'unpooled.db'), 'DATABASE_POOL': 'null'}
+    assert isinstance(create_database_engine(config).pool, NullPool)
+
+    with pytest.raises(ValueError):
+        create_database_engine(dict(config, DATABASE_POOL='lake'))
+    with pytest.raises(ValueError):
+        create_database_engine(dict(config, DATABASE_POOL=None, SQLITE_JOURNAL_MODE='WAL; DROP TABLE books'))
@@ -1,11 +1,28 @@
+from contextlib import contextmanager
 from datetime import date, datetime
+from threading import Event, Thread
 
 import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
 
 import library.adapters.repository as repo
 from library.adapters.database_repository import SqlAlchemyRepository
 from library.domain.model import User, Book, Review, Author,Publisher,make_review
-from library.adapters.repository import RepositoryException
+from library.adapters.repository import RepositoryException, SEARCHES
+from library.adapters.query_planner import BookQuery
+
+@contextmanager
+def count_statements(session_factory):
+    # Counts the SQL statements sent to the database while the block runs.
+    statements = []
+    engine = session_factory.kw['bind']
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
 
 def test_repository_can_add_a_user(session_factory_lite):
     repo = SqlAlchemyRepository(session_factory_lite)
@@ -176,6 +193,20 @@ def test_repository_returns_an_empty_list_for_non_existent_author_id(session_fac
 
     assert books == []
 
+def test_repository_author_lookups_run_a_fixed_number_of_statements(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    for lookup, key in [(repo.get_books_by_author_id, 294649), (repo.get_books_by_author_name, 'Naoki Urasawa')]:
+        repo._session_cm.session.expunge_all()
+        with count_statements(session_factory) as statements:
+            books = lookup(key)
+            for book in books:
+                [author.full_name for author in book.authors]
+                book.publisher.name
+        # the books with their publishers, then their authors
+        assert len(books) > 1
+        assert len(statements) == 2
+
 def test_repository_can_retrieve_books_by_release_year(session_factory_lite):
     repo = SqlAlchemyRepository(session_factory_lite)
 
@@ -220,6 +251,63 @@ def test_repository_returns_books_for_title_general(session_factory_lite):
     assert books[1] == repo.get_book_by_id(12349665)
     assert books[2] == repo.get_book_by_id(13340336)
 
+def test_repository_returns_added_book_for_title_general(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+
+    assert repo.get_book_by_title_general('hello wor') == []
+
+    book = Book(1,"HELLO WORLD")
+    repo.add_book(book)
+
+    assert repo.get_book_by_title_general('hello wor') == [book]
+    assert repo.get_book_by_title_general('LO WORLD') == [book]
+
+def test_indexes_are_rebuilt_after_another_process_adds_a_book(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite, index_ttl=0)
+    slow_repo = SqlAlchemyRepository(session_factory_lite, index_ttl=60)
+    other = SqlAlchemyRepository(session_factory_lite)
+
+    number_of_books = repo.get_number_of_books()
+    assert slow_repo.get_number_of_books() == number_of_books
+    assert repo.get_book_by_title_general('zymurgy') == []
+    assert repo.get_completions('title', 'Zymurgy') == []
+    assert repo.get_suggestions('title', 'zymurgi') == []
+    assert 1 not in [book.book_id for book in repo.get_books_page(1, 100, sort='title').books]
+
+    other.add_book(Book(1, "Zymurgy for Beginners"))
+
+    assert repo.get_number_of_books() == number_of_books + 1
+    assert [book.book_id for book in repo.get_book_by_title_general('zymurgy')] == [1]
+    assert repo.get_completions('title', 'Zymurgy') == ['Zymurgy for Beginners']
+    assert repo.get_suggestions('title', 'zymurgi') == ['Zymurgy']
+    assert 1 in [book.book_id for book in repo.get_books_page(1, 100, sort='title').books]
+    # a repository checks again only once its index_ttl has passed
+    assert slow_repo.get_number_of_books() == number_of_books
+
+def test_indexes_are_rebuilt_after_another_process_updates_a_book(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite, index_ttl=0)
+    other = session_factory_lite()
+
+    assert repo.get_completions('title', 'Zymurgy') == []
+    book_id = repo.get_all_books()[0].book_id
+
+    other.execute("UPDATE books SET title = 'Zymurgy Revisited' WHERE id = :id", {'id': book_id})
+    other.commit()
+
+    assert repo.get_completions('title', 'Zymurgy') == ['Zymurgy Revisited']
+
+def test_own_write_does_not_take_in_another_process_write_before_it(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite, index_ttl=60)
+    other = SqlAlchemyRepository(session_factory_lite)
+
+    assert repo.get_book_by_title_general('zymurgy') == []
+
+    other.add_book(Book(1, "Zymurgy for Beginners"))
+    repo.add_book(Book(2, "Zymurgy for Experts"))
+
+    # the other process's book is found long before index_ttl has passed
+    assert [book.book_id for book in repo.get_book_by_title_general('zymurgy')] == [1, 2]
+
 def test_repository_returns_an_empty_list_for_non_existent_title(session_factory_lite):
     repo = SqlAlchemyRepository(session_factory_lite)
 
@@ -228,6 +316,27 @@ def test_repository_returns_an_empty_list_for_non_existent_title(session_factory
     books = repo.get_book_by_title_general('This does not exist')
     assert books == []
 
+def test_repository_can_search_books_by_text(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+
+    books = repo.search_books_by_text('catapulted superman')
+    assert books[0] == repo.get_book_by_id(707611)
+    assert repo.search_books_by_text('zyzzyva') == []
+
+    book = repo.get_book(27036536)
+    review = make_review('A real zyzzyva of a comic', repo.get_user('thorke'), book, 5)
+    repo.add_review(review)
+
+    assert repo.search_books_by_text('zyzzyva') == [book]
+
+def test_repository_text_search_uses_full_text_index(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+
+    assert repo.has_search_index
+    books = repo.search_books_by_text('urasawa')
+    assert sorted(book.book_id for book in books) == [12349663, 12349665, 13340336]
+    assert repo.search_books_by_text('"the" AND (') == []
+
 def test_repository_returns_book_for_publisher_name(session_factory_lite):
     repo = SqlAlchemyRepository(session_factory_lite)
 
@@ -293,6 +402,28 @@ def test_repository_can_retrieve_reviews(session_factory_lite):
 
     assert len(repo.get_reviews()) == 4
 
+def test_repository_can_add_reviews_in_bulk(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+
+    user = repo.get_user('thorke')
+    books = repo.get_books_by_ids([35452242, 13340336, 1])
+    assert [book.book_id for book in books] == [13340336, 35452242]
+
+    reviews = [Review(book, "Bulk review", 4, user=user) for book in books]
+    repo.add_reviews(reviews)
+
+    assert len(repo.get_reviews()) == 6
+    assert all(review in repo.get_reviews() for review in reviews)
+
+    with pytest.raises(RepositoryException):
+        repo.add_reviews([Review(books[0], "No user", 4)])
+
+def test_populate_matches_review_user_names_case_insensitively(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    assert len(repo.get_reviews()) == 881
+    assert len(repo.get_user('sultrekovamarin').reviews) == 6
+
 def test_can_retrieve_an_book_and_add_a_review_to_it(session_factory_lite):
     repo = SqlAlchemyRepository(session_factory_lite)
 
@@ -339,6 +470,22 @@ def test_can_get_custom_amount_of_recommendations(session_factory_lite):
     # as this is designed to be a preset hardcoded value, with this being
     # an override
 
+def test_random_books_are_picked_without_loading_every_book(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    repo._session_cm.session.expunge_all()
+    with count_statements(session_factory) as statements:
+        books = repo.get_random_books(10)
+    assert len(set(book.book_id for book in books)) == 10
+    # the picked ids, then the picked books with their publishers and authors
+    assert len(statements) == 3
+
+def test_random_books_are_capped_at_the_number_of_books(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+
+    books = repo.get_random_books(repo.get_number_of_books() + 5)
+    assert sorted(book.book_id for book in books) == sorted(book.book_id for book in repo.get_all_books())
+
 def test_can_get_recommendations_if_user_has_reading_list(session_factory_lite):
     repo = SqlAlchemyRepository(session_factory_lite)
 
@@ -348,4 +495,212 @@ def test_can_get_recommendations_if_user_has_reading_list(session_factory_lite):
 
     assert repo.get_book_by_id(17405342) in repo.get_recommendations(user.user_name)
 
+def test_recommendations_are_cached_until_reading_list_changes(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
 
+    repo.add_book_to_reading_list(repo.get_book_by_id(27036536),'thorke')
+    books = repo.get_recommendations('thorke',3)
+    assert [book.book_id for book in books] == [27036539, 27036537, 27036538]
+    assert repo.get_recommendations('thorke',3) == books
+    assert repo.get_recommendation_cache_stats()['hits'] == 1
+
+    repo.add_book_to_reading_list(repo.get_book_by_id(27036539),'thorke')
+    books = repo.get_recommendations('thorke',3)
+    assert repo.get_book_by_id(27036539) not in books
+    assert repo.get_recommendation_cache_stats()['misses'] == 2
+
+def test_recommendations_do_not_match_unknown_release_years(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+
+    # 18955715 has no release year and shares only its publisher with 23272155, 25742454, 30735315 and
+    # 35452242, three of which have no release year either
+    repo.add_book_to_reading_list(repo.get_book_by_id(18955715),'thorke')
+    books = repo.get_recommendations('thorke',4)
+    assert [book.book_id for book in books] == [23272155, 25742454, 30735315, 35452242]
+
+def test_recommendations_are_scored_in_one_statement(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    repo.add_book_to_reading_list(repo.get_book_by_id(2168737),'thorke')
+    repo._session_cm.session.expunge_all()
+    with count_statements(session_factory) as statements:
+        books = repo.get_recommendations('thorke',3)
+    # the ranking, then the ranked books with their publishers and authors; the reading list's write left the
+    # tables' fingerprint current
+    assert len(statements) == 3
+    assert len(books) == 3
+    assert repo.get_book_by_id(2168737) not in books
+
+def test_books_page_seeks_the_cursor(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+    book_ids = [book.book_id for book in repo.get_all_books()]
+
+    first = repo.get_books_page(1, 6)
+    assert [book.book_id for book in first.books] == book_ids[0:6]
+    assert first.total == 20
+    assert first.cursor == book_ids[5]
+
+    second = repo.get_books_page(2, 6, after=first.cursor)
+    assert [book.book_id for book in second.books] == book_ids[6:12]
+    assert [book.book_id for book in repo.get_books_page(1, 6, before=second.books[0].book_id).books] == book_ids[0:6]
+
+    last = repo.get_books_page(9999, 6)
+    assert last.page == 4
+    assert [book.book_id for book in last.books] == book_ids[18:20]
+    assert last.cursor is None
+    assert repo.get_books_page(-5, 6).page == 1
+
+def test_books_page_costs_the_same_deep_in_the_catalogue(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.get_number_of_books()
+    cursor = repo.get_books_page(repo.get_number_of_books() // 10 - 1).cursor
+
+    repo._session_cm.session.expunge_all()
+    with count_statements(session_factory) as statements:
+        book_page = repo.get_books_page(repo.get_number_of_books() // 10, after=cursor)
+    # the page's ids, then its books with their publishers and authors
+    assert len(statements) == 3
+    assert 'OFFSET' not in statements[0]
+    assert book_page.books[0].book_id > cursor
+
+def test_search_pages_only_load_the_books_shown(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+
+    books = repo.get_books_by_release_year(None)
+    book_page = repo.search_books_page('release_year', None, page=2, page_size=8)
+    assert book_page.books == books[8:16]
+    assert book_page.total == len(books)
+    for search, args in [('author_id', (81563,)), ('author_name', ('Garth Ennis',)), ('publisher', ('Dargaud',)),
+                         ('title', ('volume',)), ('text', ('superman', 30))]:
+        assert repo.search_book_ids(search, *args) == [book.book_id for book in getattr(repo, SEARCHES[search])(*args)]
+    assert repo.search_books_page('author_id', -1).total == 0
+
+def test_books_page_can_be_sorted(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+    books = repo.get_all_books()
+    by_author = sorted(books, key=lambda book: (book.authors[0].full_name.casefold(), book.book_id))
+
+    first = repo.get_books_page(1, 6, sort='author')
+    assert [book.book_id for book in first.books] == [book.book_id for book in by_author[0:6]]
+    second = repo.get_books_page(2, 6, after=first.cursor, sort='author')
+    assert [book.book_id for book in second.books] == [book.book_id for book in by_author[6:12]]
+    assert [book.book_id for book in repo.get_books_page(1, 6, before=second.books[0].book_id, sort='author').books] == [book.book_id for book in by_author[0:6]]
+
+    new_book = Book(1111, "0 aardvark")
+    new_book.publisher = Publisher("Zyzzyva Press")
+    repo.add_book(new_book)
+    assert repo.get_books_page(1, 6, sort='title').books[0].book_id == 1111
+    assert repo.get_books_page(1, 6, sort='id', descending=True).books[0].book_id == max(book.book_id for book in books)
+
+def test_sorted_pages_do_not_sort_the_catalogue(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.sort_orders
+
+    repo._session_cm.session.expunge_all()
+    with count_statements(session_factory) as statements:
+        book_page = repo.get_books_page(15, sort='publisher', descending=True)
+    # the page's books with their publishers and authors
+    assert len(statements) == 2
+    assert 'ORDER BY books.publisher_name' not in statements[0]
+    assert len(book_page.books) == 10
+
+def test_repository_can_find_books_by_several_criteria(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+    books = repo.get_all_books()
+    def matching(predicate):
+        return sorted(book.book_id for book in books if predicate(book))
+
+    found = repo.find_books(BookQuery(author_name="Naoki Urasawa", release_year_from=2000, release_year_to=2012))
+    assert [book.book_id for book in found] == matching(lambda book: any(author.full_name == "Naoki Urasawa" for author in book.authors)
+                                                        and book.release_year is not None and 2000 <= book.release_year <= 2012)
+    found = repo.find_books(BookQuery(publisher_name="Dargaud", title="cr"))
+    assert [book.book_id for book in found] == matching(lambda book: book.publisher.name == "Dargaud" and "cr" in book.title.casefold())
+    assert [book.book_id for book in repo.find_books(BookQuery(title="volume"))] == [book.book_id for book in repo.get_book_by_title_general("volume")]
+    assert len(repo.find_books(BookQuery())) == len(books)
+    assert repo.find_books(BookQuery(author_id=294649, publisher_name="Kash and the Register")) == []
+    assert repo.search_books_page('criteria', BookQuery(author_id=294649), page_size=1).total == len(repo.get_books_by_author_id(294649))
+
+def test_repository_can_find_books_by_their_ebook_flag(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+    books = repo.get_all_books()
+
+    assert [book.book_id for book in repo.find_books(BookQuery(ebook=True))] == [18955715, 25742454, 30735315, 35452242]
+    assert all(book.ebook == True for book in repo.find_books(BookQuery(ebook=True)))
+    found = repo.find_books(BookQuery(ebook=False, title="the"))
+    assert [book.book_id for book in found] == sorted(book.book_id for book in books if book.ebook == False and "the" in book.title.casefold())
+    assert len(found) > 0
+    # unknown years are stored as 0 and match no range, as in memory
+    assert all(book.release_year for book in repo.find_books(BookQuery(release_year_to=2000)))
+
+def test_criteria_search_starts_from_the_most_selective_index(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    author_id = repo._session_cm.session.execute('SELECT author_id FROM books_authors LIMIT 1').scalar()
+
+    repo._session_cm.session.expunge_all()
+    with count_statements(session_factory) as statements:
+        repo.search_book_ids('criteria', BookQuery(author_id=author_id, release_year_from=1900))
+    assert len(statements) == 1
+    plan = ' '.join(row[-1] for row in repo._session_cm.session.connection().exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + statements[0], (author_id, 1900)))
+    assert 'ix_books_authors_author_id' in plan
+
+def test_repository_completes_prefixes_by_popularity(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+    assert repo.get_completions('author', 'k') == ['Katsura Hoshino', 'Keith Burns', 'Kieron Dwyer']
+    assert repo.get_completions('author', '', 1) == ['Naoki Urasawa']
+    assert repo.get_completions('publisher', 'D') == ['Dargaud', 'DC Comics', 'Dynamite Entertainment']
+    assert repo.get_completions('author_id', '31') == ['3188368', '311098']
+    assert repo.known_value('publisher', 'DC Comics') == 'DC Comics'
+    assert repo.known_value('publisher', 'dc comics') == 'DC Comics'
+    assert repo.known_value('publisher', 'DC') is None
+
+    book = Book(1111, "Kaleidoscope")
+    book.add_author(Author(2222, "Kaa Kaa"))
+    repo.add_book(book)
+    repo.add_book(Book(1112, "Kafka"))
+    assert repo.get_completions('author', 'ka') == ['Kaa Kaa', 'Katsura Hoshino']
+    assert repo.get_completions('title', 'ka') == ['Kafka', 'Kaleidoscope']
+    repo.add_review(make_review("Colourful", repo.get_user('thorke'), repo.get_book(1111), 5))
+    assert repo.get_completions('title', 'ka') == ['Kaleidoscope', 'Kafka']
+    assert SqlAlchemyRepository(session_factory_lite).get_completions('title', 'ka') == ['Kaleidoscope', 'Kafka']
+
+def test_repository_suggests_corrections_of_misspelt_searches(session_factory_lite):
+    repo = SqlAlchemyRepository(session_factory_lite)
+    assert repo.get_suggestions('author', 'Naoki Urasowa') == ['Naoki Urasawa']
+    assert repo.get_suggestions('author', 'naoki urasawa') == ['Naoki Urasawa']
+    assert repo.get_books_by_author_name('naoki urasawa') == []
+    assert repo.get_suggestions('title', 'Supermn Archives') == ['Superman Archives']
+    assert len(repo.get_book_by_title_general(repo.get_suggestions('title', 'Supermn Archives')[0])) == 1
+
+    book = Book(1111, "Kaleidoscope")
+    book.add_author(Author(2222, "Grant Morrison"))
+    repo.add_book(book)
+    assert repo.get_suggestions('author', 'Grant Morison') == ['Grant Morrison']
+    assert repo.get_suggestions('title', 'kaleidoscop') == ['Kaleidoscope']
+
+def test_ending_one_threads_session_leaves_other_threads_alone(database_engine):
+    repo = SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=database_engine))
+    loaded, ended = Event(), Event()
+    errors = []
+
+    def review_a_book():
+        try:
+            book = repo.get_book(707611)
+            user = repo.get_user('thorke')
+            loaded.set()
+            ended.wait(10)
+            repo.add_review(make_review("Written while another request ended", user, book, 4))
+        except Exception as error:
+            errors.append(error)
+
+    thread = Thread(target=review_a_book)
+    thread.start()
+    loaded.wait(10)
+    # another request finishing on this thread
+    repo.reset_session()
+    repo.close_session()
+    ended.set()
+    thread.join()
+
+    assert errors == []
+    assert "Written while another request ended" in [review.review_text for review in repo.get_book(707611).reviews]
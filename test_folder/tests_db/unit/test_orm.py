@@ -1,10 +1,14 @@
 import pytest
 
 import datetime
+from types import MemberDescriptorType
 
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError, NoInspectionAvailable
+from sqlalchemy.orm import clear_mappers
 
 from library.domain.model import ReadingList, User, Book, Review,Author, Publisher,make_review
+from library.adapters.orm import map_model_to_tables
 
 book_date = datetime.date(2020, 2, 28)
 
@@ -313,3 +317,24 @@ def test_save_reviewed_book(empty_session):
     rows = list(empty_session.execute('SELECT user_name, book_id, review_text FROM reviews'))
     assert rows == [(user_key, book_key, review_text)]
 
+def test_mapped_objects_keep_their_orm_state_out_of_the_instance(empty_session):
+    book = Book(1, "Mapped")
+    empty_session.add(book)
+    empty_session.commit()
+
+    assert not hasattr(book, '__dict__')
+    assert inspect(book).persistent
+    empty_session.expunge_all()
+    assert empty_session.query(Book).one().title == "Mapped"
+
+def test_unmapped_classes_get_their_slots_back(empty_session):
+    clear_mappers()
+    try:
+        assert isinstance(vars(Book)['_Book__title'], MemberDescriptorType)
+        book = Book(1, "Unmapped")
+        book.release_year = 2020
+        assert book.title == "Unmapped" and book.release_year == 2020
+        with pytest.raises(NoInspectionAvailable):
+            inspect(book)
+    finally:
+        map_model_to_tables()
@@ -1,6 +1,9 @@
-from sqlalchemy import select, inspect
+from sqlalchemy import create_engine, select, inspect
 
-from library.adapters.orm import metadata
+from library.adapters.orm import metadata, books_table, add_missing_columns
+from library.adapters.database_populate import backfill_ebooks
+from library.adapters.repository_populate import hash_passwords, PARALLEL_HASHING_THRESHOLD
+from werkzeug.security import check_password_hash
 import datetime
 
 def test_database_populate_inspect_table_names(database_engine):
@@ -8,7 +11,8 @@ def test_database_populate_inspect_table_names(database_engine):
     # Get table information
     inspector = inspect(database_engine)
     # print(inspector.get_table_names())
-    assert inspector.get_table_names() == ['authors', 'books', 'books_authors', 'publishers', 'reviews', 'user_reading_list', 'users']
+    assert inspector.get_table_names() == ['authors', 'books', 'books_authors', 'books_fts', 'books_fts_config', 'books_fts_content', 'books_fts_data',
+                                          'books_fts_docsize', 'books_fts_idx', 'publishers', 'reviews', 'table_changes', 'user_reading_list', 'users']
 
 def test_database_populate_select_all_authors(database_engine):
 
@@ -77,7 +81,7 @@ def test_database_populate_select_publishers(database_engine):
 
     # Get table information
     inspector = inspect(database_engine)
-    name_of_books_authors_table = inspector.get_table_names()[3]
+    name_of_books_authors_table = inspector.get_table_names()[9]
 
     with database_engine.connect() as connection:
         # query for records in table books
@@ -89,13 +93,14 @@ def test_database_populate_select_publishers(database_engine):
             all_publishers.append((row['id'], row['name']))
         
         assert all_publishers[0][1] == 'N.A.'
-        assert all_publishers[10][1] == 'Marvel'
+        assert all_publishers[9][1] == 'Planeta DeAgostini'
+        assert all_publishers[11][1] == 'Marvel'
 
 def test_database_populate_select_all_reviews(database_engine):
 
     # Get table information
     inspector = inspect(database_engine)
-    name_of_reviews_table = inspector.get_table_names()[4]
+    name_of_reviews_table = inspector.get_table_names()[10]
 
     with database_engine.connect() as connection:
         # query for records in table reviews
@@ -115,7 +120,7 @@ def test_database_populate_select_all_reviews(database_engine):
 def test_database_populate_select_user_reading_lists(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_user_reading_lists_table = inspector.get_table_names()[5]
+    name_of_user_reading_lists_table = inspector.get_table_names()[12]
 
     with database_engine.connect() as connection:
         # query for records in table books
@@ -132,7 +137,7 @@ def test_database_populate_select_all_users(database_engine):
 
     # Get table information
     inspector = inspect(database_engine)
-    name_of_users_table = inspector.get_table_names()[6]
+    name_of_users_table = inspector.get_table_names()[13]
 
     with database_engine.connect() as connection:
         # query for records in table users
@@ -144,6 +149,51 @@ def test_database_populate_select_all_users(database_engine):
             all_users.append(row['user_name'])
         assert all_users == ['thorke', 'fmercury', 'mjackson', 'test', 'derp']
 
+def test_database_populate_keeps_author_order_and_indexes_every_book(database_engine):
 
+    with database_engine.connect() as connection:
+        # authors are linked in the order books.json lists them
+        result = connection.execute('SELECT author_id FROM books_authors WHERE book_id = 707611 ORDER BY id')
+        assert [row[0] for row in result] == [81563, 89537]
+
+        # the search index is rebuilt from the loaded rows
+        assert connection.execute('SELECT count(*) FROM books_fts').scalar() == 20
+        result = connection.execute('SELECT authors FROM books_fts WHERE rowid = 707611')
+        assert result.scalar() == 'Jerry Siegel Joe Shuster'
+
+def test_database_populate_creates_secondary_indexes(database_engine):
+    inspector = inspect(database_engine)
+    assert {index['name'] for index in inspector.get_indexes('books')} == {'ix_books_publisher_name', 'ix_books_release_year', 'ix_books_title'}
+    assert {index['name'] for index in inspector.get_indexes('books_authors')} == {'ix_books_authors_author_id', 'ix_books_authors_book_id'}
+    assert {index['name'] for index in inspector.get_indexes('reviews')} == {'ix_reviews_book_id', 'ix_reviews_user_name'}
 
+    with database_engine.connect() as connection:
+        # user names are looked up lowercased, which is an index seek rather than a table scan
+        plan = connection.execute("EXPLAIN QUERY PLAN SELECT * FROM users WHERE lower(user_name) = 'thorke'").fetchall()
+        assert 'ix_users_user_name_lower' in plan[0][-1]
+        plan = connection.execute('EXPLAIN QUERY PLAN SELECT * FROM authors WHERE name = :name', {'name': 'Dan Slott'}).fetchall()
+        assert 'ix_authors_name' in plan[0][-1]
+
+def test_hash_passwords_in_parallel_keeps_order():
+    passwords = ['password' + str(i) for i in range(PARALLEL_HASHING_THRESHOLD)]
+    hashes = hash_passwords(passwords, workers=2, chunksize=5)
 
+    assert len(hashes) == len(passwords)
+    assert all(check_password_hash(hash, password) for hash, password in zip(hashes, passwords))
+    assert check_password_hash(hash_passwords(['single'], workers=4)[0], 'single')
+
+def test_database_populate_stores_the_ebook_flag(database_engine):
+    with database_engine.connect() as connection:
+        assert [row[0] for row in connection.execute('SELECT id FROM books WHERE ebook ORDER BY id')] == [18955715, 25742454, 30735315, 35452242]
+        assert connection.execute('SELECT count(*) FROM books WHERE ebook IS NULL').scalar() == 0
+
+def test_databases_without_the_ebook_column_get_it_filled_in():
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute('CREATE TABLE books (id INTEGER PRIMARY KEY, release_year INTEGER, title VARCHAR(255) NOT NULL, '
+                           'description VARCHAR(1024), publisher_name VARCHAR(1024))')
+        connection.execute("INSERT INTO books (id, title) VALUES (25742454, 'An ebook'), (707611, 'A paper book')")
+        assert add_missing_columns(connection) == [books_table.c.ebook]
+        backfill_ebooks(connection, "test_folder\\tests")
+        assert list(connection.execute('SELECT id, ebook FROM books ORDER BY id')) == [(707611, 0), (25742454, 1)]
+        assert add_missing_columns(connection) == []
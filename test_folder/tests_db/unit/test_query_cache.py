@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from library.adapters.database_repository import SqlAlchemyRepository
+from library.adapters.query_cache import QueryCachingRepository
+from library.domain.model import Book, Publisher, make_review
+
+@contextmanager
+def count_statements(session_factory):
+    statements = []
+    engine = session_factory.kw['bind']
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+def test_cache_answers_repeated_name_lists_without_the_database(session_factory_lite):
+    repo = QueryCachingRepository(SqlAlchemyRepository(session_factory_lite))
+
+    publisher_names = repo.get_all_publisher_names()
+    with count_statements(session_factory_lite) as statements:
+        assert repo.get_all_publisher_names() == publisher_names
+        assert repo.get_all_publisher_names() is not repo.get_all_publisher_names()
+    assert statements == []
+    assert repo.stats['hits'] == 3
+    assert repo.stats['misses'] == 1
+
+def test_cache_keeps_book_order_and_loads_books_again(session_factory_lite):
+    repo = QueryCachingRepository(SqlAlchemyRepository(session_factory_lite))
+
+    books = repo.get_books_by_author_id(81563)
+    repo.close_session()
+    cached = repo.get_books_by_author_id(81563)
+    assert [book.book_id for book in cached] == [book.book_id for book in books]
+    assert [author.full_name for author in cached[0].authors] == [author.full_name for author in books[0].authors]
+    assert repo.stats['hits'] == 1
+
+def test_cache_is_invalidated_by_writes_to_the_tables_read(session_factory_lite):
+    repo = QueryCachingRepository(SqlAlchemyRepository(session_factory_lite))
+
+    assert repo.get_book_by_title_general('zyzzyva') == []
+    assert 'Zyzzyva Press' not in repo.get_all_publisher_names()
+    book = Book(1111, "Zyzzyva")
+    book.publisher = Publisher("Zyzzyva Press")
+    repo.add_book(book)
+    assert [book.book_id for book in repo.get_book_by_title_general('zyzzyva')] == [1111]
+    assert 'Zyzzyva Press' in repo.get_all_publisher_names()
+
+    assert repo.search_books_by_text('quixotic') == []
+    repo.add_book_to_reading_list(repo.get_book(1111), 'thorke')
+    assert repo.search_books_by_text('quixotic') == []
+    assert repo.stats['hits'] == 1
+    repo.add_review(make_review("Quixotic", repo.get_user('thorke'), repo.get_book(1111), 5))
+    assert [book.book_id for book in repo.search_books_by_text('quixotic')] == [1111]
+
+def test_cache_entries_expire(session_factory_lite):
+    repo = QueryCachingRepository(SqlAlchemyRepository(session_factory_lite), maxsize=1, ttl=0)
+
+    repo.get_author_ids()
+    repo.get_author_ids()
+    assert repo.stats['hits'] == 0
+    assert repo.stats['size'] == 1
+
+def test_cache_pages_through_cached_search_ids(session_factory_lite):
+    repo = QueryCachingRepository(SqlAlchemyRepository(session_factory_lite))
+
+    first = repo.search_books_page('release_year', None, page=1, page_size=8)
+    with count_statements(session_factory_lite) as statements:
+        second = repo.search_books_page('release_year', None, page=2, page_size=8)
+    assert 'SELECT id FROM books ORDER BY id' not in statements
+    assert repo.stats['hits'] == 1
+    assert second.total == first.total == 20
+    assert [book.book_id for book in first.books + second.books] == repo.search_book_ids('release_year', None)[0:16]